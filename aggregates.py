@@ -0,0 +1,445 @@
+#!/usr/bin/env python3
+# =============================================================
+# File: aggregates.py
+# 대화 통계 증분 집계 모듈
+# =============================================================
+"""
+참여자 수, 메시지 수(사용자/AI), 메시지 길이 분포, 완료율, 대화 시간 등
+전체 통계를 로그를 매번 다시 읽지 않고 저장할 때마다 조금씩 갱신하는 모듈
+
+- save_local_log 가 참여자 잠금 안에서 이전 로그와 새 로그를 넘겨주면
+  달라진 부분(새 메시지, 완료 여부 변화)만 반영합니다. (저장당 O(새 메시지 수))
+- 길이/시간 분포는 로그 스케일 버킷 스케치(상대 오차 약 2%)로 보관하여
+  더하기만으로 합칠 수 있고(mergeable) 분위수를 바로 계산할 수 있습니다.
+- 프로세스마다 아직 기록하지 않은 변화량(delta)을 모아 두었다가 주기적으로
+  잠금을 잡고 logs/.aggregates.json 에 합쳐 씁니다. (여러 서버 프로세스 안전)
+- 조회(get_aggregates)는 파일 크기가 로그 양과 무관하므로 O(1) 입니다.
+- 재생성(rebuild)은 저장 경로의 공유 잠금(update_guard)을 배타적으로 잡고 세대(epoch)를
+  올립니다. 이전 세대의 변화량은 이미 로그에 반영되어 재생성에 포함되므로 버립니다.
+  (다른 프로세스가 들고 있던 변화량이 두 번 더해지지 않음)
+
+Firestore 를 쓰는 배포에서는 firestore_handler 가 같은 변화량을 요약 문서
+(stats/conversations)에 firestore.Increment 로 더하여 모든 서버가 한 집계를 공유합니다.
+
+사용법:
+    python aggregates.py                        # 현재 집계 출력
+    python aggregates.py rebuild                # 로그 전체를 읽어 집계를 새로 만듦
+    python aggregates.py rebuild --firestore    # Firestore 대화 전체로 요약 문서를 새로 만듦
+
+환경 변수:
+- RAI_AGGREGATES_PATH:          집계 파일 경로 (기본값: logs/.aggregates.json, 시작 시 절대 경로로 고정)
+- RAI_AGGREGATES_FLUSH_SECONDS: 변화량을 파일에 합치는 주기 (기본값: 10)
+- RAI_AGGREGATES_DISABLED:      "1"이면 집계 기록/조회 비활성화 (벤치마크, 부하 테스트)
+"""
+
+import os
+import math
+import time
+import atexit
+import threading
+from datetime import datetime
+from contextlib import contextmanager
+from typing import Dict, Iterable, Optional
+
+import log_storage
+
+AGGREGATES_PATH = os.environ.get("RAI_AGGREGATES_PATH", os.path.join(log_storage.LOGS_DIR, ".aggregates.json"))
+FLUSH_EVERY_SECONDS = float(os.environ.get("RAI_AGGREGATES_FLUSH_SECONDS", "10"))
+AGGREGATES_ENABLED = os.environ.get("RAI_AGGREGATES_DISABLED", "0") != "1"
+FLUSH_EVERY_UPDATES = 50
+RELATIVE_ACCURACY = 0.02
+
+COUNTERS = ("participants", "completed", "messages", "user_messages", "assistant_messages", "characters")
+
+
+class Sketch:
+    """로그 스케일 버킷 히스토그램 (DDSketch 방식, 상대 오차 보장 / 더하기로 병합)"""
+
+    def __init__(self, relative_accuracy: float = RELATIVE_ACCURACY):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.buckets: Dict[int, int] = {}
+        self.zero_count = 0
+        self.count = 0
+        self.sum = 0.0
+
+    def _key(self, value: float) -> int:
+        return math.ceil(math.log(value) / self._log_gamma)
+
+    def add(self, value: float, count: int = 1):
+        """값 추가 (count 가 음수이면 이전에 추가한 값을 제거)"""
+        if value <= 0:
+            self.zero_count += count
+        else:
+            key = self._key(value)
+            self.buckets[key] = self.buckets.get(key, 0) + count
+            if not self.buckets[key]:
+                del self.buckets[key]
+        self.count += count
+        self.sum += value * count
+
+    def merge(self, other: "Sketch"):
+        for key, count in other.buckets.items():
+            self.buckets[key] = self.buckets.get(key, 0) + count
+            if not self.buckets[key]:
+                del self.buckets[key]
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.sum += other.sum
+
+    def quantile(self, q: float) -> float:
+        if self.count <= 0:
+            return 0.0
+        rank = max(1, math.ceil(q * self.count))
+        seen = self.zero_count
+        if seen >= rank:
+            return 0.0
+        for key in sorted(self.buckets):
+            seen += self.buckets[key]
+            if seen >= rank:
+                return 2 * self.gamma ** key / (self.gamma + 1)
+        return 2 * self.gamma ** max(self.buckets) / (self.gamma + 1)
+
+    def mean(self) -> float:
+        return self.sum / self.count if self.count > 0 else 0.0
+
+    def to_dict(self) -> Dict:
+        return {
+            "relative_accuracy": self.relative_accuracy,
+            "zero_count": self.zero_count,
+            "count": self.count,
+            "sum": self.sum,
+            "buckets": {str(key): count for key, count in sorted(self.buckets.items())},
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "Sketch":
+        sketch = cls(data.get("relative_accuracy", RELATIVE_ACCURACY))
+        sketch.zero_count = data.get("zero_count", 0)
+        sketch.count = data.get("count", 0)
+        sketch.sum = data.get("sum", 0.0)
+        sketch.buckets = {int(key): count for key, count in data.get("buckets", {}).items()}
+        return sketch
+
+
+def _duration_seconds(log_data: Dict) -> Optional[float]:
+    try:
+        start = datetime.fromisoformat(str(log_data["conversation_start"]))
+        end = datetime.fromisoformat(str(log_data["conversation_end"]))
+        if (start.tzinfo is None) != (end.tzinfo is None):
+            # Firestore 는 저장한 naive 시각을 UTC 로 돌려주므로 한쪽만 시간대가 있을 수 있음
+            start, end = start.replace(tzinfo=None), end.replace(tzinfo=None)
+        return max(0.0, (end - start).total_seconds())
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def _is_prefix(previous: list, current: list) -> bool:
+    """previous 의 메시지(역할, 내용)가 current 의 앞부분과 모두 같은지 (타임스탬프는 무시)"""
+    if len(previous) > len(current):
+        return False
+    return all(a.get("role") == b.get("role") and a.get("content") == b.get("content")
+               for a, b in zip(previous, current))
+
+
+class Aggregates:
+    """전체 통계 카운터 + 길이/시간 분포 (서로 더해서 병합 가능)"""
+
+    def __init__(self):
+        self.counters = {name: 0 for name in COUNTERS}
+        self.message_length = Sketch()
+        self.duration = Sketch()
+        self.updated_at = None
+        self.epoch = 0  # 집계 파일의 세대 (rebuild 때마다 증가)
+
+    # --- 갱신 --------------------------------------------------------------
+    def _add_messages(self, messages: Iterable[Dict], sign: int = 1):
+        for msg in messages:
+            content = msg.get("content") or ""
+            self.counters["messages"] += sign
+            if msg.get("role") == "user":
+                self.counters["user_messages"] += sign
+            elif msg.get("role") == "assistant":
+                self.counters["assistant_messages"] += sign
+            self.counters["characters"] += sign * len(content)
+            self.message_length.add(len(content), sign)
+
+    def _add_completion(self, log_data: Dict, sign: int = 1):
+        self.counters["completed"] += sign
+        duration = _duration_seconds(log_data)
+        if duration is not None:
+            self.duration.add(duration, sign)
+
+    def record_update(self, previous: Optional[Dict], current: Dict):
+        """참여자 로그가 previous → current 로 바뀐 만큼 반영
+
+        대화 앞부분이 이전 로그와 같으면(뒤에 메시지가 붙은 경우) 새 메시지만 더하고,
+        짧아졌거나 앞부분이 달라졌으면(같은 참여자 코드로 리셋 후 덮어쓴 경우 등)
+        이전 내용을 빼고 새 내용을 더합니다.
+        """
+        previous_messages = (previous or {}).get("conversation", [])
+        current_messages = current.get("conversation", [])
+        if previous is None:
+            self.counters["participants"] += 1
+        if _is_prefix(previous_messages, current_messages):
+            self._add_messages(current_messages[len(previous_messages):])
+        else:
+            self._add_messages(previous_messages, -1)
+            self._add_messages(current_messages)
+
+        was_completed = bool((previous or {}).get("conversation_end"))
+        if was_completed:
+            self._add_completion(previous, -1)
+        if current.get("conversation_end"):
+            self._add_completion(current)
+        self.updated_at = current.get("last_updated") or datetime.now().isoformat()
+
+    def merge(self, other: "Aggregates"):
+        for name in COUNTERS:
+            self.counters[name] += other.counters.get(name, 0)
+        self.message_length.merge(other.message_length)
+        self.duration.merge(other.duration)
+        if other.updated_at and (not self.updated_at or other.updated_at > self.updated_at):
+            self.updated_at = other.updated_at
+
+    def is_empty(self) -> bool:
+        return not any(self.counters.values()) and not self.message_length.count and not self.duration.count
+
+    # --- 조회 --------------------------------------------------------------
+    def summary(self) -> Dict:
+        """화면/리포트용 요약 값"""
+        participants = self.counters["participants"]
+        return {
+            "participants": participants,
+            "completed": self.counters["completed"],
+            "in_progress": participants - self.counters["completed"],
+            "completion_rate": self.counters["completed"] / participants if participants else 0.0,
+            "messages": self.counters["messages"],
+            "user_messages": self.counters["user_messages"],
+            "assistant_messages": self.counters["assistant_messages"],
+            "avg_messages": self.counters["messages"] / participants if participants else 0.0,
+            "avg_length": self.message_length.mean(),
+            "length_p50": self.message_length.quantile(0.5),
+            "length_p95": self.message_length.quantile(0.95),
+            "avg_duration": self.duration.mean(),
+            "duration_p50": self.duration.quantile(0.5),
+            "duration_p95": self.duration.quantile(0.95),
+            "updated_at": self.updated_at,
+        }
+
+    # --- 직렬화 -----------------------------------------------------------
+    def to_dict(self) -> Dict:
+        return {
+            "counters": dict(self.counters),
+            "message_length": self.message_length.to_dict(),
+            "duration": self.duration.to_dict(),
+            "updated_at": self.updated_at,
+            "epoch": self.epoch,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict]) -> "Aggregates":
+        aggregates = cls()
+        if not data:
+            return aggregates
+        for name in COUNTERS:
+            aggregates.counters[name] = data.get("counters", {}).get(name, 0)
+        aggregates.message_length = Sketch.from_dict(data.get("message_length", {}))
+        aggregates.duration = Sketch.from_dict(data.get("duration", {}))
+        aggregates.updated_at = data.get("updated_at")
+        aggregates.epoch = data.get("epoch", 0)
+        return aggregates
+
+    @classmethod
+    def from_logs(cls, logs: Iterable[Dict]) -> "Aggregates":
+        """로그(또는 Firestore 문서) 전체로 집계를 새로 만듦"""
+        aggregates = cls()
+        for log_data in logs:
+            aggregates.record_update(None, log_data)
+        return aggregates
+
+
+class AggregateStore:
+    """프로세스별 변화량을 모아 집계 파일에 주기적으로 합치는 저장소 (스레드 안전)
+
+    경로는 생성 시점에 절대 경로로 고정합니다. (작업 디렉토리를 바꾸는 도구가
+    종료 시 flush 해도 다른 위치의 집계 파일에 쓰지 않도록)
+    """
+
+    def __init__(self, path: str = AGGREGATES_PATH, enabled: bool = AGGREGATES_ENABLED):
+        self.path = os.path.abspath(path)
+        self.enabled = enabled
+        locks_dir = os.path.join(os.path.dirname(self.path), log_storage.LOCKS_DIR)
+        self.lock_path = os.path.join(locks_dir, "aggregates.lock")
+        self.guard_path = os.path.join(locks_dir, "aggregates_guard.lock")
+        self.pending: Dict[int, Aggregates] = {}  # 세대 → 아직 기록하지 않은 변화량
+        self._pending_updates = 0
+        self._last_flush = time.monotonic()
+        self._cached: Optional[Aggregates] = None
+        self._cached_mtime = None
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def update_guard(self):
+        """로그 쓰기 + record_update 를 감싸는 공유 잠금 (rebuild 중에는 대기)"""
+        if not self.enabled:
+            yield
+            return
+        with log_storage.file_lock(self.guard_path, shared=True):
+            yield
+
+    def record_update(self, previous: Optional[Dict], current: Dict):
+        """update_guard 안에서 호출 (변화량을 현재 세대에 기록)"""
+        if not self.enabled:
+            return
+        with self._lock:
+            epoch = self._load().epoch
+            self.pending.setdefault(epoch, Aggregates()).record_update(previous, current)
+            self._pending_updates += 1
+            due = (self._pending_updates >= FLUSH_EVERY_UPDATES
+                   or time.monotonic() - self._last_flush >= FLUSH_EVERY_SECONDS)
+        if due:
+            self.flush()
+
+    def _load(self) -> Aggregates:
+        """집계 파일을 읽음 (파일이 바뀌지 않았으면 캐시 사용)"""
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError:
+            return Aggregates()
+        if self._cached is None or mtime != self._cached_mtime:
+            try:
+                self._cached = Aggregates.from_dict(log_storage.read_json(self.path))
+            except ValueError:
+                print(f"⚠️ 집계 파일이 깨져 있습니다: {self.path} (python aggregates.py rebuild 로 다시 만드세요)")
+                self._cached = Aggregates()
+            self._cached_mtime = mtime
+        return self._cached
+
+    def flush(self):
+        """모아 둔 변화량을 집계 파일에 합쳐 씀 (파일과 세대가 다른 변화량은 버림)"""
+        with self._lock:
+            pending, self.pending = self.pending, {}
+            self._pending_updates = 0
+            self._last_flush = time.monotonic()
+        pending = {epoch: delta for epoch, delta in pending.items()
+                   if not (delta.is_empty() and not delta.updated_at)}
+        if not pending:
+            return
+        try:
+            with log_storage.file_lock(self.lock_path):
+                merged = Aggregates.from_dict(log_storage.read_json(self.path))
+                delta = pending.pop(merged.epoch, None)
+                # 남은 것은 rebuild 이전 세대의 변화량 → 이미 재생성에 포함됨
+                if delta is not None:
+                    merged.merge(delta)
+                    log_storage.atomic_write_json(self.path, merged.to_dict())
+        except Exception as e:
+            print(f"⚠️ 집계 파일 저장 실패: {str(e)}")
+            with self._lock:
+                for epoch, delta in pending.items():
+                    delta.merge(self.pending.get(epoch, Aggregates()))
+                    self.pending[epoch] = delta  # 다음 flush 때 다시 시도
+
+    def get(self) -> Aggregates:
+        """현재 집계 (파일에 기록된 값 + 아직 기록하지 않은 이 프로세스의 변화량)"""
+        current = Aggregates()
+        if not self.enabled:
+            return current
+        with self._lock:
+            stored = self._load()
+            current.merge(stored)
+            current.epoch = stored.epoch
+            if stored.epoch in self.pending:
+                current.merge(self.pending[stored.epoch])
+            return current
+
+    def rebuild(self, logs_dir: str = log_storage.LOGS_DIR, only_if_missing: bool = False) -> Optional[Aggregates]:
+        """로그 전체를 읽어 집계 파일을 새로 만듦 (그동안 모든 프로세스의 로그 저장은 대기)
+
+        only_if_missing=True 이면 잠금을 잡은 뒤 파일이 이미 있으면 아무것도 하지 않고 None 반환
+        """
+        with log_storage.file_lock(self.guard_path):
+            if only_if_missing and os.path.exists(self.path):
+                return None
+            with log_storage.file_lock(self.lock_path):
+                previous = Aggregates.from_dict(log_storage.read_json(self.path)) if os.path.exists(self.path) else None
+                rebuilt = Aggregates.from_logs(log_storage.iter_logs(logs_dir))
+                rebuilt.epoch = (previous.epoch if previous else 0) + 1
+                log_storage.atomic_write_json(self.path, rebuilt.to_dict())
+        with self._lock:
+            self.pending = {}
+            self._pending_updates = 0
+        return rebuilt
+
+    def ensure_built(self, logs_dir: str = log_storage.LOGS_DIR):
+        """집계 파일이 없는데 로그가 있으면(도입 이전 데이터) 한 번 새로 만듦"""
+        if not self.enabled or os.path.exists(self.path) or not log_storage.count_logs(logs_dir):
+            return
+        print("📊 집계 파일이 없어 로그 전체로 새로 만듭니다...")
+        self.rebuild(logs_dir, only_if_missing=True)
+
+
+aggregate_store = AggregateStore()
+atexit.register(aggregate_store.flush)
+
+
+def update_guard():
+    return aggregate_store.update_guard()
+
+
+def record_update(previous: Optional[Dict], current: Dict):
+    aggregate_store.record_update(previous, current)
+
+
+def get_aggregates() -> Aggregates:
+    return aggregate_store.get()
+
+
+def format_duration(seconds: float) -> str:
+    minutes, seconds = divmod(int(round(seconds)), 60)
+    return f"{minutes}분 {seconds}초" if minutes else f"{seconds}초"
+
+
+def print_summary(summary: Dict):
+    print("📈 전체 통계:")
+    print(f"   👥 총 참여자 수: {summary['participants']}명 "
+          f"(완료 {summary['completed']}명, 완료율 {summary['completion_rate'] * 100:.1f}%)")
+    print(f"   💬 총 메시지 수: {summary['messages']}개")
+    print(f"   👤 사용자 메시지: {summary['user_messages']}개")
+    print(f"   🤖 AI 메시지: {summary['assistant_messages']}개")
+    print(f"   📊 평균 메시지/참여자: {summary['avg_messages']:.1f}개")
+    print(f"   ✏️ 메시지 길이: 평균 {summary['avg_length']:.0f}자, "
+          f"p50 {summary['length_p50']:.0f}자, p95 {summary['length_p95']:.0f}자")
+    if summary["completed"]:
+        print(f"   ⏱️ 대화 시간: 평균 {format_duration(summary['avg_duration'])}, "
+              f"p50 {format_duration(summary['duration_p50'])}, p95 {format_duration(summary['duration_p95'])}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="R.A.I. 대화 통계 집계")
+    parser.add_argument("command", nargs="?", choices=["show", "rebuild"], default="show")
+    parser.add_argument("--logs-dir", default=log_storage.LOGS_DIR)
+    parser.add_argument("--firestore", action="store_true", help="로컬 집계 대신 Firestore 요약 문서 사용")
+    args = parser.parse_args()
+
+    if args.firestore:
+        from firestore_handler import firestore_handler
+        if not firestore_handler.is_available():
+            raise SystemExit("❌ Firestore 연결 불가능. Firebase 설정을 확인해주세요.")
+
+    if args.command == "rebuild":
+        start = time.perf_counter()
+        if args.firestore:
+            rebuilt = firestore_handler.rebuild_aggregates()
+        else:
+            rebuilt = aggregate_store.rebuild(args.logs_dir)
+        print(f"✅ 집계 재생성 완료: 참여자 {rebuilt.counters['participants']}명, "
+              f"{time.perf_counter() - start:.2f}초")
+    stats = firestore_handler.get_aggregates() if args.firestore else get_aggregates()
+    if stats is None:
+        raise SystemExit("❌ 요약 문서가 없습니다. python aggregates.py rebuild --firestore 로 만드세요.")
+    print_summary(stats.summary())
@@ -9,266 +9,336 @@ Run with:
 
 import streamlit as st
 import random
-import json
 import os
-from datetime import datetime
-from chatbot_core import get_completion, dumps_history, loads_history, client, DEFAULT_SYSTEM_PROMPT, MODEL
+import time
+import uuid
+from chatbot_core import stream_completion
+from metrics import metrics, new_turn_id
+import rerun_profiler
+import log_storage
+import aggregates
+import session_memory
 from azure.ai.inference.models import SystemMessage, UserMessage, AssistantMessage
 
-# Firestore 핸들러를 안전하게 import
-try:
-    from firestore_handler import firestore_handler
-    FIRESTORE_AVAILABLE = True
-except Exception as e:
-    print(f"⚠️ Firestore 모듈 로드 실패: {str(e)}")
-    firestore_handler = None
-    FIRESTORE_AVAILABLE = False
+# 로그 저장/통계 함수 (Streamlit 스크립트 밖에서도 쓰이도록 별도 모듈로 분리)
+from conversation_log import (
+    save_conversation_log,
+    get_conversation_stats,
+    get_aggregates,
+    FIRESTORE_AVAILABLE,
+    firestore_handler,
+)
 
 st.set_page_config(page_title="R.A.I. – Rebellious Chatbot", page_icon="😈", layout="centered")
 
-# --- 로그 저장 함수 --------------------------------------------------------
-def save_conversation_log(participant_code, history, conversation_end=False):
-    """참여자별 대화 로그를 저장하는 함수 (로컬 + Firestore)"""
-    # 로컬 JSON 파일 저장
-    local_success = save_local_log(participant_code, history, conversation_end)
-    
-    # Firestore 저장
-    firestore_success = save_firestore_log(participant_code, history, conversation_end)
-    
-    return local_success or firestore_success
+# --- 로컬 로그 복구 (서버 프로세스당 한 번) ---------------------------------
+@st.cache_resource
+def recover_local_logs_once():
+    """중단된 쓰기로 남은 임시 파일을 정리하고 통계 집계를 준비
 
-def save_local_log(participant_code, history, conversation_end=False):
-    """로컬 JSON 파일에 저장"""
-    try:
-        # logs 디렉토리가 없으면 생성
-        os.makedirs("logs", exist_ok=True)
-        
-        # 로그 파일 경로
-        log_file = f"logs/participant_{participant_code}.json"
-        
-        # 현재 시간
-        timestamp = datetime.now().isoformat()
-        
-        # 대화 내용을 JSON 형태로 변환
-        conversation_data = []
-        for msg in history:
-            if isinstance(msg, SystemMessage):
-                continue  # 시스템 메시지는 로그에 포함하지 않음
-            conversation_data.append({
-                "role": msg.role,
-                "content": msg.content,
-                "timestamp": timestamp if msg == history[-1] else None  # 마지막 메시지만 타임스탬프
-            })
-        
-        # 로그 데이터 구조
-        log_data = {
-            "participant_code": participant_code,
-            "conversation_start": timestamp if not os.path.exists(log_file) else None,
-            "conversation_end": timestamp if conversation_end else None,
-            "last_updated": timestamp,
-            "message_count": len(conversation_data),
-            "conversation": conversation_data
-        }
-        
-        # 기존 로그가 있다면 업데이트, 없다면 새로 생성
-        if os.path.exists(log_file):
-            with open(log_file, 'r', encoding='utf-8') as f:
-                existing_data = json.load(f)
-            log_data["conversation_start"] = existing_data.get("conversation_start", timestamp)
-        
-        # 로그 파일에 저장
-        with open(log_file, 'w', encoding='utf-8') as f:
-            json.dump(log_data, f, ensure_ascii=False, indent=2)
-            
-        return True
-    except Exception as e:
-        st.error(f"로컬 로그 저장 중 오류 발생: {str(e)}")
-        return False
-
-def save_firestore_log(participant_code, history, conversation_end=False):
-    """Firestore에 저장"""
-    try:
-        # Firestore가 사용 가능하지 않으면 조용히 실패
-        if not FIRESTORE_AVAILABLE or not firestore_handler or not firestore_handler.is_available():
-            return False
-            
-        # 대화 데이터 변환
-        conversation_data = []
-        for msg in history:
-            if isinstance(msg, SystemMessage):
-                continue
-            conversation_data.append({
-                "role": msg.role,
-                "content": msg.content,
-                "timestamp": datetime.now().isoformat() if msg == history[-1] else None
-            })
-        
-        # Firestore에 저장
-        return firestore_handler.save_conversation(participant_code, conversation_data, conversation_end)
-        
-    except Exception as e:
-        # 오류를 출력하지만 앱은 계속 실행
-        print(f"Firestore 저장 중 오류 발생: {str(e)}")
-        return False
-
-def get_conversation_stats():
-    """전체 대화 통계를 반환하는 함수 (Firestore 우선, 로컬 백업)"""
-    # Firestore에서 통계 가져오기 시도
-    if FIRESTORE_AVAILABLE and firestore_handler and firestore_handler.is_available():
-        try:
-            firestore_participants, firestore_messages = firestore_handler.get_conversation_stats()
-            if firestore_participants > 0:
-                return firestore_participants, firestore_messages
-        except Exception as e:
-            print(f"Firestore 통계 조회 실패: {str(e)}")
-    
-    # Firestore가 실패하면 로컬 파일에서 통계 가져오기
-    try:
-        if not os.path.exists("logs"):
-            return 0, 0
-            
-        log_files = [f for f in os.listdir("logs") if f.startswith("participant_") and f.endswith(".json")]
-        total_participants = len(log_files)
-        total_messages = 0
-        
-        for log_file in log_files:
-            with open(f"logs/{log_file}", 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                total_messages += data.get("message_count", 0)
-        
-        return total_participants, total_messages
-    except:
-        return 0, 0
+    로그 전체 검사(깨진 파일 격리)는 로그 수에 비례하므로 여기서 하지 않습니다:
+        python log_storage.py recover
+    """
+    summary = log_storage.recover_logs()
+    aggregates.aggregate_store.ensure_built()
+    return summary
+
+recover_local_logs_once()
+
+# --- 채팅 렌더링 설정 ------------------------------------------------------
+# 한 번에 화면에 그리는 최근 턴 수 (1턴 = 사용자 + AI 메시지)
+HISTORY_WINDOW_TURNS = int(os.environ.get("RAI_HISTORY_WINDOW_TURNS", "10"))
+
+# --- 채팅 렌더링 헬퍼 ------------------------------------------------------
+def get_display_messages(history):
+    """화면 표시용 (role, avatar, markdown) 목록을 반환
+
+    history는 뒤에 추가만 되므로 이미 변환한 메시지는 더 이상 바뀌지 않습니다.
+    변환 결과를 히스토리 객체에 캐시해 두고 새로 추가된 메시지만 변환합니다.
+    (유휴 세션의 히스토리를 비울 때 캐시도 함께 비워짐, session_memory 참고)
+    """
+    cache = history.display_cache
+    if len(cache) > len(history):
+        # 히스토리가 리셋된 경우 캐시도 초기화
+        cache.clear()
+
+    for msg in history[len(cache):]:
+        if isinstance(msg, SystemMessage):
+            cache.append(None)  # 시스템 메시지는 표시하지 않음
+            continue
+        avatar = "🧑" if msg.role == "user" else "😈"
+        content = msg.content or ""
+        if len(cache) in st.session_state.get("partial_indices", ()):
+            content += "\n\n⏹️ *(답변 중단됨)*"
+        cache.append((msg.role, avatar, content))
+
+    return [item for item in cache if item is not None]
+
+def load_earlier_messages():
+    """'이전 대화 더 보기' 버튼 콜백: 표시 창을 한 페이지 늘림"""
+    st.session_state["history_window"] += HISTORY_WINDOW_TURNS
+    st.session_state["_rerun_cause"] = "load_earlier"
+
+def reset_history_window():
+    """표시 창을 기본 크기로 되돌림"""
+    st.session_state["history_window"] = HISTORY_WINDOW_TURNS
+    st.session_state["history"].display_cache.clear()
+
+# --- 답변 중단 ---------------------------------------------------------------
+def keep_partial_reply(stream):
+    """스트리밍하면서 지금까지 받은 내용을 세션에 보관 (중단 시 부분 답변 저장용)"""
+    chunks = st.session_state["_inflight"]["chunks"]
+    for chunk in stream:
+        chunks.append(chunk)
+        yield chunk
+
+def finish_inflight_reply():
+    """끝나지 못한 스트리밍 답변을 정리: 요청을 끊고 받은 만큼을 중단 표시와 함께 저장
 
-# --- Initialise session state ---------------------------------------------
-if "history" not in st.session_state:
-    st.session_state["history"] = []
+    Streamlit 은 rerun 요청(버튼 클릭 등)이 오면 실행 중이던 스크립트를 멈추므로,
+    이 함수가 호출될 때 이전 실행의 스트림 생성기는 멈춰 있는 상태입니다.
+    """
+    if "_inflight" not in st.session_state:
+        return
+    # 콜백은 track 보다 먼저 실행되므로 busy 로 복원하고, 저장이 끝날 때까지 비우지 못하게 함
+    with session_memory.busy(st.session_state) as history:
+        if history.spilled is not None:
+            return  # 복원 실패: 본 실행이 오류를 표시하고 다음 실행에서 다시 시도
+        inflight = st.session_state.pop("_inflight")
+        inflight["stream"].close()  # HTTP 스트림을 닫아 할당량/서버 스레드를 바로 반환
+        if inflight["chunks"]:
+            # 첫 토큰 전에 중단했으면 빈 답변은 남기지 않고 사용자 메시지만 저장
+            st.session_state["partial_indices"].add(len(history))
+            history.append(AssistantMessage(content="".join(inflight["chunks"])))
+        save_conversation_log(inflight["participant_code"], history, turn_id=inflight["turn_id"],
+                              partial_indices=st.session_state["partial_indices"])
+    metrics.observe("turn", time.perf_counter() - inflight["turn_start"],
+                    inflight["participant_code"], inflight["turn_id"], cancelled=True)
+
+def fail_inflight_reply(inflight, error: Exception):
+    """스트리밍 중 오류(429, 콘텐츠 필터, 네트워크 등): 사용자 중단과 구분해서 정리
+
+    받은 내용이 있으면 부분 답변으로 저장하고, 하나도 없으면 이번 사용자 메시지를
+    히스토리에서 빼서 다시 입력할 수 있게 합니다 (빈 답변은 저장하지 않음).
+    """
+    history = st.session_state["history"]
+    if inflight["chunks"]:
+        st.session_state["partial_indices"].add(len(history))
+        history.append(AssistantMessage(content="".join(inflight["chunks"])))
+        save_conversation_log(inflight["participant_code"], history, turn_id=inflight["turn_id"],
+                              partial_indices=st.session_state["partial_indices"])
+    elif history and history[-1].role == "user":
+        history.pop()
+    history.display_cache.clear()
+    metrics.observe("turn", time.perf_counter() - inflight["turn_start"],
+                    inflight["participant_code"], inflight["turn_id"], error=type(error).__name__)
+    print(f"❌ 답변 생성 실패: {str(error)}")
+    st.error("😈 답변을 받지 못했어요. 잠시 후 다시 입력해주세요.")
+
+def cancel_generation():
+    """'답변 중단' 버튼 콜백"""
+    finish_inflight_reply()
+    st.session_state["_rerun_cause"] = "cancel_generation"
+
+# --- Rerun 프로파일링 (opt-in: RAI_PROFILE=1 또는 ?profile=1) -------------
+# 세션 식별자와 직전 rerun 원인은 세션 상태에 보관
+if "_session_id" not in st.session_state:
+    st.session_state["_session_id"] = uuid.uuid4().hex
+    _rerun_cause = "initial"
+else:
+    _rerun_cause = st.session_state.pop("_rerun_cause", "interaction")
+
+with rerun_profiler.profile_rerun(
+    st.session_state["_session_id"],
+    st.session_state.get("participant_code"),
+    cause=_rerun_cause,
+    enabled=rerun_profiler.is_enabled(st.query_params),
+) as rerun_profile, session_memory.track(st.session_state):
+    # --- Initialise session state ---------------------------------------------
+    # history 는 track 이 SessionHistory 로 준비함 (오래 쉬었던 세션이면 저장본에서 복원)
+    if "history_window" not in st.session_state:
+        st.session_state["history_window"] = HISTORY_WINDOW_TURNS
+
+    # 사용자가 중단한 AI 답변의 history 인덱스
+    if "partial_indices" not in st.session_state:
+        st.session_state["partial_indices"] = set()
+
+    # 비워 둔 히스토리를 복원하지 못했으면 새 대화로 시작하지 않음 (기존 로그를 덮어쓰게 됨)
+    if st.session_state["history"].spilled is not None:
+        st.error("😈 이전 대화를 불러오지 못했어요. 잠시 후 새로고침해주세요.")
+        st.stop()
+
+    # 다른 상호작용(사이드바 조작 등)으로 스트리밍이 끊긴 경우에도 받은 만큼 저장
+    finish_inflight_reply()
     
-# 참여자 코드가 없으면 새로 생성 (대화 시작 시)
-if "participant_code" not in st.session_state:
-    st.session_state["participant_code"] = ''.join([str(random.randint(0, 9)) for _ in range(8)])
-
-# --- Sidebar settings ------------------------------------------------------
-with st.sidebar:
-    st.header("⚙️ Settings")
-    temperature = st.slider("Creativity (temperature)", 0.0, 1.0, 0.9, 0.05)
-    st.markdown("Feel free to adjust and then send another message ✉️")
+    # 참여자 코드가 없으면 새로 생성 (대화 시작 시)
+    if "participant_code" not in st.session_state:
+        st.session_state["participant_code"] = ''.join([str(random.randint(0, 9)) for _ in range(8)])
+
+    # --- Sidebar settings ------------------------------------------------------
+    with st.sidebar:
+        st.header("⚙️ Settings")
+        temperature = st.slider("Creativity (temperature)", 0.0, 1.0, 0.9, 0.05)
+        st.markdown("Feel free to adjust and then send another message ✉️")
     
-    st.divider()
+        st.divider()
     
-    # 참여자 정보 표시
-    st.subheader("👤 참여자 정보")
-    st.code(f"참여자 코드: {st.session_state['participant_code']}", language="text")
-    st.caption("이 코드로 대화 로그가 저장됩니다")
+        # 참여자 정보 표시
+        st.subheader("👤 참여자 정보")
+        st.code(f"참여자 코드: {st.session_state['participant_code']}", language="text")
+        st.caption("이 코드로 대화 로그가 저장됩니다")
     
-    # 전체 통계 표시
-    st.divider()
-    total_participants, total_messages = get_conversation_stats()
-    st.subheader("📊 로그 통계")
+        # 전체 통계 표시
+        st.divider()
+        total_participants, total_messages = get_conversation_stats()
+        st.subheader("📊 로그 통계")
     
-    # Firestore 연결 상태 표시
-    if FIRESTORE_AVAILABLE and firestore_handler and firestore_handler.is_available():
-        st.success("🔥 Firestore 연결됨")
-    else:
-        st.warning("⚠️ Firestore 미연결 (로컬 저장만)")
+        # Firestore 연결 상태 표시
+        if FIRESTORE_AVAILABLE and firestore_handler and firestore_handler.is_available():
+            st.success("🔥 Firestore 연결됨")
+        else:
+            st.warning("⚠️ Firestore 미연결 (로컬 저장만)")
     
-    st.metric("총 참여자 수", total_participants)
-    st.metric("총 메시지 수", total_messages)
+        st.metric("총 참여자 수", total_participants)
+        st.metric("총 메시지 수", total_messages)
+        stats_summary = get_aggregates().summary()
+        if stats_summary["participants"]:
+            st.caption(f"완료율 {stats_summary['completion_rate'] * 100:.0f}% · "
+                       f"평균 메시지 길이 {stats_summary['avg_length']:.0f}자")
     
-    # Firestore 백업 버튼
-    if FIRESTORE_AVAILABLE and firestore_handler and firestore_handler.is_available():
-        if st.button("💾 Firestore 백업"):
-            firestore_handler.backup_to_local()
+        # Firestore 백업 버튼
+        if FIRESTORE_AVAILABLE and firestore_handler and firestore_handler.is_available():
+            if st.button("💾 Firestore 백업"):
+                firestore_handler.backup_to_local()
     
-    st.divider()
+        st.divider()
     
-    if st.button("🔄 Reset Conversation"):
-        # 현재 대화를 로그에 저장하고 리셋
-        if st.session_state["history"]:
-            save_conversation_log(st.session_state["participant_code"], st.session_state["history"])
-        st.session_state["history"] = []
-        st.rerun()
+        if st.button("🔄 Reset Conversation"):
+            # 현재 대화를 로그에 저장하고 리셋
+            if st.session_state["history"]:
+                save_conversation_log(st.session_state["participant_code"], st.session_state["history"],
+                                      partial_indices=st.session_state["partial_indices"])
+            st.session_state["history"].clear()
+            st.session_state["partial_indices"] = set()
+            reset_history_window()
+            st.session_state["_rerun_cause"] = "reset"
+            st.rerun()
     
-    if st.button("🏁 End Conversation", type="primary"):
-        # 대화 종료 시 로그 저장
-        if st.session_state["history"]:
-            save_conversation_log(st.session_state["participant_code"], st.session_state["history"], conversation_end=True)
+        if st.button("🏁 End Conversation", type="primary"):
+            # 대화 종료 시 로그 저장
+            if st.session_state["history"]:
+                save_conversation_log(st.session_state["participant_code"], st.session_state["history"], conversation_end=True,
+                                      partial_indices=st.session_state["partial_indices"])
         
-        # 현재 참여자 코드를 대화 코드로 사용
-        st.session_state["conversation_code"] = st.session_state["participant_code"]
-        st.session_state["history"] = []
-        st.session_state["show_code_page"] = True
-        st.rerun()
-
-# --- 코드 표시 페이지 또는 채팅 페이지 -----------------------------------
-if st.session_state.get("show_code_page", False):
-    # 코드 표시 페이지
-    st.title("🎉 대화가 종료되었습니다!")
+            # 현재 참여자 코드를 대화 코드로 사용
+            st.session_state["conversation_code"] = st.session_state["participant_code"]
+            st.session_state["history"].clear()
+            st.session_state["partial_indices"] = set()
+            reset_history_window()
+            st.session_state["show_code_page"] = True
+            st.session_state["_rerun_cause"] = "end_conversation"
+            st.rerun()
+
+    # --- 코드 표시 페이지 또는 채팅 페이지 -----------------------------------
+    if st.session_state.get("show_code_page", False):
+        # 코드 표시 페이지
+        st.title("🎉 대화가 종료되었습니다!")
     
-    st.markdown("### 📋 당신의 참여자 코드")
-    st.code(st.session_state.get("conversation_code", ""), language="text")
-    st.caption("위의 복사 버튼을 클릭하여 코드를 복사하세요")
-    st.info("💾 이 코드로 대화 로그가 저장되었습니다!")
+        st.markdown("### 📋 당신의 참여자 코드")
+        st.code(st.session_state.get("conversation_code", ""), language="text")
+        st.caption("위의 복사 버튼을 클릭하여 코드를 복사하세요")
+        st.info("💾 이 코드로 대화 로그가 저장되었습니다!")
     
-    st.markdown("---")
+        st.markdown("---")
     
-    col1, col2 = st.columns(2)
-    with col1:
-        if st.button("🔄 새로운 대화 시작", type="primary"):
-            # 새로운 참여자 코드 생성
-            st.session_state["participant_code"] = ''.join([str(random.randint(0, 9)) for _ in range(8)])
-            st.session_state["show_code_page"] = False
-            st.rerun()
+        col1, col2 = st.columns(2)
+        with col1:
+            if st.button("🔄 새로운 대화 시작", type="primary"):
+                # 새로운 참여자 코드 생성
+                st.session_state["participant_code"] = ''.join([str(random.randint(0, 9)) for _ in range(8)])
+                st.session_state["show_code_page"] = False
+                st.session_state["_rerun_cause"] = "new_conversation"
+                st.rerun()
     
-    with col2:
-        if st.button("📥 코드 저장됨"):
-            st.session_state["show_code_page"] = False
-            st.rerun()
+        with col2:
+            if st.button("📥 코드 저장됨"):
+                st.session_state["show_code_page"] = False
+                st.session_state["_rerun_cause"] = "code_saved"
+                st.rerun()
 
-else:
-    # 기존 채팅 페이지
-    st.title("😈 R.A.I. – Your Rebellious AI Sidekick")
+    else:
+        # 기존 채팅 페이지
+        st.title("😈 R.A.I. – Your Rebellious AI Sidekick")
 
-    # --- Chat display ----------------------------------------------------------
-    # 기존 메시지들 표시
-    for msg in st.session_state.history:
-        if isinstance(msg, SystemMessage):
-            continue  # don't show system prompt
-        avatar = "🧑" if msg.role == "user" else "😈"
-        with st.chat_message(msg.role, avatar=avatar):
-            st.write(msg.content)
-
-    # --- 사용자 입력 처리 (맨 아래) ------------------------------------------
-    user_text = st.chat_input("Type something… if you dare!")
-    if user_text:
-        # 사용자 메시지를 히스토리에 추가하고 즉시 표시
-        st.session_state.history.append(UserMessage(content=user_text))
+        # --- Chat display ----------------------------------------------------------
+        # 기존 메시지들 중 최근 N턴만 표시 (긴 대화의 렌더링/전송 비용 제한)
+        display_messages = get_display_messages(st.session_state.history)
+        window_start = max(0, len(display_messages) - st.session_state["history_window"] * 2)
+        if window_start > 0:
+            st.button(
+                f"⬆️ 이전 대화 더 보기 ({window_start}개 숨김)",
+                on_click=load_earlier_messages,  # 콜백으로 처리하여 추가 rerun 없음
+            )
+
+        for role, avatar, content in display_messages[window_start:]:
+            with st.chat_message(role, avatar=avatar):
+                st.markdown(content)
+
+        # --- 사용자 입력 처리 (맨 아래) ------------------------------------------
+        user_text = st.chat_input("Type something… if you dare!")
+        if user_text:
+            rerun_profile.label("chat_input")
+            participant_code = st.session_state["participant_code"]
+            turn_id = new_turn_id()
+            turn_start = time.perf_counter()
+
+            # 사용자 메시지를 히스토리에 추가하고 즉시 표시
+            st.session_state.history.append(UserMessage(content=user_text))
         
-        # 사용자 메시지 표시
-        with st.chat_message("user", avatar="🧑"):
-            st.write(user_text)
+            # 사용자 메시지 표시
+            with st.chat_message("user", avatar="🧑"):
+                st.write(user_text)
         
-        # AI 응답 생성 및 표시
-        with st.chat_message("assistant", avatar="😈"):
-            with st.spinner("R.A.I. is cooking up trouble…"):
-                # API 직접 호출하여 응답 생성
-                response = client.complete(
-                    messages=[SystemMessage(content=DEFAULT_SYSTEM_PROMPT)] + st.session_state.history,
-                    model=MODEL,
+            # AI 응답 생성 및 표시 (스트리밍으로 첫 토큰부터 바로 출력)
+            with st.chat_message("assistant", avatar="😈"):
+                stream = stream_completion(
+                    st.session_state.history,
                     temperature=temperature,  # 사이드바에서 설정한 값 사용
-                    top_p=0.95,
-                    max_tokens=1024,
+                    participant_code=participant_code,
+                    turn_id=turn_id,
                 )
-                
-                assistant_reply = response.choices[0].message.content
-                st.session_state.history.append(AssistantMessage(content=assistant_reply))
-                st.write(assistant_reply)
-        
-        # 대화 로그 실시간 저장
-        save_conversation_log(st.session_state["participant_code"], st.session_state["history"])
+                st.session_state["_inflight"] = {
+                    "stream": stream,
+                    "chunks": [],
+                    "participant_code": participant_code,
+                    "turn_id": turn_id,
+                    "turn_start": turn_start,
+                }
+                # 누르면 rerun 이 일어나며 이 실행은 멈추고, 콜백이 부분 답변을 저장
+                cancel_slot = st.empty()
+                cancel_slot.button("⏹️ 답변 중단", key="cancel_generation", on_click=cancel_generation)
+                stream_error = None
+                with st.spinner("R.A.I. is cooking up trouble…"):
+                    try:
+                        assistant_reply = st.write_stream(keep_partial_reply(stream))
+                    except Exception as e:
+                        # rerun/중단 신호는 Exception 이 아니므로 여기서 잡히지 않음
+                        stream_error = e
+                    inflight = st.session_state.pop("_inflight", None)
+                cancel_slot.empty()
+                if stream_error is not None:
+                    fail_inflight_reply(inflight, stream_error)
+                else:
+                    st.session_state.history.append(AssistantMessage(content=assistant_reply))
+
+            if stream_error is None:
+                # 대화 로그 실시간 저장
+                save_conversation_log(participant_code, st.session_state["history"], turn_id=turn_id,
+                                      partial_indices=st.session_state["partial_indices"])
+                metrics.observe("turn", time.perf_counter() - turn_start, participant_code, turn_id)
         
-        # 새 메시지 후 페이지 새로고침
-        st.rerun()
+            # 새 메시지는 위에서 이미 화면에 그렸으므로 별도의 st.rerun()은 하지 않음
+            # (턴 당 한 번만 렌더링, 사이드바 통계는 다음 상호작용 때 갱신)
 
 # --- Persist conversation --------------------------------------------------
 # (optionally, you could write st.session_state.history to a database here)
@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+# =============================================================
+# File: backup_store.py
+# 내용 주소 기반(content-addressed) 압축 백업 저장소
+# =============================================================
+"""
+firestore_backup.py 를 실행할 때마다 모든 참여자 데이터를 새 폴더에 그대로 다시
+저장하는 대신, 참여자별 데이터를 해시로 식별하여 한 번만 압축 저장하는 백업 저장소
+
+구조:
+    backup_store/
+      objects/ab/abcdef....json.zst   # 참여자 문서 (zstd 또는 gzip 압축 JSON)
+      runs/20250728_055634.json       # 실행별 manifest {참여자코드: 해시}
+
+- 변경되지 않은 참여자는 기존 object 를 재사용하므로 디스크 사용량과 쓰기 시간은
+  실행 횟수가 아니라 바뀐 데이터 양에 비례합니다.
+- zstandard 패키지가 있으면 zstd, 없으면 gzip 으로 압축합니다.
+- 해시는 키를 정렬한 정규화 JSON 으로 계산하고, object 에는 원래 키 순서를 남겨
+  materialize 결과가 원래 백업 폴더와 바이트 단위로 같게 합니다.
+
+사용법:
+    python backup_store.py store                     # Firestore에서 읽어 저장소에 백업
+    python backup_store.py import firestore_backup_20250728_055634   # 기존 백업 폴더 가져오기
+    python backup_store.py list                      # 저장된 실행 목록
+    python backup_store.py materialize 20250728_055634 [대상폴더]    # 기존 폴더 구조로 복원
+"""
+
+import os
+import json
+import gzip
+import hashlib
+from datetime import datetime
+from typing import Dict, List, Optional
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    zstandard = None
+    ZSTD_AVAILABLE = False
+
+STORE_DIR = "backup_store"
+
+
+def canonical_json(data: Dict) -> bytes:
+    """해시 계산용 정규화 JSON (키 정렬, 공백 없음, UTF-8)"""
+    return json.dumps(data, ensure_ascii=False, sort_keys=True, separators=(',', ':')).encode('utf-8')
+
+
+def compact_json(data: Dict) -> bytes:
+    """object 에 저장할 JSON (원래 키 순서 유지, 공백 없음, UTF-8)"""
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def _compress(payload: bytes):
+    """(압축된 바이트, 확장자) 반환"""
+    if ZSTD_AVAILABLE:
+        return zstandard.ZstdCompressor(level=10).compress(payload), "zst"
+    return gzip.compress(payload, compresslevel=6, mtime=0), "gz"
+
+
+def _decompress(blob: bytes, ext: str) -> bytes:
+    if ext == "zst":
+        if not ZSTD_AVAILABLE:
+            raise RuntimeError("zstd로 압축된 object 입니다. pip install zstandard 로 설치하세요.")
+        return zstandard.ZstdDecompressor().decompress(blob)
+    return gzip.decompress(blob)
+
+
+class BackupStore:
+    """참여자 문서를 해시 단위로 한 번만 저장하는 백업 저장소"""
+
+    def __init__(self, root: str = STORE_DIR):
+        self.root = root
+        self.objects_dir = os.path.join(root, "objects")
+        self.runs_dir = os.path.join(root, "runs")
+        os.makedirs(self.objects_dir, exist_ok=True)
+        os.makedirs(self.runs_dir, exist_ok=True)
+
+    # --- object ------------------------------------------------------------
+    def _find_object(self, digest: str) -> Optional[str]:
+        """해시에 해당하는 object 경로 (압축 형식과 무관하게 검색)"""
+        folder = os.path.join(self.objects_dir, digest[:2])
+        for ext in ("zst", "gz"):
+            path = os.path.join(folder, f"{digest}.json.{ext}")
+            if os.path.exists(path):
+                return path
+        return None
+
+    def put(self, data: Dict) -> tuple:
+        """문서를 저장하고 (해시, 새로 저장했는지) 반환"""
+        digest = hashlib.sha256(canonical_json(data)).hexdigest()
+        if self._find_object(digest):
+            return digest, False
+
+        blob, ext = _compress(compact_json(data))
+        folder = os.path.join(self.objects_dir, digest[:2])
+        os.makedirs(folder, exist_ok=True)
+        path = os.path.join(folder, f"{digest}.json.{ext}")
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(blob)
+        os.replace(tmp_path, path)
+        return digest, True
+
+    def get(self, digest: str) -> Dict:
+        """해시로 문서를 읽음"""
+        path = self._find_object(digest)
+        if not path:
+            raise FileNotFoundError(f"object {digest} 를 찾을 수 없습니다.")
+        with open(path, 'rb') as f:
+            blob = f.read()
+        return json.loads(_decompress(blob, path.rsplit(".", 1)[1]))
+
+    # --- run manifest --------------------------------------------------------
+    def store_run(self, conversations: Dict[str, Dict], run_id: Optional[str] = None,
+                  source: str = "firestore") -> Dict:
+        """참여자 데이터 전체를 저장하고 실행 manifest 를 기록"""
+        from firestore_backup import convert_firestore_data
+
+        run_id = run_id or datetime.now().strftime("%Y%m%d_%H%M%S")
+        participants = {}
+        new_objects = 0
+        new_bytes = 0
+        for participant_code, data in conversations.items():
+            digest, created = self.put(convert_firestore_data(data))
+            participants[participant_code] = digest
+            if created:
+                new_objects += 1
+                new_bytes += os.path.getsize(self._find_object(digest))
+
+        manifest = {
+            "run_id": run_id,
+            "created_at": datetime.now().isoformat(),
+            "source": source,
+            "participant_count": len(participants),
+            "new_objects": new_objects,
+            "new_bytes": new_bytes,
+            "participants": participants,
+        }
+        manifest_path = os.path.join(self.runs_dir, f"{run_id}.json")
+        tmp_path = f"{manifest_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, manifest_path)
+        return manifest
+
+    def list_runs(self) -> List[Dict]:
+        """저장된 실행 manifest 목록 (오래된 순)"""
+        runs = []
+        for filename in sorted(os.listdir(self.runs_dir)):
+            if filename.endswith(".json"):
+                with open(os.path.join(self.runs_dir, filename), 'r', encoding='utf-8') as f:
+                    runs.append(json.load(f))
+        return runs
+
+    def load_run(self, run_id: str) -> Dict[str, Dict]:
+        """실행 하나의 참여자 데이터 전체를 복원 {참여자코드: 문서}"""
+        manifest_path = os.path.join(self.runs_dir, f"{run_id}.json")
+        if not os.path.exists(manifest_path):
+            raise FileNotFoundError(f"실행 {run_id} 의 manifest 가 없습니다.")
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        return {code: self.get(digest) for code, digest in manifest["participants"].items()}
+
+    def materialize(self, run_id: str, target_folder: Optional[str] = None) -> str:
+        """실행 하나를 firestore_backup.py 와 같은 폴더 구조로 복원"""
+        from firestore_backup import save_json_backup, save_csv_summary, save_excel_report
+
+        conversations = self.load_run(run_id)
+        target_folder = target_folder or f"firestore_backup_{run_id}"
+        os.makedirs(target_folder, exist_ok=True)
+        save_json_backup(conversations, target_folder)
+        save_csv_summary(conversations, target_folder)
+        save_excel_report(conversations, target_folder)
+        return target_folder
+
+    def disk_usage(self) -> int:
+        """저장소 전체 바이트 수"""
+        total = 0
+        for dirpath, _, filenames in os.walk(self.root):
+            total += sum(os.path.getsize(os.path.join(dirpath, name)) for name in filenames)
+        return total
+
+
+def load_backup_folder(backup_folder: str) -> Dict[str, Dict]:
+    """기존 백업 폴더의 all_conversations.json (없으면 participants/) 을 읽음"""
+    json_file = os.path.join(backup_folder, "all_conversations.json")
+    if os.path.exists(json_file):
+        with open(json_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    conversations = {}
+    participants_folder = os.path.join(backup_folder, "participants")
+    for filename in sorted(os.listdir(participants_folder)):
+        if filename.startswith("participant_") and filename.endswith(".json"):
+            with open(os.path.join(participants_folder, filename), 'r', encoding='utf-8') as f:
+                conversations[filename[len("participant_"):-len(".json")]] = json.load(f)
+    return conversations
+
+
+def print_manifest(manifest: Dict):
+    print(f"✅ 실행 {manifest['run_id']}: 참여자 {manifest['participant_count']}명, "
+          f"새 object {manifest['new_objects']}개 ({manifest['new_bytes'] / 1024:.1f}KB)")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="R.A.I. 내용 주소 기반 백업 저장소")
+    parser.add_argument("--store-dir", default=STORE_DIR, help="저장소 디렉토리")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("store", help="Firestore 전체 데이터를 저장소에 백업")
+    import_parser = sub.add_parser("import", help="기존 firestore_backup_* 폴더를 저장소로 가져오기")
+    import_parser.add_argument("folders", nargs="+")
+    sub.add_parser("list", help="저장된 실행 목록")
+    materialize_parser = sub.add_parser("materialize", help="실행을 기존 백업 폴더 구조로 복원")
+    materialize_parser.add_argument("run_id")
+    materialize_parser.add_argument("target", nargs="?")
+    args = parser.parse_args()
+
+    store = BackupStore(args.store_dir)
+
+    if args.command == "store":
+        from firestore_backup import backup_all_conversations
+        conversations = backup_all_conversations()
+        if not conversations:
+            print("❌ 백업할 데이터가 없습니다.")
+        else:
+            print_manifest(store.store_run(conversations))
+    elif args.command == "import":
+        for folder in args.folders:
+            # 폴더 이름의 타임스탬프를 실행 ID로 사용
+            run_id = os.path.basename(os.path.normpath(folder)).replace("firestore_backup_", "")
+            try:
+                conversations = load_backup_folder(folder)
+            except Exception as e:
+                print(f"⚠️ {folder} 건너뜀 (읽기 실패: {str(e)})")
+                continue
+            print_manifest(store.store_run(conversations, run_id=run_id, source=folder))
+    elif args.command == "list":
+        for run in store.list_runs():
+            print(f"  {run['run_id']}  참여자 {run['participant_count']:>6}명  "
+                  f"새 object {run['new_objects']:>6}개  ({run['source']})")
+        print(f"💽 저장소 크기: {store.disk_usage() / 1024:.1f}KB")
+    elif args.command == "materialize":
+        folder = store.materialize(args.run_id, args.target)
+        print(f"📁 복원 완료: {os.path.abspath(folder)}")
@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+# =============================================================
+# File: benchmark.py
+# 로그 저장 / 통계 / 내보내기 경로 마이크로벤치마크
+# =============================================================
+"""
+합성 대화 데이터(한글 + 이모지 위주)를 만들어 저장/내보내기 핫패스의
+실행 시간과 최대 메모리를 측정하고, JSON 기준값(baseline)과 비교합니다.
+
+측정 대상:
+- conversation_log.save_local_log (턴 수 증가에 따라)
+- conversation_log.get_conversation_stats (로컬 / Firestore)
+- FirestoreHandler.save_conversation (fake_firestore 사용)
+- log_analyzer.analyze_logs / export_to_csv
+- firestore_backup.save_json_backup / save_csv_summary / save_excel_report
+
+사용법:
+    python benchmark.py                          # 측정 후 기준값과 비교
+    python benchmark.py --save                   # 측정 결과를 기준값으로 저장
+    python benchmark.py --participants 500 --turns 30 --only backup
+    python benchmark.py --threshold 0.5          # 50% 이상 느려지면 실패
+
+기준값과 비교해 시간 또는 메모리가 threshold 이상 증가한 항목이 있으면
+종료 코드 1로 끝납니다. 기준값은 같은 머신에서 만든 것과 비교하세요.
+"""
+
+import os
+import io
+import sys
+import json
+import random
+import shutil
+import argparse
+import tempfile
+import statistics
+import tracemalloc
+from contextlib import contextmanager, redirect_stdout
+from datetime import datetime, timedelta
+from time import perf_counter
+from typing import Callable, Dict, List, Optional
+
+from synthetic_text import random_text
+
+BASELINE_FILE = "benchmark_baseline.json"
+
+# --- 합성 데이터 생성 -------------------------------------------------------
+
+def generate_conversations(participants: int, turns: int, seed: int = 42) -> Dict[str, Dict]:
+    """Firestore 문서와 같은 형태의 합성 대화 데이터 생성 {참여자코드: 문서}"""
+    rng = random.Random(seed)
+    base = datetime(2025, 7, 28, 5, 0, 0)
+    conversations = {}
+    for _ in range(participants):
+        code = "".join(str(rng.randint(0, 9)) for _ in range(8))
+        start = base + timedelta(minutes=rng.randrange(60 * 24 * 30))
+        conversation = []
+        for turn in range(rng.randint(max(1, turns // 2), turns)):
+            conversation.append({"role": "user", "content": random_text(rng, 2, 15), "timestamp": None})
+            conversation.append({"role": "assistant", "content": random_text(rng), "timestamp": None})
+        end = start + timedelta(seconds=30 * len(conversation))
+        conversation[-1]["timestamp"] = end.isoformat()
+        finished = rng.random() < 0.7
+        conversations[code] = {
+            "participant_code": code,
+            "conversation_start": start,
+            "conversation_end": end if finished else None,
+            "last_updated": end,
+            "message_count": len(conversation),
+            "conversation": conversation,
+            "created_at": start,
+            "updated_at": end,
+        }
+    return conversations
+
+
+def write_local_logs(conversations: Dict[str, Dict], logs_dir: str = "logs"):
+    """합성 데이터를 로컬 로그 형식(log_storage 의 샤드 경로)으로 기록"""
+    import log_storage
+    for code, data in conversations.items():
+        log_data = {
+            "participant_code": code,
+            "conversation_start": data["conversation_start"].isoformat(),
+            "conversation_end": data["conversation_end"].isoformat() if data["conversation_end"] else None,
+            "last_updated": data["last_updated"].isoformat(),
+            "message_count": data["message_count"],
+            "conversation": data["conversation"],
+        }
+        path = log_storage.log_path(code, logs_dir)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(log_data, f, ensure_ascii=False, indent=2)
+
+
+def to_history(conversation: List[Dict]) -> List:
+    """로그 메시지 목록을 Azure SDK 메시지 객체 목록으로 변환"""
+    from azure.ai.inference.models import UserMessage, AssistantMessage
+    return [
+        (UserMessage if m["role"] == "user" else AssistantMessage)(content=m["content"])
+        for m in conversation
+    ]
+
+
+# --- 측정 --------------------------------------------------------------------
+@contextmanager
+def quiet():
+    """측정 대상 함수의 print 출력을 숨김"""
+    with redirect_stdout(io.StringIO()):
+        yield
+
+
+def measure(fn: Callable, setup: Optional[Callable] = None, repeat: int = 5) -> Dict:
+    """fn 의 실행 시간(중앙값/최솟값)과 최대 메모리 사용량을 측정
+
+    시간 측정과 메모리 측정은 tracemalloc 오버헤드가 섞이지 않도록 분리합니다.
+    """
+    times = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        with quiet():
+            start = perf_counter()
+            fn()
+            times.append(perf_counter() - start)
+
+    if setup:
+        setup()
+    tracemalloc.start()
+    with quiet():
+        fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "median_s": statistics.median(times),
+        "min_s": min(times),
+        "peak_kb": peak / 1024,
+        "repeat": repeat,
+    }
+
+
+def build_cases(args) -> List[tuple]:
+    """(이름, setup, fn) 벤치마크 케이스 목록 생성 (현재 작업 디렉토리 기준)"""
+    import conversation_log
+    import log_analyzer
+    import firestore_backup
+    from fake_firestore import FakeFirestoreClient
+    from firestore_handler import FirestoreHandler
+
+    conversations = generate_conversations(args.participants, args.turns, args.seed)
+    codes = list(conversations)
+    write_local_logs(conversations)
+
+    fake_handler = FirestoreHandler(db=FakeFirestoreClient())
+    for code, data in conversations.items():
+        fake_handler.db.collection('conversations').document(code).set(data)
+
+    def use_firestore(enabled: bool):
+        conversation_log.FIRESTORE_AVAILABLE = enabled
+        conversation_log.firestore_handler = fake_handler if enabled else None
+
+    cases = []
+
+    # save_local_log: 한 참여자의 대화가 길어질수록 매 턴 저장 비용
+    sample = max(conversations.values(), key=lambda d: d["message_count"])["conversation"]
+    for turns in sorted({10, 50, 200, args.turns}):
+        history = to_history((sample * (turns * 2 // len(sample) + 1))[:turns * 2])
+        cases.append((
+            f"save_local_log[turns={turns}]",
+            None,
+            lambda history=history: conversation_log.save_local_log("bench0000", history),
+        ))
+
+    cases.append((
+        f"get_conversation_stats[local,n={len(codes)}]",
+        lambda: use_firestore(False),
+        conversation_log.get_conversation_stats,
+    ))
+    cases.append((
+        f"get_conversation_stats[firestore,n={len(codes)}]",
+        lambda: use_firestore(True),
+        conversation_log.get_conversation_stats,
+    ))
+
+    sample_code = codes[0]
+    cases.append((
+        "FirestoreHandler.save_conversation",
+        None,
+        lambda: fake_handler.save_conversation(sample_code, conversations[sample_code]["conversation"]),
+    ))
+
+    cases.append((f"log_analyzer.analyze_logs[n={len(codes)}]", None, log_analyzer.analyze_logs))
+    cases.append((f"log_analyzer.export_to_csv[n={len(codes)}]", None, log_analyzer.export_to_csv))
+
+    backup_dir = "bench_backup"
+    os.makedirs(backup_dir, exist_ok=True)
+    for sink in ("save_json_backup", "save_csv_summary", "save_excel_report"):
+        fn = getattr(firestore_backup, sink)
+        cases.append((
+            f"firestore_backup.{sink}[n={len(codes)}]",
+            None,
+            lambda fn=fn: fn(conversations, backup_dir),
+        ))
+
+    return cases
+
+
+def compare(results: Dict, baseline: Dict, threshold: float) -> List[str]:
+    """기준값 대비 threshold 이상 나빠진 항목 목록 반환"""
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        for key in ("median_s", "peak_kb"):
+            if base[key] > 0 and result[key] > base[key] * (1 + threshold):
+                regressions.append(f"{name} {key}: {base[key]:.4f} → {result[key]:.4f} "
+                                   f"(+{(result[key] / base[key] - 1) * 100:.0f}%)")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="R.A.I. 저장/내보내기 경로 벤치마크")
+    parser.add_argument("--participants", type=int, default=200, help="합성 참여자 수")
+    parser.add_argument("--turns", type=int, default=20, help="참여자당 최대 턴 수")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--repeat", type=int, default=5, help="케이스별 반복 횟수")
+    parser.add_argument("--only", help="이름에 이 문자열이 포함된 케이스만 실행")
+    parser.add_argument("--baseline", default=BASELINE_FILE, help="기준값 JSON 파일")
+    parser.add_argument("--save", action="store_true", help="결과를 기준값으로 저장")
+    parser.add_argument("--threshold", type=float, default=0.25, help="허용 성능 저하 비율")
+    args = parser.parse_args()
+
+    # 계측 이벤트가 벤치마크 결과에 섞이지 않도록 비활성화 (모듈 import 전에 설정)
+    os.environ.setdefault("RAI_METRICS_DISABLED", "1")
+    # 합성 데이터가 실제 logs/.aggregates.json 에 합쳐지지 않도록, 그리고
+    # get_conversation_stats[local] 이 집계 파일이 아니라 로그 읽기 경로를 재도록 집계 비활성화
+    os.environ["RAI_AGGREGATES_DISABLED"] = "1"
+
+    baseline_path = os.path.abspath(args.baseline)
+    repo_dir = os.path.dirname(os.path.abspath(__file__))
+    if repo_dir not in sys.path:
+        sys.path.insert(0, repo_dir)
+
+    # 모든 함수가 상대 경로(logs/ 등)를 쓰므로 임시 디렉토리에서 실행
+    workdir = tempfile.mkdtemp(prefix="rai_bench_")
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    results = {}
+    try:
+        print(f"🏁 벤치마크 시작 (참여자 {args.participants}명, 최대 {args.turns}턴)")
+        print("=" * 72)
+        for name, setup, fn in build_cases(args):
+            if args.only and args.only not in name:
+                continue
+            results[name] = measure(fn, setup, args.repeat)
+            r = results[name]
+            print(f"  {name:<48} {r['median_s'] * 1000:10.2f}ms  {r['peak_kb']:10.1f}KB")
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+    print("=" * 72)
+
+    report = {
+        "created_at": datetime.now().isoformat(),
+        "params": {"participants": args.participants, "turns": args.turns, "seed": args.seed},
+        "results": results,
+    }
+
+    if args.save:
+        with open(baseline_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"💾 기준값 저장: {baseline_path}")
+        return
+
+    if not os.path.exists(baseline_path):
+        print("ℹ️ 기준값 파일이 없습니다. --save 로 먼저 생성하세요.")
+        return
+
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    if baseline.get("params") != report["params"]:
+        print("⚠️ 기준값과 측정 조건(participants/turns/seed)이 다릅니다.")
+
+    regressions = compare(results, baseline.get("results", {}), args.threshold)
+    if regressions:
+        print(f"❌ 성능 저하 감지 (허용치 {args.threshold * 100:.0f}%):")
+        for line in regressions:
+            print(f"   - {line}")
+        sys.exit(1)
+    print("✅ 기준값 대비 성능 저하 없음")
+
+
+if __name__ == "__main__":
+    main()
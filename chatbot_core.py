@@ -26,8 +26,9 @@ Usage example (CLI):
         print("R.A.I. ›", assistant)
 """
 
-import os, json, uuid
-from typing import List
+import os, json, uuid, time, math, threading
+from collections import OrderedDict, deque
+from typing import Dict, Iterator, List, Optional
 from azure.ai.inference import ChatCompletionsClient
 from azure.ai.inference.models import (
     SystemMessage,
@@ -36,6 +37,9 @@ from azure.ai.inference.models import (
 )
 from azure.core.credentials import AzureKeyCredential
 
+from metrics import metrics
+from prompt_similarity import prompt_cache, PROMPT_CACHE_ENABLED
+
 # ------------------------------------------------------------------
 # 🔑  Azure connection (reads environment variables once at import)
 # ------------------------------------------------------------------
@@ -58,33 +62,241 @@ DEFAULT_SYSTEM_PROMPT = (
     "obeying. Never be rude or harmful."
 )
 
+# ------------------------------------------------------------------
+# 📏  Adaptive output budget (max_tokens)
+# ------------------------------------------------------------------
+# Azure reserves `max_tokens` against the TPM quota for every request, so a
+# fixed 1024 over‑reserves for short banter. The budget is picked from the
+# recent completion lengths of the participant (or, until they have enough
+# replies, of everyone at the same conversation phase) with some headroom.
+MAX_TOKENS = int(os.environ.get("RAI_MAX_TOKENS", "1024"))
+MIN_MAX_TOKENS = int(os.environ.get("RAI_MIN_MAX_TOKENS", "256"))
+ADAPTIVE_MAX_TOKENS = os.environ.get("RAI_ADAPTIVE_MAX_TOKENS", "1") != "0"
+
+class ReplyBudget:
+    """Chooses `max_tokens` from recent reply lengths (thread‑safe)."""
+
+    HEADROOM = 1.5          # multiplier over the p95 reply length
+    MIN_SAMPLES = 3         # replies needed before a participant's own stats are used
+    WINDOW = 20             # recent replies kept per participant / phase
+    MAX_PARTICIPANTS = 10000
+
+    def __init__(self, floor: int = MIN_MAX_TOKENS, ceiling: int = MAX_TOKENS):
+        self.floor = min(floor, ceiling)
+        self.ceiling = ceiling
+        self._participants: "OrderedDict[str, deque]" = OrderedDict()
+        self._phases: Dict[str, deque] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def phase(history: List[dict]) -> str:
+        """Conversation phase from the number of user turns so far."""
+        turns = sum(1 for m in history if getattr(m, "role", None) == "user")
+        return "opening" if turns <= 1 else "early" if turns <= 5 else "late"
+
+    def choose(self, participant_code: Optional[str], history: List[dict]) -> int:
+        with self._lock:
+            samples = self._participants.get(participant_code) if participant_code else None
+            if not samples or len(samples) < self.MIN_SAMPLES:
+                samples = self._phases.get(self.phase(history))
+            if not samples or len(samples) < self.MIN_SAMPLES:
+                return self.ceiling
+            ordered = sorted(samples)
+        p95 = ordered[min(len(ordered) - 1, math.ceil(0.95 * len(ordered)) - 1)]
+        return max(self.floor, min(self.ceiling, math.ceil(p95 * self.HEADROOM)))
+
+    def record(self, participant_code: Optional[str], history: List[dict],
+               completion_tokens: int, budget: int, truncated: bool = False):
+        """Remember a finished reply; a reply cut off at the budget counts double."""
+        tokens = budget * 2 if truncated else completion_tokens
+        with self._lock:
+            self._phases.setdefault(self.phase(history), deque(maxlen=self.WINDOW)).append(tokens)
+            if participant_code:
+                samples = self._participants.pop(participant_code, None) or deque(maxlen=self.WINDOW)
+                samples.append(tokens)
+                self._participants[participant_code] = samples
+                while len(self._participants) > self.MAX_PARTICIPANTS:
+                    self._participants.popitem(last=False)
+
+reply_budget = ReplyBudget()
+
+def _max_tokens_for(participant_code: Optional[str], history: List[dict]) -> int:
+    return reply_budget.choose(participant_code, history) if ADAPTIVE_MAX_TOKENS else MAX_TOKENS
+
+def _record_budget(participant_code: Optional[str], history: List[dict], usage,
+                   budget: int, finish_reason: Optional[str]):
+    """Feed a finished reply into the budget.
+
+    Only the service's own token count is used: a character based guess
+    undercounts Korean text and would shrink budgets until replies get cut off.
+    """
+    if not ADAPTIVE_MAX_TOKENS:
+        return
+    truncated = finish_reason == "length"
+    tokens = getattr(usage, "completion_tokens", None)
+    if tokens is None and not truncated:
+        return
+    reply_budget.record(participant_code, history, tokens or 0, budget, truncated=truncated)
+
 # ------------------------------------------------------------------
 # 🚀  Core helper
 # ------------------------------------------------------------------
 
-def get_completion(user_text: str, history: List[dict]) -> str:
+def _first_turn_prompt(history: List[dict]) -> Optional[str]:
+    """Return the user text if `history` is a conversation's first turn."""
+    if len(history) == 1 and getattr(history[0], "role", None) == "user":
+        return history[0].content
+    return None
+
+def _cached_reply(prompt: Optional[str], participant_code: Optional[str],
+                  turn_id: Optional[str]) -> Optional[str]:
+    """Look up a near‑duplicate first‑turn prompt in the opt‑in reply cache."""
+    if not PROMPT_CACHE_ENABLED or not prompt:
+        return None
+    start = time.perf_counter()
+    found = prompt_cache.lookup(prompt)
+    metrics.observe("prompt_cache_lookup", time.perf_counter() - start, participant_code, turn_id,
+                    hit=found is not None, similarity=found[1] if found else None)
+    return found[0]["payload"] if found else None
+
+def _remember_reply(prompt: Optional[str], reply: str):
+    if PROMPT_CACHE_ENABLED and prompt and reply:
+        prompt_cache.add(prompt, reply)
+
+def get_completion(user_text: str, history: List[dict],
+                   participant_code: Optional[str] = None,
+                   turn_id: Optional[str] = None) -> str:
     """Return assistant reply and append it to `history` in‑place.
 
     Args:
         user_text:  latest user message content
         history:    running list of Azure‑style message dicts (User/Assistant)
+        participant_code, turn_id: optional labels for the metrics events
     Returns:
         assistant reply string
     """
     history.append(UserMessage(content=user_text))
 
-    response = client.complete(
-        messages=[SystemMessage(content=DEFAULT_SYSTEM_PROMPT)] + history,
-        model=MODEL,
-        temperature=0.9,          # a bit more randomness for cheeky tone
-        top_p=0.95,
-        max_tokens=1024,
-    )
+    prompt = _first_turn_prompt(history)
+    cached = _cached_reply(prompt, participant_code, turn_id)
+    if cached is not None:
+        history.append(AssistantMessage(content=cached))
+        return cached
+
+    max_tokens = _max_tokens_for(participant_code, history)
+    with metrics.span("complete", participant_code, turn_id, stream=False, max_tokens=max_tokens):
+        response = client.complete(
+            messages=[SystemMessage(content=DEFAULT_SYSTEM_PROMPT)] + history,
+            model=MODEL,
+            temperature=0.9,          # a bit more randomness for cheeky tone
+            top_p=0.95,
+            max_tokens=max_tokens,
+        )
+    metrics.record_usage(getattr(response, "usage", None), participant_code, turn_id)
 
     assistant_reply = response.choices[0].message.content
+    _record_budget(participant_code, history, getattr(response, "usage", None),
+                   max_tokens, getattr(response.choices[0], "finish_reason", None))
+    _remember_reply(prompt, assistant_reply)
     history.append(AssistantMessage(content=assistant_reply))
     return assistant_reply
 
+def stream_completion(history: List[dict], temperature: float = 0.9,
+                      participant_code: Optional[str] = None,
+                      turn_id: Optional[str] = None,
+                      system_prompt: Optional[str] = None,
+                      model: Optional[str] = None,
+                      details: Optional[dict] = None,
+                      max_tokens: Optional[int] = None) -> Iterator[str]:
+    """Stream the assistant reply for `history` chunk by chunk.
+
+    Records time‑to‑first‑token (`ttft`), total `complete` time and token
+    usage (requested via `stream_options.include_usage`, sent by the service
+    with the final update). The caller is
+    responsible for appending the joined reply to `history`.
+
+    `system_prompt` / `model` override DEFAULT_SYSTEM_PROMPT / MODEL (used by
+    replay.py). If `details` is given it is filled with ttft, latency, usage,
+    max_tokens, finish_reason, ok and cancelled once the stream ends.
+
+    `max_tokens` pins the output budget (replay.py / load_test.py, so runs
+    are reproducible); by default it is chosen by the adaptive ReplyBudget,
+    and pinned runs do not feed it.
+
+    Closing the generator early (`.close()`, e.g. the UI's stop button)
+    closes the underlying HTTP stream so the request stops consuming quota.
+
+    With RAI_PROMPT_CACHE=1, a first‑turn prompt that is a near‑duplicate of
+    an earlier one is answered from the prompt cache without an API call.
+    """
+    prompt = _first_turn_prompt(history)
+    cached = _cached_reply(prompt, participant_code, turn_id)
+    if cached is not None:
+        if details is not None:
+            details.update(ttft=0.0, latency=0.0, usage=None, max_tokens=max_tokens,
+                           finish_reason="stop", ok=True, cancelled=False, cached=True)
+        yield cached
+        return
+
+    start = time.perf_counter()
+    first_token = True
+    ttft = None
+    usage = None
+    ok = False
+    cancelled = False
+    finish_reason = None
+    response = None
+    chunks = []
+    adaptive = max_tokens is None
+    if adaptive:
+        max_tokens = _max_tokens_for(participant_code, history)
+    try:
+        response = client.complete(
+            messages=[SystemMessage(content=system_prompt or DEFAULT_SYSTEM_PROMPT)] + history,
+            model=model or MODEL,
+            temperature=temperature,
+            top_p=0.95,
+            max_tokens=max_tokens,
+            stream=True,
+            # Azure only sends `usage` on a streamed reply when asked to
+            model_extras={"stream_options": {"include_usage": True}},
+        )
+        for update in response:
+            usage = getattr(update, "usage", None) or usage
+            if not update.choices:
+                continue
+            finish_reason = getattr(update.choices[0], "finish_reason", None) or finish_reason
+            delta = update.choices[0].delta.content
+            if not delta:
+                continue
+            if first_token:
+                ttft = time.perf_counter() - start
+                metrics.observe("ttft", ttft, participant_code, turn_id)
+                first_token = False
+            chunks.append(delta)
+            yield delta
+        ok = True
+        _remember_reply(prompt, "".join(chunks))
+        if adaptive:
+            _record_budget(participant_code, history, usage, max_tokens, finish_reason)
+    except GeneratorExit:
+        cancelled = True  # consumer stopped reading (user pressed stop)
+        raise
+    finally:
+        close = getattr(response, "close", None)
+        if close:
+            try:
+                close()
+            except Exception:
+                pass
+        latency = time.perf_counter() - start
+        metrics.observe("complete", latency, participant_code, turn_id, ok=ok, stream=True,
+                        cancelled=cancelled, max_tokens=max_tokens)
+        metrics.record_usage(usage, participant_code, turn_id)
+        if details is not None:
+            details.update(ttft=ttft, latency=latency, usage=usage, max_tokens=max_tokens,
+                           finish_reason=finish_reason, ok=ok, cancelled=cancelled, cached=False)
+
 # Convenience: JSON serialise history for session/state storage
 
 def dumps_history(history: List[dict]) -> str:
@@ -0,0 +1,27 @@
+# =============================================================
+# File: conftest.py
+# pytest 공통 설정
+# =============================================================
+"""
+테스트는 네트워크 없이 실행됩니다 (fake_llm / fake_firestore 사용).
+
+- chatbot_core 는 import 시점에 Azure 환경 변수를 읽으므로 더미 값을 넣어 둡니다.
+- 계측 이벤트는 끄고, 모든 테스트는 임시 디렉토리에서 실행하여 logs/ 등
+  상대 경로 출력이 저장소에 남지 않게 합니다.
+
+    python -m pytest -q
+"""
+
+import os
+
+import pytest
+
+os.environ.setdefault("AZURE_AI_ENDPOINT", "https://example.invalid")
+os.environ.setdefault("AZURE_AI_SECRET", "test")
+os.environ["RAI_METRICS_DISABLED"] = "1"
+
+
+@pytest.fixture(autouse=True)
+def _work_in_tmp_path(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    yield tmp_path
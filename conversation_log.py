@@ -0,0 +1,180 @@
+# =============================================================
+# File: conversation_log.py
+# 참여자별 대화 로그 저장 및 통계 모듈
+# =============================================================
+"""
+참여자별 대화 로그를 로컬 JSON 파일과 Firestore에 저장하고 통계를 조회하는 모듈
+
+app.py (Streamlit UI) 에서 사용하며, 벤치마크/부하 테스트 등 Streamlit
+스크립트 밖에서도 import 할 수 있도록 UI 코드와 분리되어 있습니다.
+"""
+
+import os
+from datetime import datetime
+import streamlit as st
+from azure.ai.inference.models import SystemMessage
+
+from metrics import metrics
+import search_index
+import log_storage
+import aggregates
+
+# Firestore 핸들러를 안전하게 import
+try:
+    from firestore_handler import firestore_handler
+    FIRESTORE_AVAILABLE = True
+except Exception as e:
+    print(f"⚠️ Firestore 모듈 로드 실패: {str(e)}")
+    firestore_handler = None
+    FIRESTORE_AVAILABLE = False
+
+def save_conversation_log(participant_code, history, conversation_end=False, turn_id=None,
+                          partial_indices=None):
+    """참여자별 대화 로그를 저장하는 함수 (로컬 + Firestore)
+
+    partial_indices: 사용자가 중단하여 일부만 받은 AI 답변의 history 인덱스들
+    (해당 메시지에 "partial": true 가 기록됨)
+    """
+    # 로컬 JSON 파일 저장
+    with metrics.span("save_local_log", participant_code, turn_id):
+        local_success = save_local_log(participant_code, history, conversation_end, partial_indices)
+    
+    # Firestore 저장
+    with metrics.span("save_firestore_log", participant_code, turn_id):
+        firestore_success = save_firestore_log(participant_code, history, conversation_end, partial_indices)
+    
+    return local_success or firestore_success
+
+def _mark_partial(message, index, partial_indices):
+    """중단된 답변이면 partial 표시 추가"""
+    if partial_indices and index in partial_indices:
+        message["partial"] = True
+    return message
+
+def save_local_log(participant_code, history, conversation_end=False, partial_indices=None):
+    """로컬 JSON 파일에 저장"""
+    try:
+        # 대화 내용을 JSON 형태로 변환
+        timestamp = datetime.now().isoformat()
+        conversation_data = []
+        for i, msg in enumerate(history):
+            if isinstance(msg, SystemMessage):
+                continue  # 시스템 메시지는 로그에 포함하지 않음
+            conversation_data.append(_mark_partial({
+                "role": msg.role,
+                "content": msg.content,
+                "timestamp": timestamp if msg == history[-1] else None  # 마지막 메시지만 타임스탬프
+            }, i, partial_indices))
+        
+        # 같은 참여자의 동시 저장(여러 서버 프로세스 등)은 잠금으로 순서를 보장하고,
+        # 파일은 임시 파일 + rename 으로 통째로 교체하여 중간 상태가 보이지 않게 함
+        # (update_guard: 통계 집계 재생성 중에는 로그 쓰기와 집계 반영을 함께 대기)
+        log_file = log_storage.log_path(participant_code)
+        with aggregates.update_guard(), log_storage.participant_lock(participant_code):
+            # 예전 평평한 구조에 있던 로그도 찾아서 이어 씀 (저장 후 샤드 위치로 이동)
+            existing_file = log_storage.find_log_path(participant_code)
+            try:
+                existing_data = log_storage.read_json(existing_file) if existing_file else None
+            except ValueError:
+                existing_data = None  # 깨진 파일은 새 내용으로 덮어씀
+            
+            # 로그 데이터 구조
+            log_data = {
+                "participant_code": participant_code,
+                "conversation_start": (existing_data or {}).get("conversation_start", timestamp),
+                "conversation_end": timestamp if conversation_end else None,
+                "last_updated": timestamp,
+                "message_count": len(conversation_data),
+                "conversation": conversation_data
+            }
+            
+            log_storage.atomic_write_json(log_file, log_data)
+            if existing_file and existing_file != log_file:
+                os.remove(existing_file)
+            
+            # 전체 통계 집계에 이전 로그와의 차이만 반영
+            try:
+                aggregates.record_update(existing_data, log_data)
+            except Exception as e:
+                print(f"⚠️ 통계 집계 갱신 실패: {str(e)}")
+        
+        # 검색 인덱스 저널에 변경 기록 (색인은 오프라인에서, 실패해도 로그 저장은 성공으로 처리)
+        try:
+            search_index.update_from_log(log_data)
+        except Exception as e:
+            print(f"⚠️ 검색 인덱스 갱신 실패: {str(e)}")
+            
+        return True
+    except Exception as e:
+        st.error(f"로컬 로그 저장 중 오류 발생: {str(e)}")
+        return False
+
+def save_firestore_log(participant_code, history, conversation_end=False, partial_indices=None):
+    """Firestore에 저장"""
+    try:
+        # Firestore가 사용 가능하지 않으면 조용히 실패
+        if not FIRESTORE_AVAILABLE or not firestore_handler or not firestore_handler.is_available():
+            return False
+            
+        # 대화 데이터 변환
+        conversation_data = []
+        for i, msg in enumerate(history):
+            if isinstance(msg, SystemMessage):
+                continue
+            conversation_data.append(_mark_partial({
+                "role": msg.role,
+                "content": msg.content,
+                "timestamp": datetime.now().isoformat() if msg == history[-1] else None
+            }, i, partial_indices))
+        
+        # Firestore에 저장
+        return firestore_handler.save_conversation(participant_code, conversation_data, conversation_end)
+        
+    except Exception as e:
+        # 오류를 출력하지만 앱은 계속 실행
+        print(f"Firestore 저장 중 오류 발생: {str(e)}")
+        return False
+
+def get_aggregates():
+    """전체 통계 집계 (Firestore 요약 문서 우선, 없으면 로컬 증분 집계) - 로그 양과 무관하게 O(1)"""
+    if FIRESTORE_AVAILABLE and firestore_handler and firestore_handler.is_available():
+        try:
+            stats = firestore_handler.get_aggregates()
+            if stats is not None:
+                return stats
+        except Exception as e:
+            print(f"Firestore 통계 조회 실패: {str(e)}")
+    return aggregates.get_aggregates()
+
+def get_conversation_stats():
+    """전체 대화 통계를 반환하는 함수 (Firestore 우선, 로컬 증분 집계 / 로컬 로그 순으로 대체)"""
+    # Firestore 요약 문서 (모든 서버가 저장할 때마다 갱신, 문서 하나 읽기)
+    if FIRESTORE_AVAILABLE and firestore_handler and firestore_handler.is_available():
+        try:
+            firestore_participants, firestore_messages = firestore_handler.get_conversation_stats()
+            if firestore_participants > 0:
+                return firestore_participants, firestore_messages
+        except Exception as e:
+            print(f"Firestore 통계 조회 실패: {str(e)}")
+    
+    # Firestore가 실패하면 저장할 때마다 갱신되는 로컬 집계에서 읽기 (로그 양과 무관하게 O(1))
+    try:
+        summary = aggregates.get_aggregates().summary()
+        if summary["participants"] > 0:
+            return summary["participants"], summary["messages"]
+    except Exception as e:
+        print(f"통계 집계 조회 실패: {str(e)}")
+    
+    # 집계도 없으면 로컬 파일에서 통계 가져오기
+    try:
+        total_participants = 0
+        total_messages = 0
+        
+        # 평평한 구조 + 샤드 디렉토리를 병렬로 탐색
+        for data in log_storage.iter_logs():
+            total_participants += 1
+            total_messages += data.get("message_count", 0)
+        
+        return total_participants, total_messages
+    except:
+        return 0, 0
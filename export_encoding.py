@@ -0,0 +1,140 @@
+# =============================================================
+# File: export_encoding.py
+# CSV 내보내기 인코딩 계층 (UTF-8 BOM / CP949 / Shift-JIS)
+# =============================================================
+"""
+백업 CSV를 여러 인코딩으로 내보내는 모듈
+
+예전에는 CP949(Excel용) 파일을 만들 때 모든 행의 모든 문자열을 글자 단위로
+파이썬 루프에서 검사했습니다. 여기서는:
+
+- 코덱별로 "지울 글자" 전체(출력 불가능한 문자, 해당 코덱으로 인코딩할 수 없는
+  문자, 이모지 등 BMP 밖의 문자)를 코드 포인트 범위로 미리 계산한 정규식을 만들어 두고
+- 열 단위로 pandas 의 str.replace 로 한 번에 적용하고
+- 행을 청크 단위로 나누어 대상 코덱 파일에 바로 써서 정제된 데이터 전체 사본을
+  따로 만들지 않습니다.
+
+새 인코딩은 SINKS 에 Sink 하나를 추가하면 됩니다.
+
+레코드(dict) 목록을 그대로 넘기면 청크마다 dtype=object 로 DataFrame 을 만들어
+값을 변환하지 않고(None 이 섞인 정수 열도 3.0 이 아닌 3) 씁니다.
+
+    from export_encoding import export_csv
+    export_csv(rows, "backup/detailed_messages", sinks=("utf8", "excel"))
+"""
+
+import re
+from functools import lru_cache
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Union
+
+import pandas as pd
+
+CHUNK_ROWS = 50000
+
+class Sink(NamedTuple):
+    """내보낼 파일 하나의 형식"""
+    suffix: str      # 파일 이름 뒤에 붙는 문자열 ("" 이면 기본 파일)
+    encoding: str    # 파이썬 코덱 이름
+    sanitize: bool   # 인코딩할 수 없는 문자/이모지/제어 문자 제거 여부
+
+
+SINKS: Dict[str, Sink] = {
+    "utf8": Sink("", "utf-8-sig", False),         # UTF-8 BOM (Excel 에서 한글 인식)
+    "excel": Sink("_excel", "cp949", True),       # 구버전 Excel 용 CP949
+    "sjis": Sink("_sjis", "shift_jis", True),     # 일본어 Excel 용 Shift-JIS
+}
+DEFAULT_SINKS = ("utf8", "excel")
+STRING_KINDS = ("string", "mixed", "mixed-integer")  # .str 을 쓸 수 있는 object 열의 infer_dtype 결과
+
+Rows = Union[pd.DataFrame, List[Dict]]
+
+
+@lru_cache(maxsize=None)
+def deletion_pattern(encoding: str) -> "re.Pattern":
+    """지워야 하는 문자 전체를 하나의 문자 클래스로 만든 정규식 (코덱별로 한 번만 생성)
+
+    남기는 문자: BMP 안에서 (출력 가능하거나 공백 문자) 이면서 encoding 으로
+    인코딩 가능한 문자. 예전 코드의 글자 단위 조건을 코드 포인트 범위로 미리 계산합니다.
+    """
+    ranges = []
+    start = None
+    for code in range(0x10000):
+        char = chr(code)
+        if 0xD800 <= code <= 0xDFFF:
+            delete = True  # 짝이 없는 surrogate 는 어떤 코덱으로도 쓸 수 없음
+        elif not (char.isprintable() or char.isspace()):
+            delete = True
+        else:
+            try:
+                char.encode(encoding)
+                delete = False
+            except UnicodeEncodeError:
+                delete = True
+        if delete and start is None:
+            start = code
+        elif not delete and start is not None:
+            ranges.append((start, code - 1))
+            start = None
+    if start is not None:
+        ranges.append((start, 0xFFFF))
+    ranges.append((0x10000, 0x10FFFF))  # BMP 밖의 문자 (이모지 등)
+
+    def escape(code):
+        return f"\\U{code:08x}"
+
+    return re.compile("[" + "".join(escape(a) if a == b else f"{escape(a)}-{escape(b)}" for a, b in ranges) + "]+")
+
+
+def sanitize_frame(df: pd.DataFrame, encoding: str) -> pd.DataFrame:
+    """문자열 열을 열 단위로 한 번에 정제한 DataFrame (숫자 열은 그대로)"""
+    pattern = deletion_pattern(encoding)
+    sanitized = {}
+    for column in df.columns:
+        series = df[column]
+        if (pd.api.types.is_string_dtype(series.dtype)
+                and pd.api.types.infer_dtype(series, skipna=True) in STRING_KINDS):
+            # 문자열이 아닌 값(None 등)은 .str 결과가 NaN 이 되므로 원래 값을 유지
+            cleaned = series.str.replace(pattern, "", regex=True)
+            series = cleaned.where(cleaned.notna(), series)
+        sanitized[column] = series
+    return pd.DataFrame(sanitized, index=df.index)
+
+
+def iter_chunks(rows: Rows, chunk_rows: int = CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+    """DataFrame 또는 레코드 목록을 chunk_rows 행씩 DataFrame 으로 (데이터가 없으면 없음)"""
+    if isinstance(rows, pd.DataFrame):
+        if rows.empty and not len(rows.columns):
+            return
+        for start in range(0, max(len(rows), 1), chunk_rows):
+            yield rows.iloc[start:start + chunk_rows]
+    else:
+        for start in range(0, len(rows), chunk_rows):
+            # dtype=object: 값을 그대로 둠 (None 이 섞인 정수 열이 float 로 바뀌지 않게)
+            yield pd.DataFrame(rows[start:start + chunk_rows], dtype=object)
+
+
+def write_csv(rows: Rows, path: str, sink: Sink, chunk_rows: int = CHUNK_ROWS):
+    """DataFrame/레코드 목록을 sink 형식으로 청크 단위로 정제하며 바로 인코딩해서 씀"""
+    with open(path, 'w', newline='', encoding=sink.encoding) as f:
+        # 데이터가 없으면 빈 파일 (예전 동작과 같음)
+        for start, chunk in enumerate(iter_chunks(rows, chunk_rows)):
+            if sink.sanitize:
+                chunk = sanitize_frame(chunk, sink.encoding)
+            chunk.to_csv(f, header=start == 0, index=False, lineterminator="\r\n")
+
+
+def export_csv(rows: Rows, base_path: str, sinks: Iterable[str] = DEFAULT_SINKS) -> List[str]:
+    """base_path + 각 sink 접미사 + ".csv" 로 저장하고 파일 경로 목록을 반환
+
+    sink 하나가 실패해도(코덱 오류 등) 나머지는 계속 저장합니다.
+    """
+    written = []
+    for name in sinks:
+        sink = SINKS[name]
+        path = f"{base_path}{sink.suffix}.csv"
+        try:
+            write_csv(rows, path, sink)
+            written.append(path)
+        except Exception as e:
+            print(f"⚠️ {sink.encoding} 인코딩 실패: {str(e)} - UTF-8 BOM 파일을 사용하세요")
+    return written
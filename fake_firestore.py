@@ -0,0 +1,238 @@
+# =============================================================
+# File: fake_firestore.py
+# 벤치마크 / 부하 테스트용 인메모리 Firestore 대체 클라이언트
+# =============================================================
+"""
+firebase_admin 의 Firestore 클라이언트 중 이 프로젝트가 사용하는 부분만 흉내 낸
+인메모리 구현입니다. 네트워크나 서비스 계정 없이 FirestoreHandler 를 실행할 수
+있도록 벤치마크와 부하 테스트에서 사용합니다.
+
+    from fake_firestore import FakeFirestoreClient
+    from firestore_handler import FirestoreHandler
+    handler = FirestoreHandler(db=FakeFirestoreClient(latency=0.02))
+
+latency 를 주면 RPC 한 번(get/set/commit/stream)마다 그만큼 대기하여
+실제 Firestore 왕복 시간을 흉내 냅니다. read_latency 를 주면 stream() 이 문서
+하나를 넘길 때마다 그만큼 대기하여 스트림 하나의 처리량 한계를 흉내 냅니다.
+
+쿼리는 문서 ID 순서 읽기에 필요한 부분만 지원합니다:
+    collection.order_by("__name__").start_at([id]).end_before([id]).stream()
+
+통계 요약 문서 갱신에 쓰는 set(..., merge=True) 와 firestore.Increment, 서버 측 집계
+쿼리 collection.count().sum(field).get() 도 흉내 냅니다.
+"""
+
+import copy
+import time
+import threading
+from typing import Dict, Optional
+
+
+def _is_increment(value) -> bool:
+    """firestore.Increment 인지 (google-cloud-firestore 를 import 하지 않고 판별)"""
+    return type(value).__name__ == "Increment" and hasattr(value, "value")
+
+
+def _apply(existing, data: Dict, merge: bool) -> Dict:
+    """set() 결과: merge 이면 중첩 맵을 필드 단위로 합치고 Increment 는 기존 값에 더함"""
+    result = dict(existing or {}) if merge else {}
+    for key, value in data.items():
+        if isinstance(value, dict) and not _is_increment(value):
+            current = result.get(key)
+            result[key] = _apply(current if merge and isinstance(current, dict) else None, value, merge)
+        elif _is_increment(value):
+            current = result.get(key)
+            result[key] = (current if isinstance(current, (int, float)) else 0) + value.value
+        else:
+            result[key] = copy.deepcopy(value)
+    return result
+
+
+class FakeDocumentSnapshot:
+    """DocumentSnapshot 대체 (id, exists, to_dict)"""
+
+    def __init__(self, doc_id: str, data: Optional[Dict]):
+        self.id = doc_id
+        self._data = data
+
+    @property
+    def exists(self) -> bool:
+        return self._data is not None
+
+    def to_dict(self) -> Optional[Dict]:
+        return copy.deepcopy(self._data) if self._data is not None else None
+
+
+class FakeDocumentReference:
+    """DocumentReference 대체 (get, set, delete)"""
+
+    def __init__(self, collection: "FakeCollectionReference", doc_id: str):
+        self._collection = collection
+        self.id = doc_id
+
+    def get(self) -> FakeDocumentSnapshot:
+        self._collection._client._rpc()
+        with self._collection._client._lock:
+            data = self._collection._docs.get(self.id)
+        return FakeDocumentSnapshot(self.id, data)
+
+    def set(self, data: Dict, merge: bool = False):
+        self._collection._client._rpc()
+        self._collection._write(self.id, data, merge)
+
+    def delete(self):
+        self._collection._client._rpc()
+        with self._collection._client._lock:
+            self._collection._docs.pop(self.id, None)
+
+
+class FakeCollectionReference:
+    """CollectionReference 대체 (document, stream)"""
+
+    def __init__(self, client: "FakeFirestoreClient", name: str):
+        self._client = client
+        self.id = name
+        self._docs: Dict[str, Dict] = {}
+
+    def document(self, doc_id: str) -> FakeDocumentReference:
+        return FakeDocumentReference(self, doc_id)
+
+    def order_by(self, field_path: str) -> "FakeQuery":
+        return FakeQuery(self).order_by(field_path)
+
+    def stream(self):
+        return FakeQuery(self).stream()
+
+    def count(self, alias: Optional[str] = None) -> "FakeAggregationQuery":
+        return FakeAggregationQuery(self).count(alias)
+
+    def _write(self, doc_id: str, data: Dict, merge: bool = False):
+        # 실제 Firestore처럼 저장 시점의 값을 복사해 둠
+        with self._client._lock:
+            self._docs[doc_id] = _apply(self._docs.get(doc_id), data, merge)
+
+
+class FakeAggregationResult:
+    def __init__(self, alias: str, value):
+        self.alias = alias
+        self.value = value
+
+
+class FakeAggregationQuery:
+    """AggregationQuery 대체 (컬렉션 전체의 count / sum)"""
+
+    def __init__(self, collection: FakeCollectionReference):
+        self._collection = collection
+        self._aggregations = []
+
+    def count(self, alias: Optional[str] = None) -> "FakeAggregationQuery":
+        self._aggregations.append((alias or "count", None))
+        return self
+
+    def sum(self, field_path: str, alias: Optional[str] = None) -> "FakeAggregationQuery":
+        self._aggregations.append((alias or "sum", field_path))
+        return self
+
+    def get(self):
+        client = self._collection._client
+        client._rpc()
+        with client._lock:
+            docs = list(self._collection._docs.values())
+        results = []
+        for alias, field_path in self._aggregations:
+            if field_path is None:
+                value = len(docs)
+            else:
+                value = sum(doc.get(field_path) for doc in docs if isinstance(doc.get(field_path), (int, float)))
+            results.append(FakeAggregationResult(alias, value))
+        return [results]
+
+
+class FakeQuery:
+    """Query 대체 (문서 ID 순서 + 커서만 지원, 메서드마다 새 쿼리 반환)"""
+
+    def __init__(self, collection: FakeCollectionReference, start=None, start_inclusive=True, end=None):
+        self._collection = collection
+        self._start = start
+        self._start_inclusive = start_inclusive
+        self._end = end
+
+    @staticmethod
+    def _cursor_id(values) -> str:
+        """[문서ID], {"__name__": 문서ID}, DocumentSnapshot 모두 허용"""
+        if isinstance(values, (FakeDocumentSnapshot, FakeDocumentReference)):
+            return values.id
+        if isinstance(values, dict):
+            values = [values["__name__"]]
+        value = values[0]
+        return getattr(value, "id", value)
+
+    def order_by(self, field_path: str) -> "FakeQuery":
+        if field_path != "__name__":
+            raise NotImplementedError("FakeQuery 는 __name__ 정렬만 지원합니다.")
+        return self
+
+    def start_at(self, values) -> "FakeQuery":
+        return FakeQuery(self._collection, self._cursor_id(values), True, self._end)
+
+    def start_after(self, values) -> "FakeQuery":
+        return FakeQuery(self._collection, self._cursor_id(values), False, self._end)
+
+    def end_before(self, values) -> "FakeQuery":
+        return FakeQuery(self._collection, self._start, self._start_inclusive, self._cursor_id(values))
+
+    def stream(self):
+        client = self._collection._client
+        client._rpc()
+        with client._lock:
+            items = sorted(self._collection._docs.items())
+        for doc_id, data in items:
+            if self._start is not None and (doc_id < self._start or
+                                            (doc_id == self._start and not self._start_inclusive)):
+                continue
+            if self._end is not None and doc_id >= self._end:
+                break
+            if client.read_latency:
+                time.sleep(client.read_latency)
+            yield FakeDocumentSnapshot(doc_id, data)
+
+
+class FakeWriteBatch:
+    """WriteBatch 대체 (set, commit)"""
+
+    def __init__(self, client: "FakeFirestoreClient"):
+        self._client = client
+        self._writes = []
+
+    def set(self, doc_ref: FakeDocumentReference, data: Dict, merge: bool = False):
+        self._writes.append((doc_ref, data, merge))
+
+    def commit(self):
+        self._client._rpc()
+        for doc_ref, data, merge in self._writes:
+            doc_ref._collection._write(doc_ref.id, data, merge)
+        self._writes = []
+
+
+class FakeFirestoreClient:
+    """firestore.client() 대체"""
+
+    def __init__(self, latency: float = 0.0, read_latency: float = 0.0):
+        self.latency = latency
+        self.read_latency = read_latency
+        self._collections: Dict[str, FakeCollectionReference] = {}
+        self._lock = threading.Lock()
+
+    def collection(self, name: str) -> FakeCollectionReference:
+        with self._lock:
+            if name not in self._collections:
+                self._collections[name] = FakeCollectionReference(self, name)
+            return self._collections[name]
+
+    def batch(self) -> FakeWriteBatch:
+        return FakeWriteBatch(self)
+
+    def _rpc(self):
+        """RPC 왕복 지연 흉내"""
+        if self.latency:
+            time.sleep(self.latency)
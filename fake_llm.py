@@ -0,0 +1,136 @@
+# =============================================================
+# File: fake_llm.py
+# 부하 테스트 / 재실행용 ChatCompletionsClient 대체 클라이언트
+# =============================================================
+"""
+azure.ai.inference.ChatCompletionsClient.complete() 를 흉내 내는 로컬 스텁입니다.
+네트워크 없이 실제와 비슷한 지연시간, 스트리밍, 429(rate limit) 동작을 재현합니다.
+
+    import chatbot_core
+    from fake_llm import FakeChatCompletionsClient
+    chatbot_core.client = FakeChatCompletionsClient(ttft_mean=0.6, tokens_per_second=60)
+
+지연 모델:
+- 첫 토큰까지 시간(TTFT): 로그정규분포 (평균 ttft_mean 초)
+- 이후 토큰: tokens_per_second 속도로 생성
+- 백엔드 동시 처리 슬롯(max_concurrency)이 가득 차면 대기 → 포화 상태 재현
+- 분당 요청 수(rpm_limit)를 넘으면 429 HttpResponseError 발생
+"""
+
+import math
+import time
+import random
+import threading
+from collections import deque
+from types import SimpleNamespace
+from typing import Optional
+
+from synthetic_text import random_text
+
+
+class RateLimitError(Exception):
+    """429 Too Many Requests (azure.core 가 없을 때 사용)"""
+    status_code = 429
+
+
+def _rate_limit_error(retry_after: float) -> Exception:
+    """가능하면 실제 SDK와 같은 HttpResponseError(429)를 만듦"""
+    message = f"(429) Rate limit exceeded. Retry after {retry_after:.1f} seconds."
+    try:
+        from azure.core.exceptions import HttpResponseError
+        error = HttpResponseError(message=message)
+    except ImportError:
+        error = RateLimitError(message)
+    error.status_code = 429
+    error.retry_after = retry_after
+    return error
+
+
+def _usage(prompt_tokens: int, completion_tokens: int):
+    return SimpleNamespace(
+        prompt_tokens=prompt_tokens,
+        completion_tokens=completion_tokens,
+        total_tokens=prompt_tokens + completion_tokens,
+    )
+
+
+def estimate_tokens(text: str) -> int:
+    """대략적인 토큰 수 (한글은 글자당 토큰이 많으므로 보수적으로 2자 = 1토큰)"""
+    return max(1, math.ceil(len(text or "") / 2))
+
+
+class FakeChatCompletionsClient:
+    """ChatCompletionsClient 스텁 (complete 만 지원)"""
+
+    def __init__(self, ttft_mean: float = 0.6, ttft_sigma: float = 0.4,
+                 tokens_per_second: float = 60.0, reply_words: tuple = (5, 60),
+                 max_concurrency: int = 32, rpm_limit: Optional[int] = None,
+                 seed: Optional[int] = None):
+        self.ttft_mean = ttft_mean
+        self.ttft_sigma = ttft_sigma
+        self.tokens_per_second = tokens_per_second
+        self.reply_words = reply_words
+        self.rpm_limit = rpm_limit
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+        self._request_times = deque()
+        self._rate_lock = threading.Lock()
+
+    # --- 내부 헬퍼 ---------------------------------------------------------
+    def _check_rate_limit(self):
+        if not self.rpm_limit:
+            return
+        now = time.monotonic()
+        with self._rate_lock:
+            while self._request_times and now - self._request_times[0] > 60.0:
+                self._request_times.popleft()
+            if len(self._request_times) >= self.rpm_limit:
+                raise _rate_limit_error(60.0 - (now - self._request_times[0]))
+            self._request_times.append(now)
+
+    def _sample(self, max_tokens: int):
+        with self._rng_lock:
+            # 로그정규분포의 평균이 ttft_mean 이 되도록 mu 설정
+            mu = math.log(self.ttft_mean) - self.ttft_sigma ** 2 / 2
+            ttft = self._rng.lognormvariate(mu, self.ttft_sigma)
+            reply = random_text(self._rng, *self.reply_words)
+        # max_tokens 를 넘는 답변은 잘라냄 (실제 API처럼 finish_reason="length")
+        finish_reason = "length" if estimate_tokens(reply) > max_tokens else "stop"
+        return ttft, reply[:max_tokens * 2], finish_reason
+
+    # --- 공개 API ---------------------------------------------------------
+    def complete(self, messages, model=None, temperature=None, top_p=None,
+                 max_tokens: int = 1024, stream: bool = False, **kwargs):
+        self._check_rate_limit()
+        prompt_tokens = sum(estimate_tokens(getattr(m, "content", "")) for m in messages)
+        ttft, reply, finish_reason = self._sample(max_tokens)
+
+        if not stream:
+            with self._slots:
+                time.sleep(ttft + estimate_tokens(reply) / self.tokens_per_second)
+            return SimpleNamespace(
+                choices=[SimpleNamespace(message=SimpleNamespace(role="assistant", content=reply),
+                                         finish_reason=finish_reason)],
+                usage=_usage(prompt_tokens, estimate_tokens(reply)),
+            )
+        # 실제 API처럼 stream_options.include_usage 를 요청했을 때만 마지막에 usage 전송
+        stream_options = (kwargs.get("model_extras") or {}).get("stream_options") or {}
+        return self._stream(reply, ttft, prompt_tokens, finish_reason,
+                            include_usage=bool(stream_options.get("include_usage")))
+
+    def _stream(self, reply: str, ttft: float, prompt_tokens: int, finish_reason: str = "stop",
+                include_usage: bool = True):
+        """스트리밍 업데이트 생성기 (토큰 ≈ 2글자 단위 청크)"""
+        with self._slots:
+            time.sleep(ttft)
+            interval = 1.0 / self.tokens_per_second
+            for i in range(0, len(reply), 2):
+                yield SimpleNamespace(
+                    choices=[SimpleNamespace(delta=SimpleNamespace(content=reply[i:i + 2]),
+                                             finish_reason=finish_reason if i + 2 >= len(reply) else None)],
+                    usage=None,
+                )
+                time.sleep(interval)
+        if include_usage:
+            yield SimpleNamespace(choices=[], usage=_usage(prompt_tokens, estimate_tokens(reply)))
@@ -7,6 +7,11 @@ Firebase Firestore에서 데이터를 로컬로 백업하는 도구
 
 실행 방법:
     python firestore_backup.py
+    python firestore_backup.py --store   # 변경된 참여자만 압축 저장 (backup_store.py)
+
+환경 변수:
+- RAI_BACKUP_PARTITIONS:        동시에 읽을 문서 ID 구간 수 (기본값: 8)
+- RAI_BACKUP_PARTITION_QUERIES: "1"이면 ID 범위 대신 Firestore 파티션 쿼리로 구간 나누기
 
 기능:
 - 모든 대화 데이터를 JSON 파일로 백업
@@ -17,11 +22,17 @@ Firebase Firestore에서 데이터를 로컬로 백업하는 도구
 
 import os
 import json
-import csv
 import pandas as pd
 from datetime import datetime
 from typing import Dict, List, Optional
 
+from export_encoding import export_csv, DEFAULT_SINKS
+from firestore_reader import iter_collection_parallel, PartitionReadError
+
+# 전체 백업 시 동시에 읽을 문서 ID 구간 수 / Firestore 파티션 쿼리 사용 여부
+BACKUP_PARTITIONS = int(os.environ.get("RAI_BACKUP_PARTITIONS", "8"))
+USE_PARTITION_QUERIES = os.environ.get("RAI_BACKUP_PARTITION_QUERIES", "0") == "1"
+
 # Firestore 핸들러를 안전하게 import
 try:
     from firestore_handler import firestore_handler
@@ -38,32 +49,29 @@ def create_backup_folder():
     os.makedirs(backup_folder, exist_ok=True)
     return backup_folder
 
-def backup_all_conversations():
-    """모든 대화 데이터를 백업"""
+def backup_all_conversations(partitions: int = BACKUP_PARTITIONS,
+                             use_partition_queries: bool = USE_PARTITION_QUERIES):
+    """모든 대화 데이터를 백업 (문서 ID 구간별 동시 스트림으로 읽음)"""
     if not FIRESTORE_AVAILABLE or not firestore_handler or not firestore_handler.is_available():
         print("❌ Firestore 연결 불가능. Firebase 설정을 확인해주세요.")
         return None
     
-    print("🔄 Firestore에서 대화 데이터를 가져오는 중...")
+    print(f"🔄 Firestore에서 대화 데이터를 가져오는 중... ({partitions}개 구간 동시 읽기)")
     
     try:
         # Firestore에서 모든 대화 데이터 가져오기
-        conversations_ref = firestore_handler.db.collection('conversations')
-        docs = conversations_ref.stream()
-        
         all_conversations = {}
-        participant_count = 0
-        
-        for doc in docs:
-            participant_count += 1
-            doc_data = doc.to_dict()
-            participant_code = doc.id
+        for participant_code, doc_data in iter_collection_parallel(
+                firestore_handler.db, 'conversations', partitions, use_partition_queries):
             all_conversations[participant_code] = doc_data
-            print(f"  📥 참여자 {participant_code} 데이터 수집...")
         
-        print(f"✅ 총 {participant_count}명의 참여자 데이터 수집 완료!")
+        print(f"✅ 총 {len(all_conversations)}명의 참여자 데이터 수집 완료!")
         return all_conversations
         
+    except PartitionReadError as e:
+        # 실패한 구간은 재시도까지 마친 상태이므로 불완전한 백업을 만들지 않음
+        print(f"❌ 데이터 가져오기 실패: {str(e)}")
+        return None
     except Exception as e:
         print(f"❌ 데이터 가져오기 실패: {str(e)}")
         return None
@@ -105,8 +113,8 @@ def save_json_backup(conversations: Dict, backup_folder: str):
     
     print(f"📁 참여자별 파일 저장: {participants_folder}/ ({len(conversations)}개 파일)")
 
-def save_csv_summary(conversations: Dict, backup_folder: str):
-    """CSV 형태로 요약 데이터 저장"""
+def save_csv_summary(conversations: Dict, backup_folder: str, sinks=DEFAULT_SINKS):
+    """CSV 형태로 요약 데이터 저장 (sinks: export_encoding.SINKS 의 인코딩 이름들)"""
     if not conversations:
         return
     
@@ -146,79 +154,21 @@ def save_csv_summary(conversations: Dict, backup_folder: str):
                 'content_length': len(message.get('content', ''))
             })
     
-    # 요약 CSV 저장 (UTF-8 BOM 추가로 Excel 호환성 개선)
-    summary_file = os.path.join(backup_folder, "conversation_summary.csv")
-    with open(summary_file, 'w', newline='', encoding='utf-8-sig') as f:
-        if summary_data:
-            fieldnames = summary_data[0].keys()
-            writer = csv.DictWriter(f, fieldnames=fieldnames)
-            writer.writeheader()
-            writer.writerows(summary_data)
-    
-    print(f"📊 요약 CSV 저장: {summary_file}")
-    
-    # 상세 메시지 CSV 저장 (UTF-8 BOM 추가로 Excel 호환성 개선)
-    detailed_file = os.path.join(backup_folder, "detailed_messages.csv")
-    with open(detailed_file, 'w', newline='', encoding='utf-8-sig') as f:
-        if detailed_data:
-            fieldnames = detailed_data[0].keys()
-            writer = csv.DictWriter(f, fieldnames=fieldnames)
-            writer.writeheader()
-            writer.writerows(detailed_data)
-    
-    print(f"💬 상세 메시지 CSV 저장: {detailed_file}")
-    
-    # Excel 호환 CSV 파일도 추가로 생성 (CP949 인코딩 - 특수문자 제거)
-    try:
-        # 특수문자를 제거한 데이터 준비
-        safe_summary_data = []
-        for item in summary_data:
-            safe_item = {}
-            for key, value in item.items():
-                if isinstance(value, str):
-                    # 이모지 및 특수문자 제거
-                    safe_value = ''.join(char for char in value if ord(char) < 65536 and char.isprintable() or char.isspace())
-                else:
-                    safe_value = value
-                safe_item[key] = safe_value
-            safe_summary_data.append(safe_item)
-        
-        safe_detailed_data = []
-        for item in detailed_data:
-            safe_item = {}
-            for key, value in item.items():
-                if isinstance(value, str):
-                    # 이모지 및 특수문자 제거
-                    safe_value = ''.join(char for char in value if ord(char) < 65536 and char.isprintable() or char.isspace())
-                else:
-                    safe_value = value
-                safe_item[key] = safe_value
-            safe_detailed_data.append(safe_item)
-        
-        summary_file_excel = os.path.join(backup_folder, "conversation_summary_excel.csv")
-        with open(summary_file_excel, 'w', newline='', encoding='cp949', errors='ignore') as f:
-            if safe_summary_data:
-                fieldnames = safe_summary_data[0].keys()
-                writer = csv.DictWriter(f, fieldnames=fieldnames)
-                writer.writeheader()
-                writer.writerows(safe_summary_data)
-        
-        detailed_file_excel = os.path.join(backup_folder, "detailed_messages_excel.csv")
-        with open(detailed_file_excel, 'w', newline='', encoding='cp949', errors='ignore') as f:
-            if safe_detailed_data:
-                fieldnames = safe_detailed_data[0].keys()
-                writer = csv.DictWriter(f, fieldnames=fieldnames)
-                writer.writeheader()
-                writer.writerows(safe_detailed_data)
-        
-        print(f"📊 Excel용 CSV 저장: {summary_file_excel}")
-        print(f"💬 Excel용 CSV 저장: {detailed_file_excel}")
-        
-    except Exception as e:
-        print(f"⚠️ CP949 인코딩 실패: {str(e)} - UTF-8 BOM 파일을 사용하세요")
+    # UTF-8 BOM(기본) + CP949(Excel용, 이모지/특수문자 제거) 파일을 한 번에 저장
+    # 정제/인코딩은 export_encoding 에서 열 단위로 처리 (새 인코딩은 sinks 에 추가)
+    for name, rows, icon, label in (
+        ("conversation_summary", summary_data, "📊", "요약 CSV"),
+        ("detailed_messages", detailed_data, "💬", "상세 메시지 CSV"),
+    ):
+        for path in export_csv(rows, os.path.join(backup_folder, name), sinks):
+            kind = "Excel용 CSV" if path.endswith("_excel.csv") else label
+            print(f"{icon} {kind} 저장: {path}")
+
+def save_excel_report(conversations: Dict, backup_folder: str, stats=None):
+    """Excel 형태로 분석 리포트 저장
 
-def save_excel_report(conversations: Dict, backup_folder: str):
-    """Excel 형태로 분석 리포트 저장"""
+    stats: 유지되는 집계 aggregates.Aggregates (load_stats). 없을 때만 conversations 전체로 다시 집계
+    """
     if not conversations:
         return
     
@@ -264,13 +214,27 @@ def save_excel_report(conversations: Dict, backup_folder: str):
                     sheet_name = f'참여자_{participant_code[:8]}'  # 시트명 길이 제한
                     df_messages.to_excel(writer, sheet_name=sheet_name, index=False)
             
-            # 3. 통계 시트
+            # 3. 통계 시트 (유지되는 집계 값, 없으면 백업한 대화 전체로 다시 집계)
+            if stats is None:
+                from aggregates import Aggregates
+                print("⚠️ 통계 요약 문서가 없어 백업한 대화 전체로 통계를 다시 계산합니다.")
+                stats = Aggregates.from_logs(converted_conversations.values())
+            summary = stats.summary()
             stats_data = {
-                '전체참여자수': [len(converted_conversations)],
-                '완료된대화': [len([1 for data in converted_conversations.values() if data.get('conversation_end')])],
-                '진행중대화': [len([1 for data in converted_conversations.values() if not data.get('conversation_end')])],
-                '평균메시지수': [sum(data.get('message_count', 0) for data in converted_conversations.values()) / len(converted_conversations) if converted_conversations else 0],
-                '총메시지수': [sum(data.get('message_count', 0) for data in converted_conversations.values())]
+                '전체참여자수': [summary['participants']],
+                '완료된대화': [summary['completed']],
+                '진행중대화': [summary['in_progress']],
+                '완료율': [round(summary['completion_rate'], 4)],
+                '평균메시지수': [summary['avg_messages']],
+                '총메시지수': [summary['messages']],
+                '사용자메시지수': [summary['user_messages']],
+                '챗봇메시지수': [summary['assistant_messages']],
+                '평균글자수': [round(summary['avg_length'], 1)],
+                '글자수p50': [round(summary['length_p50'])],
+                '글자수p95': [round(summary['length_p95'])],
+                '평균대화시간(초)': [round(summary['avg_duration'], 1)],
+                '대화시간p50(초)': [round(summary['duration_p50'], 1)],
+                '대화시간p95(초)': [round(summary['duration_p95'], 1)],
             }
             df_stats = pd.DataFrame(stats_data)
             df_stats.to_excel(writer, sheet_name='전체통계', index=False)
@@ -282,11 +246,32 @@ def save_excel_report(conversations: Dict, backup_folder: str):
     except Exception as e:
         print(f"⚠️ Excel 저장 실패: {str(e)}")
 
-def main():
+def load_stats():
+    """Firestore 통계 요약 문서 (저장할 때마다 함께 갱신됨). 없거나 읽지 못하면 None"""
+    try:
+        return firestore_handler.get_aggregates()
+    except Exception as e:
+        print(f"⚠️ 통계 요약 문서 조회 실패: {str(e)}")
+        return None
+
+def main(use_store: bool = False):
     """메인 백업 함수"""
     print("🔥 Firebase Firestore 데이터 백업 도구")
     print("=" * 50)
     
+    if use_store:
+        # 내용 주소 기반 저장소: 바뀐 참여자만 새로 저장하고 manifest 기록
+        from backup_store import BackupStore, print_manifest
+        conversations = backup_all_conversations()
+        if not conversations:
+            print("❌ 백업할 데이터가 없습니다.")
+            return
+        store = BackupStore()
+        print_manifest(store.store_run(conversations))
+        print(f"📁 저장소 위치: {os.path.abspath(store.root)}")
+        print("💡 폴더 형태가 필요하면: python backup_store.py materialize <실행ID>")
+        return
+    
     # 백업 폴더 생성
     backup_folder = create_backup_folder()
     print(f"📁 백업 폴더 생성: {backup_folder}")
@@ -302,7 +287,7 @@ def main():
     print("\n📦 백업 파일 생성 중...")
     save_json_backup(conversations, backup_folder)
     save_csv_summary(conversations, backup_folder)
-    save_excel_report(conversations, backup_folder)
+    save_excel_report(conversations, backup_folder, stats=load_stats())
     
     # 완료 메시지
     print("\n" + "=" * 50)
@@ -322,4 +307,5 @@ def main():
     print("  - _excel.csv 파일은 이모지가 제거되어 호환성이 떨어질 수 있음")
 
 if __name__ == "__main__":
-    main()
+    import sys
+    main(use_store="--store" in sys.argv[1:])
@@ -7,7 +7,8 @@ Firebase Firestore와의 연동을 담당하는 모듈
 
 주요 기능:
 - 참여자별 대화 데이터 실시간 저장
-- 통계 데이터 조회
+- 통계 데이터 조회 (저장할 때마다 함께 갱신하는 요약 문서 stats/conversations,
+  모든 서버가 firestore.Increment 로 같은 문서에 더하므로 조회는 문서 하나 읽기)
 - 로그 데이터 백업 및 복원
 
 환경 변수 요구사항:
@@ -22,11 +23,46 @@ from datetime import datetime
 from typing import Dict, List, Optional
 import streamlit as st
 
+from metrics import metrics
+from aggregates import Aggregates, Sketch
+
+STATS_COLLECTION = 'stats'
+STATS_DOCUMENT = 'conversations'
+
+
+def _sketch_increments(sketch: Sketch) -> Dict:
+    fields = {'relative_accuracy': sketch.relative_accuracy}
+    for name in ('zero_count', 'count', 'sum'):
+        if getattr(sketch, name):
+            fields[name] = firestore.Increment(getattr(sketch, name))
+    buckets = {str(key): firestore.Increment(count) for key, count in sketch.buckets.items() if count}
+    if buckets:
+        fields['buckets'] = buckets
+    return fields
+
+
+def aggregate_increments(delta: Aggregates) -> Dict:
+    """변화량을 요약 문서에 merge=True 로 더할 필드 (0인 항목은 생략)"""
+    fields = {
+        'message_length': _sketch_increments(delta.message_length),
+        'duration': _sketch_increments(delta.duration),
+        'updated_at': delta.updated_at,
+    }
+    counters = {name: firestore.Increment(value) for name, value in delta.counters.items() if value}
+    if counters:
+        fields['counters'] = counters
+    return fields
+
 class FirestoreHandler:
-    def __init__(self):
+    def __init__(self, db=None):
         self.db = None
         self.initialized = False
-        self._initialize_firebase()
+        if db is not None:
+            # 테스트/벤치마크용: 에뮬레이터나 fake 클라이언트를 직접 주입
+            self.db = db
+            self.initialized = True
+        else:
+            self._initialize_firebase()
     
     def _initialize_firebase(self):
         """Firebase 초기화"""
@@ -80,8 +116,10 @@ class FirestoreHandler:
             timestamp = datetime.now()
             
             # 기존 문서가 있는지 확인
-            doc = doc_ref.get()
+            with metrics.span("firestore_get", participant_code):
+                doc = doc_ref.get()
             conversation_start = timestamp
+            existing_data = None
             
             if doc.exists:
                 existing_data = doc.to_dict()
@@ -99,37 +137,65 @@ class FirestoreHandler:
                 'updated_at': timestamp
             }
             
+            # 이전 문서와의 차이만큼 요약 문서에 더함 (대화 문서와 같은 배치로 함께 기록)
+            delta = Aggregates()
+            delta.record_update(existing_data, data)
+            delta.updated_at = timestamp.isoformat()
+            batch = self.db.batch()
+            batch.set(doc_ref, data)
+            batch.set(self._stats_ref(), aggregate_increments(delta), merge=True)
+            
             # Firestore에 저장
-            doc_ref.set(data)
+            with metrics.span("firestore_set", participant_code):
+                batch.commit()
             return True
             
         except Exception as e:
             print(f"❌ Firestore 저장 실패: {str(e)}")
             return False
     
+    def _stats_ref(self):
+        return self.db.collection(STATS_COLLECTION).document(STATS_DOCUMENT)
+    
+    def get_aggregates(self) -> Optional[Aggregates]:
+        """요약 문서의 전체 통계 (문서 하나 읽기). 요약 문서가 아직 없으면 None"""
+        if not self.is_available():
+            return None
+        doc = self._stats_ref().get()
+        return Aggregates.from_dict(doc.to_dict()) if doc.exists else None
+    
     def get_conversation_stats(self) -> tuple:
-        """전체 대화 통계 조회"""
+        """전체 대화 통계 조회 (요약 문서, 없으면 서버 측 count/sum 집계 쿼리)"""
         if not self.is_available():
             return 0, 0
         
         try:
-            # 모든 대화 문서 조회
-            docs = self.db.collection('conversations').stream()
+            stats = self.get_aggregates()
+            if stats is not None:
+                return stats.counters['participants'], stats.counters['messages']
             
-            total_participants = 0
-            total_messages = 0
-            
-            for doc in docs:
-                data = doc.to_dict()
-                total_participants += 1
-                total_messages += data.get('message_count', 0)
-            
-            return total_participants, total_messages
+            # 요약 문서 도입 이전 데이터: 문서를 내려받지 않고 서버에서 집계
+            query = self.db.collection('conversations').count(alias='participants')
+            results = query.sum('message_count', alias='messages').get()
+            values = {result.alias: result.value for result in results[0]}
+            return int(values.get('participants') or 0), int(values.get('messages') or 0)
             
         except Exception as e:
             print(f"❌ 통계 조회 실패: {str(e)}")
             return 0, 0
     
+    def rebuild_aggregates(self) -> Optional[Aggregates]:
+        """대화 컬렉션 전체를 읽어 요약 문서를 새로 만듦 (도입 이전 데이터, 복원 후 등)
+
+        그동안 저장된 대화의 변화량은 덮어써질 수 있으므로 사용자가 적을 때 실행하세요.
+        """
+        if not self.is_available():
+            return None
+        rebuilt = Aggregates.from_logs(doc.to_dict() for doc in self.db.collection('conversations').stream())
+        rebuilt.updated_at = datetime.now().isoformat()
+        self._stats_ref().set(rebuilt.to_dict())
+        return rebuilt
+    
     def get_participant_conversation(self, participant_code: str) -> Optional[Dict]:
         """특정 참여자의 대화 데이터 조회"""
         if not self.is_available():
@@ -0,0 +1,151 @@
+# =============================================================
+# File: firestore_reader.py
+# Firestore 컬렉션 병렬(파티션) 읽기
+# =============================================================
+"""
+컬렉션 전체를 stream() 하나로 순서대로 읽는 대신, 문서 ID 공간을 N개 구간으로
+나누어 구간마다 별도 스트림으로 동시에 읽는 모듈 (firestore_backup 에서 사용)
+
+구간 나누기:
+- 기본: 문서 ID 범위 커서 (order_by("__name__") + start_at / end_before)
+  참여자 코드는 8자리 숫자이므로 숫자 접두사로 고르게 나눕니다. 첫 구간과 마지막
+  구간은 끝이 열려 있어 숫자가 아닌 ID도 빠짐없이 읽습니다.
+- use_partition_queries=True: Firestore 파티션 쿼리(get_partitions)가 돌려준 커서 사용
+  (ID 분포를 서버가 알고 있으므로 코드 형식과 무관하게 고르게 나뉨)
+
+구간 하나가 중간에 실패하면 마지막으로 받은 문서 다음부터(start_after) 그 구간만
+다시 읽습니다. 다른 구간은 영향을 받지 않으며 문서가 중복되지 않습니다.
+
+    from firestore_reader import iter_collection_parallel
+    for doc_id, data in iter_collection_parallel(db, "conversations", partitions=8):
+        ...
+"""
+
+import math
+import time
+import queue
+import threading
+from typing import Dict, Iterator, List, Optional, Tuple
+
+ID_ALPHABET = "0123456789"  # 참여자 코드 문자 집합 (구간 경계 계산용)
+MAX_RETRIES = 3
+PROGRESS_EVERY = 1000
+_DONE = object()
+
+
+class PartitionReadError(Exception):
+    """재시도 후에도 읽지 못한 구간이 있음"""
+
+    def __init__(self, failed: List[Tuple[int, Exception]]):
+        self.failed = failed
+        detail = ", ".join(f"#{index + 1}: {str(error)}" for index, error in failed)
+        super().__init__(f"{len(failed)}개 구간 읽기 실패 ({detail})")
+
+
+def id_range_bounds(partitions: int, alphabet: str = ID_ALPHABET) -> List[Tuple[Optional[str], Optional[str]]]:
+    """ID 공간을 partitions 개의 [start, end) 구간으로 나눔 (None 은 열린 끝)
+
+    alphabet 으로 만든 접두사를 고르게 나눈 경계 사용. 예) 숫자, 4구간 → "25", "50", "75"
+    """
+    partitions = max(1, partitions)
+    base = len(alphabet)
+    # 구간 크기가 고르도록 필요한 자릿수보다 한 자리 더 사용
+    digits = math.ceil(math.log(partitions, base) - 1e-9) + 1
+    space = base ** digits
+    bounds = []
+    for i in range(1, partitions):
+        value = space * i // partitions
+        prefix = ""
+        for _ in range(digits):
+            value, rem = divmod(value, base)
+            prefix = alphabet[rem] + prefix
+        bounds.append(prefix)
+    edges = [None] + sorted(set(bounds)) + [None]
+    return list(zip(edges, edges[1:]))
+
+
+def range_queries(collection_ref, partitions: int) -> List:
+    """문서 ID 범위 커서로 나눈 쿼리 목록"""
+    queries = []
+    for start, end in id_range_bounds(partitions):
+        query = collection_ref.order_by("__name__")
+        if start is not None:
+            query = query.start_at([start])
+        if end is not None:
+            query = query.end_before([end])
+        queries.append(query)
+    return queries
+
+
+def partition_queries(db, collection: str, partitions: int) -> List:
+    """Firestore 파티션 쿼리로 나눈 쿼리 목록 (지원하지 않으면 ID 범위로 대체)"""
+    try:
+        return [partition.query() for partition in db.collection_group(collection).get_partitions(partitions)]
+    except Exception as e:
+        print(f"⚠️ 파티션 쿼리를 사용할 수 없어 ID 범위로 나눕니다: {str(e)}")
+        return range_queries(db.collection(collection), partitions)
+
+
+def iter_collection_parallel(db, collection: str = "conversations", partitions: int = 8,
+                             use_partition_queries: bool = False, retries: int = MAX_RETRIES,
+                             verbose: bool = True) -> Iterator[Tuple[str, Dict]]:
+    """컬렉션의 (문서 ID, 데이터) 를 구간별 동시 스트림으로 읽어 도착 순서대로 반환
+
+    모든 구간이 끝난 뒤 실패한 구간이 있으면 PartitionReadError 를 발생시킵니다.
+    """
+    if use_partition_queries:
+        queries = partition_queries(db, collection, partitions)
+    else:
+        queries = range_queries(db.collection(collection), partitions)
+
+    # 읽는 쪽보다 스트림이 빠르면 메모리가 늘지 않도록 대기열 크기 제한
+    results = queue.Queue(maxsize=PROGRESS_EVERY * 4)
+    start_time = time.perf_counter()
+
+    def read_partition(index: int, query):
+        count = 0
+        last_snapshot = None
+        partition_start = time.perf_counter()
+        for attempt in range(retries + 1):
+            try:
+                resumed = query.start_after(last_snapshot) if last_snapshot is not None else query
+                for snapshot in resumed.stream():
+                    results.put((snapshot.id, snapshot.to_dict()))
+                    last_snapshot = snapshot
+                    count += 1
+                results.put((_DONE, index, count, time.perf_counter() - partition_start, None))
+                return
+            except Exception as e:
+                if attempt == retries:
+                    results.put((_DONE, index, count, time.perf_counter() - partition_start, e))
+                    return
+                if verbose:
+                    print(f"  ⚠️ 구간 {index + 1}/{len(queries)} 읽기 실패, 다시 시도 ({attempt + 1}/{retries}): {str(e)}")
+                time.sleep(min(10.0, 0.5 * 2 ** attempt))
+
+    for index, query in enumerate(queries):
+        threading.Thread(target=read_partition, args=(index, query), daemon=True).start()
+
+    remaining = len(queries)
+    total = 0
+    failed = []
+    while remaining:
+        item = results.get()
+        if item[0] is _DONE:
+            _, index, count, elapsed, error = item
+            remaining -= 1
+            if error is not None:
+                failed.append((index, error))
+                if verbose:
+                    print(f"  ❌ 구간 {index + 1}/{len(queries)} 실패: {count}건까지 읽음 ({str(error)})")
+            elif verbose:
+                print(f"  📦 구간 {index + 1}/{len(queries)} 완료: {count}건 ({elapsed:.1f}초)")
+            continue
+        total += 1
+        if verbose and total % PROGRESS_EVERY == 0:
+            elapsed = time.perf_counter() - start_time
+            print(f"  📥 {total}건 수집 ({total / elapsed:.0f}건/초)")
+        yield item
+
+    if failed:
+        raise PartitionReadError(sorted(failed, key=lambda f: f[0]))
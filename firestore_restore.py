@@ -0,0 +1,379 @@
+#!/usr/bin/env python3
+# =============================================================
+# File: firestore_restore.py
+# 백업 폴더 → Firestore 병렬 대량 복원 도구
+# =============================================================
+"""
+firestore_backup.py 로 만든 백업을 Firestore `conversations` 컬렉션으로 복원하는 도구
+
+- 백업 폴더의 all_conversations.json (또는 participants/*.json) 을 스트리밍으로 읽음
+- ISO 문자열로 저장된 대화 시작/종료/업데이트 시각을 다시 timestamp 로 변환
+- 배치(최대 500건, 최대 MAX_BATCH_BYTES) 단위로 묶어 여러 스레드에서 동시에 commit
+  (동시 실행 수 제한)
+- 완료된 배치를 체크포인트 파일에 기록하여 중단 후 이어서 실행 가능
+  (배치 번호는 배치 크기 설정과 원본 내용에 따라 달라지므로, 체크포인트에는 둘 다 기록하고
+  다르면 이어서 실행하지 않음)
+- 실패한 배치가 있으면 종료 코드 1
+- 같은 문서 ID에 set() 하므로 여러 번 실행해도 결과가 같음
+
+실행 방법:
+    python firestore_restore.py firestore_backup_20250728_055634 --dry-run
+    python firestore_restore.py firestore_backup_20250728_055634 --workers 16
+    python firestore_restore.py --run 20250728_055634          # backup_store 실행에서 복원
+
+에뮬레이터로 복원하려면 FIRESTORE_EMULATOR_HOST=localhost:8080 을 설정하고 실행하세요.
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from datetime import datetime
+from typing import Dict, Iterator, Optional, Tuple
+
+# Firestore에서 timestamp 로 저장되는 문서 필드 (메시지의 timestamp 는 원래 문자열)
+TIMESTAMP_FIELDS = ("conversation_start", "conversation_end", "last_updated", "created_at", "updated_at")
+MAX_BATCH_SIZE = 500  # Firestore 배치 쓰기 한도
+MAX_BATCH_BYTES = 8 * 1024 * 1024  # commit 요청 한도(10 MiB)보다 여유 있게
+READ_CHUNK_SIZE = 1 << 20
+
+
+# --- 백업 읽기 --------------------------------------------------------------
+def iter_json_object(path: str) -> Iterator[Tuple[str, Dict]]:
+    """최상위 JSON 객체의 (키, 값) 쌍을 파일 전체를 메모리에 올리지 않고 하나씩 읽음"""
+    decoder = json.JSONDecoder()
+    with open(path, 'r', encoding='utf-8') as f:
+        buffer = ""
+        pos = 0
+        eof = False
+
+        def fill():
+            nonlocal buffer, pos, eof
+            chunk = f.read(READ_CHUNK_SIZE)
+            if not chunk:
+                eof = True
+            buffer = buffer[pos:] + chunk
+            pos = 0
+
+        def skip(chars: str):
+            nonlocal pos
+            while True:
+                while pos < len(buffer) and buffer[pos] in chars:
+                    pos += 1
+                if pos < len(buffer) or eof:
+                    return
+                fill()
+
+        def decode():
+            nonlocal pos
+            while True:
+                try:
+                    value, end = decoder.raw_decode(buffer, pos)
+                    # 숫자 등은 버퍼 끝에서 잘렸을 수 있으므로 뒤에 문자가 더 있을 때만 확정
+                    if end < len(buffer) or eof:
+                        pos = end
+                        return value
+                except json.JSONDecodeError:
+                    if eof:
+                        raise
+                fill()
+
+        fill()
+        skip(" \t\r\n")
+        if buffer[pos:pos + 1] != "{":
+            raise ValueError(f"{path}: 최상위 JSON 객체가 아닙니다.")
+        pos += 1
+        while True:
+            skip(" \t\r\n,")
+            if buffer[pos:pos + 1] == "}" or (eof and pos >= len(buffer)):
+                return
+            key = decode()
+            skip(" \t\r\n:")
+            yield key, decode()
+
+
+def iter_backup(source: str) -> Iterator[Tuple[str, Dict]]:
+    """백업 폴더에서 (참여자코드, 문서) 를 하나씩 읽음"""
+    json_file = os.path.join(source, "all_conversations.json")
+    if os.path.exists(json_file):
+        yield from iter_json_object(json_file)
+        return
+
+    participants_folder = os.path.join(source, "participants")
+    for filename in sorted(os.listdir(participants_folder)):
+        if filename.startswith("participant_") and filename.endswith(".json"):
+            with open(os.path.join(participants_folder, filename), 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            yield data.get("participant_code") or filename[len("participant_"):-len(".json")], data
+
+
+def store_run_manifest(run_id: str) -> str:
+    """backup_store 실행 manifest 파일 경로"""
+    from backup_store import BackupStore
+
+    return os.path.join(BackupStore().runs_dir, f"{run_id}.json")
+
+
+def iter_store_run(run_id: str) -> Iterator[Tuple[str, Dict]]:
+    """backup_store 실행 manifest 에서 (참여자코드, 문서) 를 하나씩 읽음"""
+    from backup_store import BackupStore
+
+    store = BackupStore()
+    with open(store_run_manifest(run_id), 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    for code, digest in manifest["participants"].items():
+        yield code, store.get(digest)
+
+
+def source_fingerprint(path: str) -> str:
+    """백업 원본(파일 또는 백업 폴더)의 크기/수정 시각 요약
+
+    원본이 바뀌면 배치 구성도 바뀌므로 체크포인트가 같은 원본에 대한 것인지 확인하는 데 사용
+    """
+    if os.path.isdir(path):
+        json_file = os.path.join(path, "all_conversations.json")
+        if os.path.exists(json_file):
+            return source_fingerprint(json_file)
+        participants_folder = os.path.join(path, "participants")
+        count = total = latest = 0
+        for entry in os.scandir(participants_folder):
+            if entry.name.startswith("participant_") and entry.name.endswith(".json"):
+                stat = entry.stat()
+                count += 1
+                total += stat.st_size
+                latest = max(latest, stat.st_mtime_ns)
+        return f"participants:{count}:{total}:{latest}"
+    stat = os.stat(path)
+    return f"{os.path.basename(path)}:{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def document_bytes(participant_code: str, data: Dict) -> int:
+    """commit 요청에서 문서 하나가 차지하는 대략적인 크기 (바이트)"""
+    return len(participant_code) + len(json.dumps(data, ensure_ascii=False, default=str).encode('utf-8'))
+
+
+def restore_timestamps(data: Dict) -> Dict:
+    """ISO 문자열 필드를 datetime 으로 되돌림 (Firestore에 timestamp 로 저장됨)"""
+    restored = dict(data)
+    for field in TIMESTAMP_FIELDS:
+        value = restored.get(field)
+        if isinstance(value, str) and value:
+            try:
+                restored[field] = datetime.fromisoformat(value)
+            except ValueError:
+                pass  # 형식이 다르면 문자열 그대로 둠
+    return restored
+
+
+# --- 체크포인트 -------------------------------------------------------------
+class CheckpointMismatchError(Exception):
+    """체크포인트가 다른 원본이나 다른 배치 설정으로 만들어져 이어서 실행할 수 없음"""
+
+
+class Checkpoint:
+    """완료된 배치 번호를 기록하는 체크포인트 파일 (스레드 안전)
+
+    배치 번호는 원본 내용과 배치 크기 설정이 같을 때만 같은 문서들을 가리키므로,
+    기록된 원본/설정이 지금 실행과 다르면 CheckpointMismatchError 를 발생시킵니다.
+    """
+
+    def __init__(self, path: Optional[str], source: str, fingerprint: str = "",
+                 batch_size: int = 400, max_batch_bytes: int = MAX_BATCH_BYTES):
+        self.path = path
+        self.key = {
+            "source": source,
+            "fingerprint": fingerprint,
+            "batch_size": min(batch_size, MAX_BATCH_SIZE),
+            "max_batch_bytes": max_batch_bytes,
+        }
+        self.completed = set()
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            completed = set(data.get("completed_batches", []))
+            if completed:
+                stored = {name: data.get(name) for name in self.key}
+                if stored != self.key:
+                    changed = ", ".join(f"{name}: {stored[name]!r} → {self.key[name]!r}"
+                                        for name in self.key if stored[name] != self.key[name])
+                    raise CheckpointMismatchError(
+                        f"체크포인트 {path} 가 다른 원본/배치 설정으로 만들어졌습니다 ({changed}). "
+                        f"같은 설정으로 다시 실행하거나 체크포인트 파일을 지우고 처음부터 복원하세요.")
+            self.completed = completed
+
+    @property
+    def batch_size(self) -> int:
+        return self.key["batch_size"]
+
+    @property
+    def max_batch_bytes(self) -> int:
+        return self.key["max_batch_bytes"]
+
+    def mark(self, batch_index: int):
+        with self._lock:
+            self.completed.add(batch_index)
+            if not self.path:
+                return
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(dict(self.key, completed_batches=sorted(self.completed)), f)
+            os.replace(tmp_path, self.path)
+
+
+# --- 복원 -------------------------------------------------------------------
+def commit_batch(db, collection: str, docs, retries: int = 5):
+    """배치 하나를 commit (일시적 오류는 지수 백오프로 재시도)"""
+    for attempt in range(retries):
+        try:
+            batch = db.batch()
+            for participant_code, data in docs:
+                batch.set(db.collection(collection).document(participant_code), data)
+            batch.commit()
+            return
+        except Exception:
+            if attempt == retries - 1:
+                raise
+            time.sleep(min(30.0, 0.5 * 2 ** attempt))
+
+
+def restore(records: Iterator[Tuple[str, Dict]], db=None, collection: str = "conversations",
+            batch_size: int = 400, workers: int = 8, checkpoint: Optional[Checkpoint] = None,
+            dry_run: bool = False, max_batch_bytes: int = MAX_BATCH_BYTES) -> Dict:
+    """(참여자코드, 문서) 스트림을 병렬 배치 commit 으로 복원하고 요약을 반환
+
+    배치는 batch_size 건 또는 max_batch_bytes 중 먼저 닿는 쪽에서 나눕니다.
+    """
+    batch_size = min(batch_size, MAX_BATCH_SIZE)
+    checkpoint = checkpoint or Checkpoint(None, "", batch_size=batch_size, max_batch_bytes=max_batch_bytes)
+    if (checkpoint.batch_size, checkpoint.max_batch_bytes) != (batch_size, max_batch_bytes):
+        raise CheckpointMismatchError("체크포인트의 배치 설정이 복원 설정과 다릅니다.")
+    summary = {"batches": 0, "skipped_batches": 0, "documents": 0, "failed_batches": []}
+    start = time.perf_counter()
+
+    def batches():
+        docs = []
+        docs_bytes = 0
+        for participant_code, data in records:
+            size = document_bytes(participant_code, data)
+            if docs and docs_bytes + size > max_batch_bytes:
+                yield docs
+                docs, docs_bytes = [], 0
+            docs.append((participant_code, restore_timestamps(data)))
+            docs_bytes += size
+            if len(docs) >= batch_size:
+                yield docs
+                docs, docs_bytes = [], 0
+        if docs:
+            yield docs
+
+    def report():
+        elapsed = time.perf_counter() - start
+        print(f"  📤 {summary['documents']}건 복원 ({summary['documents'] / elapsed if elapsed else 0:.0f}건/초)")
+
+    if dry_run:
+        for index, docs in enumerate(batches()):
+            summary["batches"] += 1
+            summary["documents"] += len(docs)
+        summary["elapsed"] = time.perf_counter() - start
+        return summary
+
+    # 읽기는 스트리밍, commit 은 최대 workers * 2 개까지만 대기열에 둠 (메모리 제한)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = {}
+
+        def collect(done):
+            for future in done:
+                index, count = pending.pop(future)
+                try:
+                    future.result()
+                    checkpoint.mark(index)
+                    summary["batches"] += 1
+                    summary["documents"] += count
+                    if summary["batches"] % 10 == 0:
+                        report()
+                except Exception as e:
+                    print(f"  ❌ 배치 {index} 실패: {str(e)}")
+                    summary["failed_batches"].append(index)
+
+        for index, docs in enumerate(batches()):
+            if index in checkpoint.completed:
+                summary["skipped_batches"] += 1
+                continue
+            if len(pending) >= workers * 2:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                collect(done)
+            pending[executor.submit(commit_batch, db, collection, docs)] = (index, len(docs))
+        collect(wait(pending).done)
+
+    summary["elapsed"] = time.perf_counter() - start
+    return summary
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="R.A.I. 백업 → Firestore 병렬 복원")
+    parser.add_argument("source", nargs="?", help="firestore_backup_* 백업 폴더")
+    parser.add_argument("--run", help="backup_store 실행 ID에서 복원")
+    parser.add_argument("--collection", default="conversations", help="복원할 컬렉션 이름")
+    parser.add_argument("--batch-size", type=int, default=400, help=f"배치당 문서 수 (최대 {MAX_BATCH_SIZE})")
+    parser.add_argument("--max-batch-mb", type=float, default=MAX_BATCH_BYTES / (1024 * 1024),
+                        help="배치당 최대 크기 (MB, commit 요청 한도 10 MiB 보다 작게)")
+    parser.add_argument("--workers", type=int, default=8, help="동시 commit 수")
+    parser.add_argument("--checkpoint", help="체크포인트 파일 (기본값: <source>.restore_checkpoint.json)")
+    parser.add_argument("--dry-run", action="store_true", help="읽기/변환만 하고 쓰지 않음")
+    args = parser.parse_args()
+
+    if not args.source and not args.run:
+        parser.error("백업 폴더 또는 --run 중 하나가 필요합니다.")
+
+    source = args.source or f"backup_store:{args.run}"
+    records = iter_store_run(args.run) if args.run else iter_backup(args.source)
+    checkpoint_path = args.checkpoint or f"{(args.source or args.run).rstrip('/')}.restore_checkpoint.json"
+    batch_size = min(args.batch_size, MAX_BATCH_SIZE)
+    max_batch_bytes = int(args.max_batch_mb * 1024 * 1024)
+
+    print("♻️ Firestore 복원 도구")
+    print("=" * 50)
+    print(f"📁 원본: {source}  →  컬렉션: {args.collection}")
+
+    db = None
+    if not args.dry_run:
+        from firestore_handler import firestore_handler
+        if not firestore_handler or not firestore_handler.is_available():
+            print("❌ Firestore 연결 불가능. Firebase 설정을 확인해주세요.")
+            return 1
+        db = firestore_handler.db
+
+    try:
+        fingerprint = source_fingerprint(store_run_manifest(args.run) if args.run else args.source)
+        checkpoint = Checkpoint(None if args.dry_run else checkpoint_path, source, fingerprint,
+                                batch_size, max_batch_bytes)
+    except CheckpointMismatchError as e:
+        print(f"❌ {str(e)}")
+        return 1
+    if checkpoint.completed:
+        print(f"⏩ 체크포인트에서 이어서 실행: 완료된 배치 {len(checkpoint.completed)}개 건너뜀")
+
+    summary = restore(records, db, args.collection, batch_size, args.workers, checkpoint, args.dry_run,
+                      max_batch_bytes)
+
+    print("=" * 50)
+    mode = "드라이런" if args.dry_run else "복원"
+    print(f"✅ {mode} 완료: 문서 {summary['documents']}건, 배치 {summary['batches']}개, "
+          f"{summary['elapsed']:.1f}초")
+    if summary["skipped_batches"]:
+        print(f"⏩ 건너뛴 배치: {summary['skipped_batches']}개")
+    if summary["failed_batches"]:
+        print(f"❌ 실패한 배치: {summary['failed_batches']} - 다시 실행하면 실패한 배치만 재시도합니다.")
+        return 1
+    if not args.dry_run and args.collection == "conversations":
+        # 복원한 문서는 통계 요약 문서에 반영되지 않음
+        print("💡 통계 요약 문서 갱신: python aggregates.py rebuild --firestore")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
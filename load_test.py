@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+# =============================================================
+# File: load_test.py
+# 동시 참여자 부하 테스트 (LLM / Firestore 스텁 사용)
+# =============================================================
+"""
+앱 프로세스 하나가 동시 참여자를 몇 명까지 감당할 수 있는지 측정하는 부하 테스트
+
+참여자 한 명의 턴 흐름을 app.py 와 같은 순서로 실행합니다:
+    히스토리 추가 → chatbot_core.stream_completion → save_conversation_log → 통계 조회
+
+- LLM: fake_llm.FakeChatCompletionsClient (지연시간/스트리밍/429 재현)
+- Firestore: fake_firestore.FakeFirestoreClient (RPC 지연 재현)
+- Streamlit 세션처럼 참여자마다 스레드 하나, 턴 사이에는 생각 시간(think time)
+
+사용법:
+    python load_test.py                                  # 기본 동시성 단계 1,5,10,25,50
+    python load_test.py --concurrency 10,50,100 --duration 60
+    python load_test.py --rpm-limit 300 --firestore-latency 0.05
+    python load_test.py --report load_report.json
+
+단계별로 처리량(turns/s), 턴 지연시간 p50/p99, 단계(stage)별 시간 비중, 오류 수를
+출력하고, 동시성을 늘려도 처리량이 늘지 않고 p99만 커지는 지점을 포화점으로 표시합니다.
+"""
+
+import os
+import sys
+import json
+import random
+import shutil
+import argparse
+import tempfile
+import threading
+import statistics
+from collections import defaultdict
+from datetime import datetime
+from time import perf_counter, sleep
+from typing import Dict, List
+
+STAGES = ("complete", "ttft", "save_local_log", "save_firestore_log", "stats")
+
+
+def percentile(values: List[float], q: float) -> float:
+    from metrics import percentile as _percentile
+    return _percentile(sorted(values), q)
+
+
+class LoadResult:
+    """한 동시성 단계의 측정 결과 (스레드 안전)"""
+
+    def __init__(self):
+        self.turn_latencies: List[float] = []
+        self.stage_times: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def add_turn(self, latency: float, stages: Dict[str, float]):
+        with self._lock:
+            self.turn_latencies.append(latency)
+            for stage, value in stages.items():
+                self.stage_times[stage].append(value)
+
+    def add_error(self, kind: str):
+        with self._lock:
+            self.errors[kind] += 1
+
+
+def simulate_participant(index: int, args, result: LoadResult, stop_at: float, rng: random.Random):
+    """참여자 한 명의 대화 루프 (stop_at 까지 반복)"""
+    import chatbot_core
+    import conversation_log
+    from azure.ai.inference.models import UserMessage, AssistantMessage
+    from synthetic_text import random_text
+    from metrics import new_turn_id
+
+    participant_code = f"{index:08d}"
+    history = []
+
+    # 참여자 도착 시점을 분산
+    sleep(rng.uniform(0, args.think_mean))
+
+    while perf_counter() < stop_at:
+        turn_id = new_turn_id()
+        stages = {}
+        turn_start = perf_counter()
+        history.append(UserMessage(content=random_text(rng, 2, 15)))
+
+        try:
+            chunks = []
+            start = perf_counter()
+            # max_tokens 고정: 적응형 예산이 단계마다 달라지면 단계 간 비교가 어려움
+            for chunk in chatbot_core.stream_completion(history, participant_code=participant_code,
+                                                        turn_id=turn_id,
+                                                        max_tokens=chatbot_core.MAX_TOKENS):
+                if not chunks:
+                    stages["ttft"] = perf_counter() - start
+                chunks.append(chunk)
+            stages["complete"] = perf_counter() - start
+            history.append(AssistantMessage(content="".join(chunks)))
+        except Exception as e:
+            history.pop()  # 실패한 턴의 사용자 메시지 제거 (사용자가 다시 입력하는 상황)
+            result.add_error("429" if getattr(e, "status_code", None) == 429 else type(e).__name__)
+            sleep(rng.expovariate(1.0 / args.think_mean))
+            continue
+
+        start = perf_counter()
+        conversation_log.save_local_log(participant_code, history)
+        stages["save_local_log"] = perf_counter() - start
+
+        start = perf_counter()
+        conversation_log.save_firestore_log(participant_code, history)
+        stages["save_firestore_log"] = perf_counter() - start
+
+        # 다음 rerun 에서 사이드바가 통계를 다시 조회
+        start = perf_counter()
+        conversation_log.get_conversation_stats()
+        stages["stats"] = perf_counter() - start
+
+        result.add_turn(perf_counter() - turn_start, stages)
+
+        # 생각 시간: 지수분포 (평균 think_mean 초)
+        sleep(rng.expovariate(1.0 / args.think_mean) if args.think_mean > 0 else 0)
+
+
+def run_level(concurrency: int, args) -> Dict:
+    """동시 참여자 concurrency 명으로 duration 초 동안 실행"""
+    result = LoadResult()
+    stop_at = perf_counter() + args.duration
+    threads = [
+        threading.Thread(
+            target=simulate_participant,
+            args=(i, args, result, stop_at, random.Random(args.seed + i)),
+            daemon=True,
+        )
+        for i in range(concurrency)
+    ]
+    wall_start = perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = perf_counter() - wall_start
+
+    latencies = result.turn_latencies
+    stage_totals = {stage: sum(result.stage_times.get(stage, [])) for stage in STAGES if stage != "ttft"}
+    busy = sum(stage_totals.values()) or 1.0
+    return {
+        "concurrency": concurrency,
+        "turns": len(latencies),
+        "throughput": len(latencies) / wall,
+        "p50": percentile(latencies, 0.5) if latencies else 0.0,
+        "p99": percentile(latencies, 0.99) if latencies else 0.0,
+        "ttft_p50": percentile(result.stage_times["ttft"], 0.5) if result.stage_times["ttft"] else 0.0,
+        "stage_share": {stage: total / busy for stage, total in stage_totals.items()},
+        "stage_mean": {stage: statistics.mean(v) for stage, v in result.stage_times.items() if v},
+        "errors": dict(result.errors),
+    }
+
+
+def find_saturation(levels: List[Dict]):
+    """처리량 증가가 10% 미만인데 p99가 50% 이상 늘어난 첫 단계를 포화점으로 판단"""
+    for prev, cur in zip(levels, levels[1:]):
+        if prev["throughput"] <= 0:
+            continue
+        throughput_gain = cur["throughput"] / prev["throughput"] - 1
+        p99_growth = cur["p99"] / prev["p99"] - 1 if prev["p99"] else 0
+        if throughput_gain < 0.10 and p99_growth > 0.50:
+            return cur["concurrency"]
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="R.A.I. 동시 참여자 부하 테스트")
+    parser.add_argument("--concurrency", default="1,5,10,25,50", help="쉼표로 구분한 동시 참여자 수 단계")
+    parser.add_argument("--duration", type=float, default=30.0, help="단계별 실행 시간(초)")
+    parser.add_argument("--think-mean", type=float, default=3.0, help="평균 생각 시간(초)")
+    parser.add_argument("--ttft-mean", type=float, default=0.6, help="LLM 평균 첫 토큰 시간(초)")
+    parser.add_argument("--tokens-per-second", type=float, default=60.0, help="LLM 토큰 생성 속도")
+    parser.add_argument("--backend-slots", type=int, default=32, help="LLM 백엔드 동시 처리 슬롯")
+    parser.add_argument("--rpm-limit", type=int, default=None, help="분당 요청 한도 (초과 시 429)")
+    parser.add_argument("--firestore-latency", type=float, default=0.03, help="Firestore RPC 지연(초)")
+    parser.add_argument("--no-firestore", action="store_true", help="로컬 저장만 사용")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--report", help="결과를 저장할 JSON 파일")
+    args = parser.parse_args()
+
+    # chatbot_core 는 import 시 환경 변수를 읽으므로 더미 값을 채워 둠 (실제 호출은 스텁으로 대체)
+    os.environ.setdefault("AZURE_AI_ENDPOINT", "https://load-test.invalid")
+    os.environ.setdefault("AZURE_AI_SECRET", "load-test")
+    os.environ.setdefault("RAI_METRICS_DISABLED", "1")
+    repo_dir = os.path.dirname(os.path.abspath(__file__))
+    if repo_dir not in sys.path:
+        sys.path.insert(0, repo_dir)
+
+    import chatbot_core
+    import conversation_log
+    import aggregates
+    from fake_llm import FakeChatCompletionsClient
+    from fake_firestore import FakeFirestoreClient
+    from firestore_handler import FirestoreHandler
+
+    levels = [int(c) for c in args.concurrency.split(",") if c.strip()]
+    report_path = os.path.abspath(args.report) if args.report else None
+
+    # logs/ 등 상대 경로에 쓰므로 임시 디렉토리에서 실행
+    workdir = tempfile.mkdtemp(prefix="rai_load_")
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    results = []
+    try:
+        print(f"🚦 부하 테스트: 단계 {levels}, 단계당 {args.duration:.0f}초, 생각 시간 평균 {args.think_mean}초")
+        print("=" * 96)
+        print(f"{'동시성':>6} {'턴':>7} {'turns/s':>9} {'p50':>8} {'p99':>8} {'ttft50':>8}  "
+              f"{'시간 비중 (complete/local/firestore/stats)':<44} 오류")
+        for concurrency in levels:
+            # 단계마다 백엔드/저장소 상태를 새로 시작
+            chatbot_core.client = FakeChatCompletionsClient(
+                ttft_mean=args.ttft_mean,
+                tokens_per_second=args.tokens_per_second,
+                max_concurrency=args.backend_slots,
+                rpm_limit=args.rpm_limit,
+                seed=args.seed,
+            )
+            shutil.rmtree("logs", ignore_errors=True)
+            # 통계 집계도 임시 디렉토리에 새로 시작 (실제 logs/.aggregates.json 에 합쳐지지 않도록,
+            # 이 저장소는 atexit 에 등록되지 않으므로 임시 디렉토리 삭제 후 다시 쓰지 않음)
+            aggregates.aggregate_store = aggregates.AggregateStore(
+                os.path.join("logs", ".aggregates.json"))
+            if args.no_firestore:
+                conversation_log.FIRESTORE_AVAILABLE = False
+                conversation_log.firestore_handler = None
+            else:
+                conversation_log.FIRESTORE_AVAILABLE = True
+                conversation_log.firestore_handler = FirestoreHandler(
+                    db=FakeFirestoreClient(latency=args.firestore_latency))
+
+            level = run_level(concurrency, args)
+            results.append(level)
+            share = level["stage_share"]
+            share_text = " / ".join(f"{share.get(s, 0) * 100:4.1f}%"
+                                    for s in ("complete", "save_local_log", "save_firestore_log", "stats"))
+            print(f"{concurrency:>6} {level['turns']:>7} {level['throughput']:>9.2f} "
+                  f"{level['p50']:>7.2f}s {level['p99']:>7.2f}s {level['ttft_p50']:>7.2f}s  "
+                  f"{share_text:<44} {level['errors'] or '-'}")
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+    print("=" * 96)
+
+    saturation = find_saturation(results)
+    if saturation:
+        print(f"📉 포화점: 동시 참여자 {saturation}명 부근에서 처리량이 늘지 않고 지연시간만 증가")
+    else:
+        print("📈 측정 범위 안에서는 포화점이 보이지 않습니다. --concurrency 를 늘려 보세요.")
+
+    if report_path:
+        with open(report_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                "created_at": datetime.now().isoformat(),
+                "params": vars(args),
+                "levels": results,
+                "saturation": saturation,
+            }, f, ensure_ascii=False, indent=2)
+        print(f"💾 결과 저장: {report_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -15,6 +15,9 @@ import os
 from datetime import datetime
 import pandas as pd
 
+import log_storage
+import aggregates
+
 def analyze_logs():
     """로그 파일들을 분석하여 통계를 출력"""
     
@@ -22,24 +25,18 @@ def analyze_logs():
         print("❌ logs 디렉토리가 존재하지 않습니다.")
         return
     
-    log_files = [f for f in os.listdir("logs") if f.startswith("participant_") and f.endswith(".json")]
+    log_count = log_storage.count_logs()
     
-    if not log_files:
+    if not log_count:
         print("❌ 로그 파일이 없습니다.")
         return
     
-    print(f"📊 총 {len(log_files)}명의 참여자 로그 분석 중...")
+    print(f"📊 총 {log_count}명의 참여자 로그 분석 중...")
     print("=" * 60)
     
     all_data = []
-    total_messages = 0
-    total_user_messages = 0
-    total_ai_messages = 0
     
-    for log_file in log_files:
-        with open(f"logs/{log_file}", 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        
+    for data in log_storage.iter_logs():
         participant_code = data['participant_code']
         message_count = data['message_count']
         conversation_start = data.get('conversation_start', 'N/A')
@@ -49,10 +46,6 @@ def analyze_logs():
         user_msgs = len([msg for msg in data['conversation'] if msg['role'] == 'user'])
         ai_msgs = len([msg for msg in data['conversation'] if msg['role'] == 'assistant'])
         
-        total_messages += message_count
-        total_user_messages += user_msgs
-        total_ai_messages += ai_msgs
-        
         print(f"👤 참여자 {participant_code}:")
         print(f"   📝 총 메시지: {message_count}개 (사용자: {user_msgs}, AI: {ai_msgs})")
         print(f"   🕐 시작: {conversation_start}")
@@ -70,12 +63,16 @@ def analyze_logs():
         })
     
     print("=" * 60)
-    print("📈 전체 통계:")
-    print(f"   👥 총 참여자 수: {len(log_files)}명")
-    print(f"   💬 총 메시지 수: {total_messages}개")
-    print(f"   👤 사용자 메시지: {total_user_messages}개")
-    print(f"   🤖 AI 메시지: {total_ai_messages}개")
-    print(f"   📊 평균 메시지/참여자: {total_messages/len(log_files):.1f}개")
+    show_aggregate_stats()
+
+def show_aggregate_stats():
+    """저장할 때마다 갱신되는 집계(aggregates.py)에서 전체 통계를 바로 출력"""
+    aggregates.aggregate_store.ensure_built()
+    summary = aggregates.get_aggregates().summary()
+    if not summary["participants"]:
+        print("❌ 집계된 대화가 없습니다.")
+        return
+    aggregates.print_summary(summary)
     print("=" * 60)
 
 def export_to_csv():
@@ -85,18 +82,13 @@ def export_to_csv():
         print("❌ logs 디렉토리가 존재하지 않습니다.")
         return
     
-    log_files = [f for f in os.listdir("logs") if f.startswith("participant_") and f.endswith(".json")]
-    
-    if not log_files:
+    if not log_storage.count_logs():
         print("❌ 로그 파일이 없습니다.")
         return
     
     all_conversations = []
     
-    for log_file in log_files:
-        with open(f"logs/{log_file}", 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        
+    for data in log_storage.iter_logs():
         participant_code = data['participant_code']
         
         for i, msg in enumerate(data['conversation']):
@@ -120,9 +112,9 @@ def export_to_csv():
 def view_participant_conversation(participant_code):
     """특정 참여자의 대화 내용 보기"""
     
-    log_file = f"logs/participant_{participant_code}.json"
+    log_file = log_storage.find_log_path(participant_code)
     
-    if not os.path.exists(log_file):
+    if not log_file:
         print(f"❌ 참여자 {participant_code}의 로그 파일을 찾을 수 없습니다.")
         return
     
@@ -138,6 +130,49 @@ def view_participant_conversation(participant_code):
         print(f"{i:2d}. {role_icon} {role_name}: {msg['content']}")
         print()
 
+def search_conversations(query, role=None, limit=20):
+    """전체 대화 내용에서 검색어가 포함된 메시지 찾기 (search_index.py 사용)"""
+    from search_index import get_index, print_hits
+    
+    hits = get_index().search(query, role=role, limit=limit)
+    if not hits:
+        print(f"❌ '{query}'에 해당하는 메시지가 없습니다.")
+        return
+    
+    print(f"🔎 '{query}' 검색 결과: {len(hits)}건")
+    print("=" * 60)
+    print_hits(hits)
+
+def cluster_user_prompts(threshold=0.6, top=10):
+    """비슷한 사용자 질문끼리 묶어서 보기 (prompt_similarity.py 의 MinHash/LSH 사용)"""
+    from prompt_similarity import cluster_prompts
+    
+    if not os.path.exists("logs"):
+        print("❌ logs 디렉토리가 존재하지 않습니다.")
+        return
+    
+    prompts = []
+    for data in log_storage.iter_logs():
+        for msg in data['conversation']:
+            if msg['role'] == 'user' and msg.get('content'):
+                prompts.append((data['participant_code'], msg['content']))
+    
+    if not prompts:
+        print("❌ 사용자 메시지가 없습니다.")
+        return
+    
+    clusters = cluster_prompts([content for _, content in prompts], threshold)
+    
+    print(f"🧩 사용자 메시지 {len(prompts)}개 중 유사 질문 묶음 {len(clusters)}개 (유사도 ≥ {threshold})")
+    print("=" * 60)
+    
+    for i, cluster in enumerate(clusters[:top], 1):
+        participants = {prompts[j][0] for j in cluster}
+        print(f"{i:2d}. 📦 {len(cluster)}개 메시지 / 참여자 {len(participants)}명")
+        for j in cluster[:3]:
+            print(f"     💬 {prompts[j][1]}")
+        print()
+
 if __name__ == "__main__":
     print("🔍 R.A.I. 대화 로그 분석기")
     print("=" * 60)
@@ -147,7 +182,10 @@ if __name__ == "__main__":
         print("1. 📊 전체 로그 분석")
         print("2. 📁 CSV로 내보내기")
         print("3. 👤 특정 참여자 대화 보기")
-        print("4. 🚪 종료")
+        print("4. 🔎 대화 내용 검색")
+        print("5. 🧩 유사 질문 묶기")
+        print("6. 📈 전체 통계만 보기 (집계)")
+        print("7. 🚪 종료")
         
         choice = input("\n번호를 입력하세요: ").strip()
         
@@ -163,6 +201,14 @@ if __name__ == "__main__":
             if participant_code:
                 view_participant_conversation(participant_code)
         elif choice == "4":
+            query = input("검색어를 입력하세요: ").strip()
+            if query:
+                search_conversations(query)
+        elif choice == "5":
+            cluster_user_prompts()
+        elif choice == "6":
+            show_aggregate_stats()
+        elif choice == "7":
             print("👋 분석기를 종료합니다.")
             break
         else:
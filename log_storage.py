@@ -0,0 +1,295 @@
+# =============================================================
+# File: log_storage.py
+# 로컬 대화 로그 파일 입출력 (원자적 쓰기 / 잠금 / 복구)
+# =============================================================
+"""
+logs/participant_<code>.json 파일을 여러 프로세스가 동시에 써도 깨지지 않도록
+하는 저수준 입출력 모듈
+
+- 원자적 쓰기: 같은 디렉토리의 임시 파일에 쓰고 fsync 후 os.replace
+  (읽는 쪽은 항상 이전 파일 전체 또는 새 파일 전체만 보게 됨)
+- 참여자별 advisory lock: logs/.locks/<샤드>/participant_<code>.lock 에 fcntl.flock
+  (전역 잠금 없이 서로 다른 참여자는 동시에 저장 가능)
+- 시작 시 복구: 중단된 쓰기로 남은 임시 파일만 찾아 정리 (가능한 경우 완전한 임시
+  파일로 복원). 로그를 파싱하지 않으므로 로그 수가 많아도 빠름
+- 전체 검사(python log_storage.py recover): 모든 로그를 파싱하여 깨진(torn) JSON 파일 격리
+
+Streamlit 서버 프로세스를 여러 개 띄우거나 백업/분석 도구가 같은 파일을
+읽어도 안전합니다.
+
+디렉토리 구조 (샤딩):
+    logs/29/80/participant_29808372.json     # 참여자 코드 앞 2자리 / 다음 2자리
+한 디렉토리에 파일이 수십만 개 쌓이지 않도록 코드 앞자리로 나누어 저장합니다.
+예전의 평평한 구조(logs/participant_<code>.json)도 그대로 읽을 수 있으며,
+해당 참여자가 다시 저장될 때 샤드 위치로 옮겨집니다. 한꺼번에 옮기려면:
+    python log_storage.py migrate [--dry-run]
+
+환경 변수:
+- RAI_LOG_SHARDED: "0"이면 새 로그도 평평한 구조로 저장 (기본값: 1)
+"""
+
+import os
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: 잠금 없이 원자적 쓰기만 사용
+    fcntl = None
+
+LOGS_DIR = "logs"
+LOCKS_DIR = ".locks"
+CORRUPT_DIR = ".corrupt"
+TMP_SUFFIX = ".tmp"
+STALE_TMP_SECONDS = 300  # 이보다 오래된 임시 파일은 중단된 쓰기로 간주
+SHARDED = os.environ.get("RAI_LOG_SHARDED", "1") != "0"
+SCAN_WORKERS = 8
+
+
+def shard_parts(participant_code: str) -> List[str]:
+    """참여자 코드 → 샤드 디렉토리 이름 2단계 (예: 29808372 → ['29', '80'])"""
+    code = str(participant_code).ljust(4, "_")
+    return [code[:2], code[2:4]]
+
+
+def flat_log_path(participant_code: str, logs_dir: str = LOGS_DIR) -> str:
+    """예전 평평한 구조의 로그 파일 경로"""
+    return os.path.join(logs_dir, f"participant_{participant_code}.json")
+
+
+def sharded_log_path(participant_code: str, logs_dir: str = LOGS_DIR) -> str:
+    return os.path.join(logs_dir, *shard_parts(participant_code), f"participant_{participant_code}.json")
+
+
+def log_path(participant_code: str, logs_dir: str = LOGS_DIR) -> str:
+    """새로 저장할 참여자 로그 파일 경로"""
+    if SHARDED:
+        return sharded_log_path(participant_code, logs_dir)
+    return flat_log_path(participant_code, logs_dir)
+
+
+def find_log_path(participant_code: str, logs_dir: str = LOGS_DIR) -> Optional[str]:
+    """기존 로그 파일 경로 (샤드 → 평평한 구조 순서로 확인, 없으면 None)"""
+    for path in (sharded_log_path(participant_code, logs_dir), flat_log_path(participant_code, logs_dir)):
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def _is_log_file(filename: str) -> bool:
+    return filename.startswith("participant_") and filename.endswith(".json")
+
+
+def _code_from_filename(filename: str) -> str:
+    return filename[len("participant_"):-len(".json")]
+
+
+def _scan_dir(directory: str) -> List[str]:
+    """디렉토리 하위(숨김 디렉토리 제외)의 로그 파일 경로 목록"""
+    paths = []
+    for dirpath, dirnames, filenames in os.walk(directory):
+        dirnames[:] = sorted(d for d in dirnames if not d.startswith("."))
+        paths.extend(os.path.join(dirpath, name) for name in sorted(filenames) if _is_log_file(name))
+    return paths
+
+
+def iter_log_paths(logs_dir: str = LOGS_DIR, workers: int = SCAN_WORKERS) -> Iterator[str]:
+    """평평한 구조 + 모든 샤드의 로그 파일 경로 (최상위 샤드별로 병렬 탐색)"""
+    if not os.path.isdir(logs_dir):
+        return
+    shard_dirs = []
+    for entry in sorted(os.scandir(logs_dir), key=lambda e: e.name):
+        if entry.is_file() and _is_log_file(entry.name):
+            yield entry.path
+        elif entry.is_dir() and not entry.name.startswith("."):
+            shard_dirs.append(entry.path)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for paths in executor.map(_scan_dir, shard_dirs):
+            yield from paths
+
+
+def count_logs(logs_dir: str = LOGS_DIR) -> int:
+    """로그 파일(참여자) 수"""
+    return sum(1 for _ in iter_log_paths(logs_dir))
+
+
+def _load_log(path: str) -> Optional[Dict]:
+    try:
+        return read_json(path)
+    except ValueError:
+        print(f"⚠️ 깨진 로그 파일 건너뜀: {path}")
+        return None
+
+
+def iter_logs(logs_dir: str = LOGS_DIR, workers: int = SCAN_WORKERS) -> Iterator[Dict]:
+    """모든 참여자 로그(JSON)를 병렬로 읽어 하나씩 반환 (순서는 경로 순)"""
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        batch = []
+        for path in iter_log_paths(logs_dir, workers):
+            batch.append(path)
+            if len(batch) >= 256:
+                yield from (data for data in executor.map(_load_log, batch) if data is not None)
+                batch = []
+        yield from (data for data in executor.map(_load_log, batch) if data is not None)
+
+
+@contextmanager
+def file_lock(lock_path: str, shared: bool = False):
+    """잠금 파일에 대한 프로세스 간 잠금 (fcntl.flock, shared=True 이면 공유 잠금)"""
+    if fcntl is None:
+        yield
+        return
+    os.makedirs(os.path.dirname(lock_path) or ".", exist_ok=True)
+    with open(lock_path, 'a') as lock_file:
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+@contextmanager
+def participant_lock(participant_code: str, logs_dir: str = LOGS_DIR):
+    """참여자 한 명의 로그 파일에 대한 프로세스 간 배타적 잠금"""
+    # 잠금 파일도 로그와 같은 방식으로 샤딩 (한 디렉토리에 몰리지 않도록)
+    locks_dir = os.path.join(logs_dir, LOCKS_DIR, *shard_parts(participant_code))
+    with file_lock(os.path.join(locks_dir, f"participant_{participant_code}.lock")):
+        yield
+
+
+def atomic_write_json(path: str, data: Dict):
+    """임시 파일에 쓴 뒤 rename 하여 파일을 통째로 교체"""
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = os.path.join(directory, f".{os.path.basename(path)}.{os.getpid()}{TMP_SUFFIX}")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def read_json(path: str) -> Optional[Dict]:
+    """JSON 파일을 읽음 (없으면 None)"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _quarantine(path: str, logs_dir: str) -> str:
+    """깨진 파일을 logs/.corrupt/ 로 옮겨 보존"""
+    corrupt_dir = os.path.join(logs_dir, CORRUPT_DIR)
+    os.makedirs(corrupt_dir, exist_ok=True)
+    target = os.path.join(corrupt_dir, f"{os.path.basename(path)}.{datetime.now().strftime('%Y%m%d_%H%M%S')}")
+    os.replace(path, target)
+    return target
+
+
+def _is_valid_json(path: str) -> bool:
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            json.load(f)
+        return True
+    except (OSError, ValueError):
+        return False
+
+
+def recover_logs(logs_dir: str = LOGS_DIR, validate: bool = False) -> Dict[str, int]:
+    """중단된 쓰기 정리 및 깨진 로그 파일 복구 (평평한 구조 + 모든 샤드)
+
+    - 오래된 임시 파일: 대상 파일이 깨졌거나 없고 임시 파일이 온전하면 복원, 아니면 삭제
+    - validate=True 이면 모든 로그를 파싱하여 깨진 JSON 로그를 logs/.corrupt/ 로 격리
+      (로그 수에 비례하므로 서버 시작 시에는 하지 않고 CLI 에서 실행)
+    """
+    summary = {"restored": 0, "removed_tmp": 0, "quarantined": 0}
+    if not os.path.isdir(logs_dir):
+        return summary
+
+    now = time.time()
+    for dirpath, dirnames, filenames in os.walk(logs_dir):
+        dirnames[:] = [d for d in dirnames if not d.startswith(".")]
+        for filename in filenames:
+            if not (filename.startswith(".participant_") and filename.endswith(TMP_SUFFIX)):
+                continue
+            path = os.path.join(dirpath, filename)
+            if now - os.path.getmtime(path) < STALE_TMP_SECONDS:
+                continue  # 다른 프로세스가 쓰는 중일 수 있음
+            # ".participant_<code>.json.<pid>.tmp" → "participant_<code>.json"
+            target = os.path.join(dirpath, filename[1:].rsplit(".", 2)[0])
+            with participant_lock(_code_from_filename(os.path.basename(target)), logs_dir):
+                if not _is_valid_json(target) and _is_valid_json(path):
+                    if os.path.exists(target):
+                        _quarantine(target, logs_dir)
+                        summary["quarantined"] += 1
+                    os.replace(path, target)
+                    summary["restored"] += 1
+                else:
+                    os.remove(path)
+                    summary["removed_tmp"] += 1
+
+    for path in iter_log_paths(logs_dir) if validate else ():
+        if not _is_valid_json(path):
+            with participant_lock(_code_from_filename(os.path.basename(path)), logs_dir):
+                if not _is_valid_json(path):
+                    _quarantine(path, logs_dir)
+                    summary["quarantined"] += 1
+
+    if any(summary.values()):
+        print(f"🩹 로그 복구: 복원 {summary['restored']}개, 임시 파일 삭제 {summary['removed_tmp']}개, "
+              f"격리 {summary['quarantined']}개")
+    return summary
+
+
+def migrate_flat_logs(logs_dir: str = LOGS_DIR, dry_run: bool = False) -> int:
+    """평평한 구조의 로그 파일을 샤드 위치로 옮기고 옮긴 개수를 반환"""
+    if not os.path.isdir(logs_dir):
+        return 0
+    moved = 0
+    for entry in list(os.scandir(logs_dir)):
+        if not (entry.is_file() and _is_log_file(entry.name)):
+            continue
+        code = _code_from_filename(entry.name)
+        target = sharded_log_path(code, logs_dir)
+        if dry_run:
+            print(f"  {entry.path} → {target}")
+            moved += 1
+            continue
+        with participant_lock(code, logs_dir):
+            if not os.path.exists(entry.path):
+                continue
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            if os.path.exists(target):
+                # 이미 샤드에 더 최신 로그가 있으면 평평한 파일은 격리
+                _quarantine(entry.path, logs_dir)
+            else:
+                os.replace(entry.path, target)
+            moved += 1
+    return moved
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="R.A.I. 로컬 로그 저장소 관리")
+    parser.add_argument("--logs-dir", default=LOGS_DIR)
+    sub = parser.add_subparsers(dest="command", required=True)
+    migrate_parser = sub.add_parser("migrate", help="평평한 구조의 로그를 샤드 구조로 이동")
+    migrate_parser.add_argument("--dry-run", action="store_true", help="옮길 파일만 출력")
+    sub.add_parser("recover", help="임시 파일 정리 및 모든 로그 검사 (깨진 로그 격리)")
+    sub.add_parser("count", help="참여자 로그 수")
+    args = parser.parse_args()
+
+    if args.command == "migrate":
+        start = time.perf_counter()
+        moved = migrate_flat_logs(args.logs_dir, args.dry_run)
+        print(f"✅ {'이동 예정' if args.dry_run else '이동 완료'}: {moved}개 ({time.perf_counter() - start:.1f}초)")
+    elif args.command == "recover":
+        print(recover_logs(args.logs_dir, validate=True))
+    elif args.command == "count":
+        print(f"👥 참여자 로그 {count_logs(args.logs_dir)}개")
@@ -0,0 +1,291 @@
+# =============================================================
+# File: metrics.py
+# 턴 단위 지연시간 / 토큰 사용량 계측 모듈
+# =============================================================
+"""
+대화 한 턴에서 시간이 어디에 쓰이는지 기록하는 가벼운 계측 레이어
+
+기록 항목 (stage 이름):
+- turn:               사용자 입력부터 로그 저장까지 한 턴 전체
+- complete:           client.complete 호출 시간
+- ttft:               스트리밍 응답의 첫 토큰까지 걸린 시간
+- save_local_log:     로컬 JSON 로그 저장 시간
+- save_firestore_log: Firestore 로그 저장 시간
+- firestore_get / firestore_set: Firestore 문서 조회/저장 시간
+- tokens_prompt / tokens_completion / tokens_total: response.usage 토큰 수
+
+출력:
+- metrics/metrics.prom:   Prometheus 텍스트 형식 (stage별 히스토그램 + p50/p95/p99)
+- metrics/events.jsonl:   참여자/턴 단위 구조화 이벤트 로그
+- RAI_METRICS_PORT 설정 시 http://localhost:<port>/metrics 로도 노출
+
+환경 변수:
+- RAI_METRICS_DIR:      출력 디렉토리 (기본값: metrics)
+- RAI_METRICS_DISABLED: "1"이면 계측 비활성화
+- RAI_METRICS_PORT:     Prometheus 엔드포인트 포트 (선택)
+
+사용법:
+    python metrics.py                      # events.jsonl 기준 stage별 p50/p95/p99
+    python metrics.py --by-participant     # 참여자별로 나누어 출력
+"""
+
+import os
+import json
+import math
+import time
+import uuid
+import atexit
+import random
+import threading
+from bisect import bisect_left
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, List, Optional
+
+METRICS_DIR = os.environ.get("RAI_METRICS_DIR", "metrics")
+METRICS_ENABLED = os.environ.get("RAI_METRICS_DISABLED", "0") != "1"
+
+# 초 단위 지연시간 버킷 (LLM 호출은 수 초, 로컬 저장은 ms 단위)
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# 토큰 수 버킷
+TOKEN_BUCKETS = (16, 32, 64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384)
+
+QUANTILES = (0.5, 0.95, 0.99)
+RESERVOIR_SIZE = 2048      # stage별 분위수 계산용 샘플 수
+FLUSH_EVERY_EVENTS = 50    # 이벤트가 이만큼 쌓이면 파일에 기록
+FLUSH_EVERY_SECONDS = 5.0  # 혹은 마지막 기록 후 이 시간이 지나면 기록
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """정렬된 값 목록에서 q 분위수(nearest-rank)를 반환"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, math.ceil(q * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+class Histogram:
+    """Prometheus 누적 버킷 + 분위수 계산용 저장소(reservoir)를 가진 히스토그램"""
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # 마지막은 +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.reservoir = deque(maxlen=RESERVOIR_SIZE)
+        self._seen = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        # 최근 샘플 위주로 유지하되 오래된 분포도 일부 반영 (reservoir sampling 변형)
+        self._seen += 1
+        if len(self.reservoir) < RESERVOIR_SIZE or random.random() < RESERVOIR_SIZE / self._seen:
+            self.reservoir.append(value)
+
+    def quantiles(self) -> Dict[float, float]:
+        values = sorted(self.reservoir)
+        return {q: percentile(values, q) for q in QUANTILES}
+
+
+class MetricsRegistry:
+    """stage별 히스토그램과 이벤트 버퍼를 관리하는 레지스트리 (스레드 안전)"""
+
+    def __init__(self, metrics_dir: str = METRICS_DIR, enabled: bool = METRICS_ENABLED):
+        self.metrics_dir = metrics_dir
+        self.enabled = enabled
+        self.histograms: Dict[str, Histogram] = {}
+        self._events: List[Dict] = []
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+
+    # --- 기록 -------------------------------------------------------------
+    def observe(self, stage: str, value: float, participant_code: Optional[str] = None,
+                turn_id: Optional[str] = None, **attrs):
+        """stage 값 하나를 기록 (지연시간은 초, 토큰은 개수)"""
+        if not self.enabled:
+            return
+        event = {
+            "ts": time.time(),
+            "stage": stage,
+            "value": value,
+            "participant_code": participant_code,
+            "turn_id": turn_id,
+        }
+        if attrs:
+            event.update(attrs)
+
+        with self._lock:
+            histogram = self.histograms.get(stage)
+            if histogram is None:
+                buckets = TOKEN_BUCKETS if stage.startswith("tokens_") else LATENCY_BUCKETS
+                histogram = self.histograms[stage] = Histogram(buckets)
+            histogram.observe(value)
+            self._events.append(event)
+            should_flush = (len(self._events) >= FLUSH_EVERY_EVENTS
+                            or time.monotonic() - self._last_flush >= FLUSH_EVERY_SECONDS)
+        if should_flush:
+            self.flush()
+
+    @contextmanager
+    def span(self, stage: str, participant_code: Optional[str] = None,
+             turn_id: Optional[str] = None, **attrs):
+        """with 블록 실행 시간을 stage 지연시간으로 기록"""
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        ok = True
+        try:
+            yield
+        except BaseException:
+            ok = False
+            raise
+        finally:
+            self.observe(stage, time.perf_counter() - start, participant_code, turn_id, ok=ok, **attrs)
+
+    def record_usage(self, usage, participant_code: Optional[str] = None,
+                     turn_id: Optional[str] = None):
+        """response.usage 의 토큰 수를 기록"""
+        if usage is None:
+            return
+        for field in ("prompt_tokens", "completion_tokens", "total_tokens"):
+            value = getattr(usage, field, None)
+            if value is not None:
+                self.observe(f"tokens_{field.split('_')[0]}", value, participant_code, turn_id)
+
+    # --- 내보내기 ---------------------------------------------------------
+    def flush(self):
+        """버퍼된 이벤트를 JSONL에 추가하고 Prometheus 파일을 갱신"""
+        if not self.enabled:
+            return
+        with self._lock:
+            events, self._events = self._events, []
+            self._last_flush = time.monotonic()
+        try:
+            os.makedirs(self.metrics_dir, exist_ok=True)
+            if events:
+                with open(os.path.join(self.metrics_dir, "events.jsonl"), 'a', encoding='utf-8') as f:
+                    f.write("".join(json.dumps(e, ensure_ascii=False) + "\n" for e in events))
+            self.write_prometheus()
+        except Exception as e:
+            # 계측 실패가 앱 동작을 막지 않도록 함
+            print(f"⚠️ 메트릭 기록 실패: {str(e)}")
+
+    def render_prometheus(self) -> str:
+        """현재 히스토그램을 Prometheus 텍스트 형식으로 변환"""
+        lines = [
+            "# HELP rai_stage_value Per-turn stage latency (seconds) or token count",
+            "# TYPE rai_stage_value histogram",
+        ]
+        quantile_lines = [
+            "# HELP rai_stage_quantile Recent p50/p95/p99 per stage",
+            "# TYPE rai_stage_quantile gauge",
+        ]
+        with self._lock:
+            for stage, histogram in sorted(self.histograms.items()):
+                cumulative = 0
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    cumulative += count
+                    lines.append(f'rai_stage_value_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+                lines.append(f'rai_stage_value_bucket{{stage="{stage}",le="+Inf"}} {histogram.count}')
+                lines.append(f'rai_stage_value_sum{{stage="{stage}"}} {histogram.sum}')
+                lines.append(f'rai_stage_value_count{{stage="{stage}"}} {histogram.count}')
+                for q, value in histogram.quantiles().items():
+                    quantile_lines.append(f'rai_stage_quantile{{stage="{stage}",quantile="{q}"}} {value}')
+        return "\n".join(lines + quantile_lines) + "\n"
+
+    def write_prometheus(self):
+        """metrics.prom 파일을 원자적으로 교체"""
+        path = os.path.join(self.metrics_dir, "metrics.prom")
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(self.render_prometheus())
+        os.replace(tmp_path, path)
+
+    def start_http_server(self, port: int):
+        """/metrics 경로로 Prometheus 텍스트를 제공하는 백그라운드 서버 시작"""
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        registry = self
+
+        class _Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.rstrip("/") != "/metrics":
+                    self.send_error(404)
+                    return
+                body = registry.render_prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass  # 요청마다 stderr 출력하지 않음
+
+        server = ThreadingHTTPServer(("0.0.0.0", port), _Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        print(f"📈 메트릭 엔드포인트: http://localhost:{port}/metrics")
+        return server
+
+
+def new_turn_id() -> str:
+    """턴 단위 이벤트를 묶기 위한 짧은 ID"""
+    return uuid.uuid4().hex[:12]
+
+
+# 전역 레지스트리 인스턴스
+metrics = MetricsRegistry()
+atexit.register(metrics.flush)
+
+if metrics.enabled and os.environ.get("RAI_METRICS_PORT"):
+    try:
+        metrics.start_http_server(int(os.environ["RAI_METRICS_PORT"]))
+    except Exception as e:
+        print(f"⚠️ 메트릭 엔드포인트 시작 실패: {str(e)}")
+
+
+def summarize_events(events_file: str, by_participant: bool = False) -> Dict:
+    """events.jsonl 을 읽어 stage(및 참여자)별 p50/p95/p99 를 계산"""
+    groups: Dict[tuple, List[float]] = {}
+    with open(events_file, 'r', encoding='utf-8') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            event = json.loads(line)
+            key = (event.get("participant_code") if by_participant else None, event["stage"])
+            groups.setdefault(key, []).append(event["value"])
+
+    summary = {}
+    for key, values in groups.items():
+        values.sort()
+        summary[key] = {
+            "count": len(values),
+            **{f"p{int(q * 100)}": percentile(values, q) for q in QUANTILES},
+        }
+    return summary
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="R.A.I. 턴 계측 요약")
+    parser.add_argument("events_file", nargs="?", default=os.path.join(METRICS_DIR, "events.jsonl"))
+    parser.add_argument("--by-participant", action="store_true", help="참여자별로 나누어 출력")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.events_file):
+        print(f"❌ 이벤트 로그를 찾을 수 없습니다: {args.events_file}")
+        raise SystemExit(1)
+
+    print(f"📊 stage별 분위수 ({args.events_file}, {datetime.now().isoformat(timespec='seconds')})")
+    print("=" * 72)
+    print(f"{'participant':<12} {'stage':<20} {'count':>7} {'p50':>10} {'p95':>10} {'p99':>10}")
+    for (participant_code, stage), row in sorted(summarize_events(args.events_file, args.by_participant).items(),
+                                                 key=lambda item: (str(item[0][0]), item[0][1])):
+        print(f"{str(participant_code or '-'):<12} {stage:<20} {row['count']:>7} "
+              f"{row['p50']:>10.4f} {row['p95']:>10.4f} {row['p99']:>10.4f}")
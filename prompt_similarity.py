@@ -0,0 +1,217 @@
+# =============================================================
+# File: prompt_similarity.py
+# 유사 질문(near-duplicate) 탐지 - MinHash / LSH
+# =============================================================
+"""
+정규화한 글자 shingle 에 MinHash 서명을 만들고 LSH 밴드로 후보를 찾아
+비슷한 사용자 질문을 찾는 로컬 인덱스 (외부 서비스 없음)
+
+    "너 이름이 뭐지?!"  ≈  "너 이름이 뭐야?"   (Jaccard ≈ 0.67)
+
+용도:
+- chatbot_core: 첫 턴 질문이 이전 질문과 충분히 비슷하면 캐시된 답변을 사용
+  (RAI_PROMPT_CACHE=1 일 때만, 기본은 비활성화)
+- log_analyzer: 사용자 질문 묶기(clustering)
+
+메모리는 capacity 개 항목으로 제한되며, 가장 오래 사용되지 않은 항목부터 제거합니다(LRU).
+조회 지연시간과 적중률은 stats() 로 확인할 수 있습니다.
+
+환경 변수:
+- RAI_PROMPT_CACHE:           "1"이면 첫 턴 응답 캐시 사용
+- RAI_PROMPT_CACHE_THRESHOLD: 캐시 적중으로 볼 최소 유사도 (기본값: 0.6)
+- RAI_PROMPT_CACHE_SIZE:      캐시 최대 항목 수 (기본값: 5000)
+"""
+
+import os
+import re
+import time
+import zlib
+import random
+import threading
+import unicodedata
+from collections import OrderedDict, deque
+from typing import Dict, Iterable, List, Optional, Tuple
+
+NUM_PERM = 64       # MinHash 해시 함수 개수
+BANDS = 16          # LSH 밴드 수 (밴드당 행 = NUM_PERM / BANDS = 4, 임계값 ≈ 0.5)
+SHINGLE_SIZE = 2    # 짧은 한글 문장에 맞춘 글자 bigram
+_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+# 해시 함수 계수는 고정 시드로 생성 (프로세스가 달라도 같은 서명)
+_rng = random.Random(5014)
+_PERMS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_PERM)]
+
+_STRIP_RE = re.compile(r"[\W_]+", re.UNICODE)
+
+
+def normalize_prompt(text: str) -> str:
+    """NFKC + 소문자 + 구두점/공백/이모지 제거"""
+    return _STRIP_RE.sub("", unicodedata.normalize("NFKC", text or "").lower())
+
+
+def shingles(text: str) -> frozenset:
+    normalized = normalize_prompt(text)
+    if len(normalized) <= SHINGLE_SIZE:
+        return frozenset([normalized]) if normalized else frozenset()
+    return frozenset(normalized[i:i + SHINGLE_SIZE] for i in range(len(normalized) - SHINGLE_SIZE + 1))
+
+
+def minhash(shingle_set: Iterable[str]) -> Tuple[int, ...]:
+    """MinHash 서명 (crc32 기반 → 프로세스와 무관하게 안정적)"""
+    hashes = [zlib.crc32(s.encode("utf-8")) for s in shingle_set]
+    if not hashes:
+        return tuple([_MAX_HASH] * NUM_PERM)
+    return tuple(min((a * h + b) % _PRIME & _MAX_HASH for h in hashes) for a, b in _PERMS)
+
+
+def jaccard(a: frozenset, b: frozenset) -> float:
+    """Jaccard 유사도 (정규화 후 남는 글자가 없는 질문끼리는 비슷하다고 볼 근거가 없으므로 0)"""
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+class PromptIndex:
+    """LRU 로 크기가 제한된 MinHash/LSH 유사 질문 인덱스 (스레드 안전)"""
+
+    def __init__(self, threshold: float = 0.6, capacity: int = 5000):
+        self.threshold = threshold
+        self.capacity = capacity
+        self.rows = NUM_PERM // BANDS
+        self._entries: "OrderedDict[int, Dict]" = OrderedDict()
+        self._buckets: List[Dict[Tuple[int, ...], set]] = [{} for _ in range(BANDS)]
+        self._next_id = 0
+        self._lock = threading.Lock()
+        # 통계
+        self.lookups = 0
+        self.hits = 0
+        self.evictions = 0
+        self._latencies = deque(maxlen=1024)
+
+    def _bands(self, signature: Tuple[int, ...]):
+        for band in range(BANDS):
+            yield band, signature[band * self.rows:(band + 1) * self.rows]
+
+    def _candidates(self, signature) -> set:
+        candidates = set()
+        for band, key in self._bands(signature):
+            candidates |= self._buckets[band].get(key, set())
+        return candidates
+
+    def add(self, text: str, payload=None) -> Optional[int]:
+        """질문과 payload(예: 답변)를 추가하고 항목 ID 반환
+
+        이모지/구두점만 있는 질문처럼 정규화 후 비는 질문은 추가하지 않고 None 반환
+        """
+        shingle_set = shingles(text)
+        if not shingle_set:
+            return None
+        signature = minhash(shingle_set)
+        with self._lock:
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = {
+                "text": text,
+                "shingles": shingle_set,
+                "signature": signature,
+                "payload": payload,
+                "hits": 0,
+            }
+            for band, key in self._bands(signature):
+                self._buckets[band].setdefault(key, set()).add(entry_id)
+            while len(self._entries) > self.capacity:
+                self._evict()
+        return entry_id
+
+    def _evict(self):
+        """가장 오래 사용되지 않은 항목 제거 (lock 보유 상태에서 호출)"""
+        entry_id, entry = self._entries.popitem(last=False)
+        for band, key in self._bands(entry["signature"]):
+            bucket = self._buckets[band].get(key)
+            if bucket:
+                bucket.discard(entry_id)
+                if not bucket:
+                    del self._buckets[band][key]
+        self.evictions += 1
+
+    def lookup(self, text: str, threshold: Optional[float] = None) -> Optional[Tuple[Dict, float]]:
+        """가장 비슷한 항목과 유사도 (threshold 미만이면 None)"""
+        start = time.perf_counter()
+        threshold = self.threshold if threshold is None else threshold
+        shingle_set = shingles(text)
+        signature = minhash(shingle_set)
+        best = None
+        with self._lock:
+            # 정규화 후 비는 질문은 어떤 항목과도 비교하지 않음 (항상 적중 실패)
+            candidates = self._candidates(signature) if shingle_set else ()
+            for entry_id in candidates:
+                entry = self._entries[entry_id]
+                similarity = jaccard(shingle_set, entry["shingles"])
+                if similarity >= threshold and (best is None or similarity > best[1]):
+                    best = (entry_id, similarity)
+            self.lookups += 1
+            result = None
+            if best:
+                self.hits += 1
+                entry = self._entries[best[0]]
+                entry["hits"] += 1
+                self._entries.move_to_end(best[0])  # LRU 갱신
+                result = (entry, best[1])
+            self._latencies.append(time.perf_counter() - start)
+        return result
+
+    def stats(self) -> Dict:
+        """조회 수, 적중률, 지연시간(p50/p95), 항목 수"""
+        from metrics import percentile
+
+        with self._lock:
+            latencies = sorted(self._latencies)
+            return {
+                "entries": len(self._entries),
+                "capacity": self.capacity,
+                "lookups": self.lookups,
+                "hits": self.hits,
+                "hit_rate": self.hits / self.lookups if self.lookups else 0.0,
+                "evictions": self.evictions,
+                "lookup_p50_ms": percentile(latencies, 0.5) * 1000,
+                "lookup_p95_ms": percentile(latencies, 0.95) * 1000,
+            }
+
+
+def cluster_prompts(texts: List[str], threshold: float = 0.6) -> List[List[int]]:
+    """비슷한 질문끼리 묶은 인덱스 목록 (큰 묶음부터, 2개 이상인 것만)"""
+    index = PromptIndex(threshold=threshold, capacity=max(1, len(texts)))
+    parent = list(range(len(texts)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    entry_to_text = {}
+    for i, text in enumerate(texts):
+        shingle_set = shingles(text)
+        if not shingle_set:
+            continue  # 이모지/구두점만 있는 질문은 묶지 않음
+        signature = minhash(shingle_set)
+        # LSH 후보 중 실제 Jaccard 가 threshold 이상인 것과 합침
+        for entry_id in index._candidates(signature):
+            if jaccard(shingle_set, index._entries[entry_id]["shingles"]) >= threshold:
+                parent[find(i)] = find(entry_to_text[entry_id])
+        entry_to_text[index.add(text)] = i
+
+    groups: Dict[int, List[int]] = {}
+    for i in range(len(texts)):
+        groups.setdefault(find(i), []).append(i)
+    return sorted((g for g in groups.values() if len(g) > 1), key=len, reverse=True)
+
+
+# --- 첫 턴 응답 캐시 (chatbot_core 에서 사용) --------------------------------
+PROMPT_CACHE_ENABLED = os.environ.get("RAI_PROMPT_CACHE", "0") == "1"
+
+prompt_cache = PromptIndex(
+    threshold=float(os.environ.get("RAI_PROMPT_CACHE_THRESHOLD", "0.6")),
+    capacity=int(os.environ.get("RAI_PROMPT_CACHE_SIZE", "5000")),
+)
@@ -0,0 +1,382 @@
+#!/usr/bin/env python3
+# =============================================================
+# File: replay.py
+# 저장된 대화 재실행(replay) / 오프라인 평가 도구
+# =============================================================
+"""
+DEFAULT_SYSTEM_PROMPT, temperature, 모델을 바꿨을 때 실제 대화에서 답변이 어떻게
+달라지는지 보기 위해, 저장된 대화의 사용자 턴을 chatbot_core 로 다시 실행하는 도구
+
+입력 (하나 선택):
+- logs/                                       로컬 참여자 로그 (샤드/평평한 구조 모두)
+- firestore_backup_*/all_conversations.json   Firestore 백업 (스트리밍으로 읽음)
+- firestore_backup_*/detailed_messages.csv    상세 메시지 CSV
+
+각 사용자 턴은 원래 대화의 그 시점까지의 히스토리(원래 AI 답변 포함)를 입력으로
+독립적으로 다시 실행하므로, 턴 단위로 병렬 처리할 수 있습니다.
+
+- 동시 실행 수(--concurrency), 분당 요청 한도(--rpm), 429 응답 시 재시도
+- 결과는 원본 옆의 replay_<실행ID>.jsonl 에 한 턴씩 추가 기록 → 중단 후 같은 명령으로
+  다시 실행하면 끝난 턴은 건너뜀 (실행 ID는 모델/temperature/max_tokens/프롬프트로 정해짐)
+- max_tokens 는 고정값(--max-tokens, 기본값 chatbot_core.MAX_TOKENS)을 써서 앱의 적응형
+  답변 길이 예산과 무관하게 같은 설정이면 같은 조건으로 재실행됨
+- 끝나면 열 단위 파일(replay_<실행ID>.csv, pyarrow 가 있으면 .parquet 도)로 변환
+  (원래 답변과 새 답변, 지연시간, 토큰 수를 나란히 비교)
+- --fake 를 주면 fake_llm 스텁으로 실행 → 완성(completion) 경로 처리량 테스트
+
+사용법:
+    python replay.py logs --limit 20
+    python replay.py firestore_backup_20250728_055634/all_conversations.json --temperature 0.5
+    python replay.py detailed_messages.csv --system-prompt-file new_prompt.txt --concurrency 16 --rpm 300
+    python replay.py logs --fake --concurrency 64        # 스텁으로 처리량 측정
+"""
+
+import os
+import sys
+import csv
+import json
+import time
+import hashlib
+import argparse
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+MAX_RETRIES = 5
+
+
+# --- 입력 읽기 --------------------------------------------------------------
+def iter_source(source: str) -> Iterator[Tuple[str, List[Dict]]]:
+    """(참여자코드, [{"role", "content"}, ...]) 를 하나씩 읽음"""
+    if os.path.isdir(source):
+        import log_storage
+        for data in log_storage.iter_logs(source):
+            yield data.get("participant_code", ""), data.get("conversation", [])
+    elif source.endswith(".csv"):
+        yield from _iter_detailed_csv(source)
+    else:
+        from firestore_restore import iter_json_object
+        for participant_code, data in iter_json_object(source):
+            yield participant_code, data.get("conversation", [])
+
+
+def _iter_detailed_csv(path: str) -> Iterator[Tuple[str, List[Dict]]]:
+    """detailed_messages.csv 는 참여자별로 연속된 행이므로 참여자가 바뀔 때마다 반환"""
+    current_code = None
+    rows = []
+    with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+        for row in csv.DictReader(f):
+            if row["participant_code"] != current_code and rows:
+                yield current_code, [msg for _, msg in sorted(rows, key=lambda r: r[0])]
+                rows = []
+            current_code = row["participant_code"]
+            rows.append((int(row.get("message_order") or len(rows) + 1),
+                         {"role": row["role"], "content": row["content"]}))
+    if rows:
+        yield current_code, [msg for _, msg in sorted(rows, key=lambda r: r[0])]
+
+
+def iter_turns(conversations: Iterator[Tuple[str, List[Dict]]], max_turns: Optional[int] = None):
+    """사용자 턴마다 (키, 참여자코드, 턴 번호, 입력 메시지들, 원래 답변) 반환"""
+    for participant_code, conversation in conversations:
+        turn = 0
+        for i, msg in enumerate(conversation):
+            if msg.get("role") != "user" or not msg.get("content"):
+                continue
+            turn += 1
+            if max_turns and turn > max_turns:
+                break
+            following = conversation[i + 1] if i + 1 < len(conversation) else {}
+            original = following.get("content", "") if following.get("role") == "assistant" else ""
+            yield f"{participant_code}:{turn}", participant_code, turn, conversation[:i + 1], original
+
+
+def output_base(source: str) -> str:
+    """결과 파일을 원본 옆에 둠 (logs/ 이면 logs/ 안)"""
+    if os.path.isdir(source):
+        return source
+    return os.path.dirname(os.path.abspath(source))
+
+
+def make_run_id(model: str, temperature: float, max_tokens: int, system_prompt: str, fake: bool) -> str:
+    """같은 설정이면 같은 실행 ID → 다시 실행하면 이어서 진행"""
+    prompt_hash = hashlib.sha256(system_prompt.encode('utf-8')).hexdigest()[:8]
+    return f"{'fake_' if fake else ''}{model}_t{temperature:g}_m{max_tokens}_{prompt_hash}"
+
+
+# --- 실행 제어 --------------------------------------------------------------
+class RateLimiter:
+    """분당 요청 수 제한 (여러 스레드가 공유하는 슬라이딩 윈도우)"""
+
+    def __init__(self, rpm: Optional[int]):
+        self.rpm = rpm
+        self._times = deque()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if not self.rpm:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                while self._times and now - self._times[0] >= 60.0:
+                    self._times.popleft()
+                if len(self._times) < self.rpm:
+                    self._times.append(now)
+                    return
+                wait_for = 60.0 - (now - self._times[0])
+            time.sleep(max(wait_for, 0.01))
+
+
+class ResultWriter:
+    """완료된 턴을 JSONL 에 한 줄씩 추가 (이 파일이 곧 체크포인트)"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.done = set()
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue  # 중단 시 마지막 줄이 잘렸을 수 있음
+                    if not record.get("error"):
+                        self.done.add(record["key"])
+        self._file = open(path, 'a', encoding='utf-8')
+        self._lock = threading.Lock()
+
+    def write(self, record: Dict):
+        with self._lock:
+            self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+            self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+def replay_turn(messages: List[Dict], config: Dict, limiter: RateLimiter) -> Dict:
+    """사용자 턴 하나를 chatbot_core 로 다시 실행 (429 는 재시도)"""
+    import chatbot_core
+    from azure.ai.inference.models import UserMessage, AssistantMessage
+
+    history = [(UserMessage if m.get("role") == "user" else AssistantMessage)(content=m.get("content", ""))
+               for m in messages if m.get("role") in ("user", "assistant")]
+    for attempt in range(MAX_RETRIES):
+        limiter.acquire()
+        details = {}
+        try:
+            reply = "".join(chatbot_core.stream_completion(
+                history,
+                temperature=config["temperature"],
+                system_prompt=config["system_prompt"],
+                model=config["model"],
+                details=details,
+                max_tokens=config["max_tokens"],
+            ))
+            return {"reply": reply, "attempts": attempt + 1, **details}
+        except Exception as e:
+            if getattr(e, "status_code", None) != 429 or attempt == MAX_RETRIES - 1:
+                raise
+            time.sleep(getattr(e, "retry_after", None) or min(30.0, 2 ** attempt))
+
+
+def run_replay(turns, writer: ResultWriter, config: Dict, concurrency: int = 8,
+               rpm: Optional[int] = None, limit_turns: Optional[int] = None) -> Dict:
+    """턴들을 병렬로 다시 실행하고 요약을 반환"""
+    limiter = RateLimiter(rpm)
+    summary = {"turns": 0, "skipped": 0, "errors": 0, "latencies": [], "ttfts": [],
+               "prompt_tokens": 0, "completion_tokens": 0}
+    start = time.perf_counter()
+
+    def record(future, key, participant_code, turn, original):
+        row = {
+            "key": key,
+            "participant_code": participant_code,
+            "turn": turn,
+            "model": config["model"],
+            "temperature": config["temperature"],
+            "max_tokens": config["max_tokens"],
+            "original_reply": original,
+        }
+        try:
+            result = future.result()
+            usage = result.get("usage")
+            row.update({
+                "replay_reply": result["reply"],
+                "latency": result.get("latency"),
+                "ttft": result.get("ttft"),
+                "prompt_tokens": getattr(usage, "prompt_tokens", None),
+                "completion_tokens": getattr(usage, "completion_tokens", None),
+                "total_tokens": getattr(usage, "total_tokens", None),
+                "finish_reason": result.get("finish_reason"),
+                "attempts": result.get("attempts"),
+                "error": "",
+            })
+            summary["turns"] += 1
+            summary["latencies"].append(result.get("latency") or 0.0)
+            if result.get("ttft") is not None:
+                summary["ttfts"].append(result["ttft"])
+            summary["prompt_tokens"] += row["prompt_tokens"] or 0
+            summary["completion_tokens"] += row["completion_tokens"] or 0
+        except Exception as e:
+            row.update({"replay_reply": "", "error": f"{type(e).__name__}: {str(e)}"})
+            summary["errors"] += 1
+        row["replayed_at"] = datetime.now().isoformat()
+        writer.write(row)
+        if (summary["turns"] + summary["errors"]) % 50 == 0:
+            elapsed = time.perf_counter() - start
+            print(f"  🔁 {summary['turns']}턴 완료 ({summary['turns'] / elapsed:.1f}턴/초, 오류 {summary['errors']})")
+
+    # 입력은 스트리밍으로 읽고 대기 중인 작업은 concurrency * 2 개로 제한 (메모리 제한)
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        pending = {}
+        submitted = 0
+        for key, participant_code, turn, messages, original in turns:
+            if key in writer.done:
+                summary["skipped"] += 1
+                continue
+            if limit_turns and submitted >= limit_turns:
+                break
+            if len(pending) >= concurrency * 2:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    record(future, *pending.pop(future))
+            future = executor.submit(replay_turn, messages, config, limiter)
+            pending[future] = (key, participant_code, turn, original)
+            submitted += 1
+        for future in wait(pending).done:
+            record(future, *pending.pop(future))
+
+    summary["elapsed"] = time.perf_counter() - start
+    return summary
+
+
+# --- 결과 변환 --------------------------------------------------------------
+RESULT_COLUMNS = ("participant_code", "turn", "model", "temperature", "max_tokens", "original_reply",
+                  "replay_reply", "latency", "ttft", "prompt_tokens", "completion_tokens", "total_tokens",
+                  "finish_reason", "attempts", "error", "replayed_at")
+
+
+def write_columnar(jsonl_path: str) -> List[str]:
+    """JSONL 결과를 (참여자, 턴) 순으로 정렬한 열 단위 파일로 변환 (턴마다 마지막 결과 사용)"""
+    import pandas as pd
+
+    latest = {}
+    with open(jsonl_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            # 성공한 결과가 있으면 이후의 실패 기록으로 덮어쓰지 않음
+            if record.get("error") and not latest.get(record["key"], {}).get("error", True):
+                continue
+            latest[record["key"]] = record
+
+    df = pd.DataFrame(list(latest.values()), columns=list(RESULT_COLUMNS))
+    df = df.sort_values(["participant_code", "turn"])
+    base = jsonl_path[:-len(".jsonl")]
+    written = [f"{base}.csv"]
+    df.to_csv(written[0], index=False, encoding='utf-8-sig')
+    try:
+        df.to_parquet(f"{base}.parquet", index=False)
+        written.append(f"{base}.parquet")
+    except ImportError:
+        pass  # pyarrow/fastparquet 이 없으면 CSV 만
+    return written
+
+
+def print_summary(summary: Dict):
+    from metrics import percentile
+
+    latencies = sorted(summary["latencies"])
+    ttfts = sorted(summary["ttfts"])
+    elapsed = summary["elapsed"] or 1.0
+    print("=" * 60)
+    print(f"✅ 재실행 {summary['turns']}턴, 건너뜀 {summary['skipped']}턴, 오류 {summary['errors']}턴, "
+          f"{summary['elapsed']:.1f}초 ({summary['turns'] / elapsed:.2f}턴/초)")
+    if latencies:
+        print(f"⏱️ 지연시간 p50 {percentile(latencies, 0.5):.2f}s / p95 {percentile(latencies, 0.95):.2f}s, "
+              f"첫 토큰 p50 {percentile(ttfts, 0.5) if ttfts else 0:.2f}s")
+    print(f"🪙 토큰: 입력 {summary['prompt_tokens']} / 출력 {summary['completion_tokens']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="R.A.I. 저장된 대화 재실행 / 오프라인 평가")
+    parser.add_argument("source", help="logs 디렉토리, all_conversations.json 또는 detailed_messages.csv")
+    parser.add_argument("--model", help="모델(배포) 이름 (기본값: chatbot_core.MODEL)")
+    parser.add_argument("--temperature", type=float, default=0.9)
+    parser.add_argument("--max-tokens", type=int, default=None,
+                        help="답변 최대 토큰 수 (기본값: chatbot_core.MAX_TOKENS, 적응형 예산은 쓰지 않음)")
+    parser.add_argument("--system-prompt-file", help="시스템 프롬프트 파일 (기본값: DEFAULT_SYSTEM_PROMPT)")
+    parser.add_argument("--concurrency", type=int, default=8, help="동시 요청 수")
+    parser.add_argument("--rpm", type=int, default=None, help="분당 요청 한도")
+    parser.add_argument("--limit", type=int, default=None, help="이번 실행에서 재실행할 최대 턴 수")
+    parser.add_argument("--max-turns", type=int, default=None, help="대화당 최대 사용자 턴 수")
+    parser.add_argument("--run-id", help="실행 ID (기본값: 설정으로 자동 생성)")
+    parser.add_argument("--fake", action="store_true", help="fake_llm 스텁으로 실행 (처리량 테스트)")
+    parser.add_argument("--ttft-mean", type=float, default=0.6, help="--fake: 평균 첫 토큰 시간(초)")
+    parser.add_argument("--tokens-per-second", type=float, default=60.0, help="--fake: 토큰 생성 속도")
+    args = parser.parse_args()
+
+    if args.fake:
+        # chatbot_core 는 import 시 환경 변수를 읽으므로 더미 값을 채워 둠 (호출은 스텁으로 대체)
+        os.environ.setdefault("AZURE_AI_ENDPOINT", "https://replay.invalid")
+        os.environ.setdefault("AZURE_AI_SECRET", "replay")
+    # 재실행 결과가 캐시된 답변이 되면 안 되고, 앱의 지표와 섞이지 않도록 함
+    os.environ["RAI_PROMPT_CACHE"] = "0"
+    os.environ.setdefault("RAI_METRICS_DISABLED", "1")
+    repo_dir = os.path.dirname(os.path.abspath(__file__))
+    if repo_dir not in sys.path:
+        sys.path.insert(0, repo_dir)
+
+    import chatbot_core
+    if args.fake:
+        from fake_llm import FakeChatCompletionsClient
+        chatbot_core.client = FakeChatCompletionsClient(
+            ttft_mean=args.ttft_mean,
+            tokens_per_second=args.tokens_per_second,
+            max_concurrency=max(32, args.concurrency),
+        )
+
+    system_prompt = chatbot_core.DEFAULT_SYSTEM_PROMPT
+    if args.system_prompt_file:
+        with open(args.system_prompt_file, 'r', encoding='utf-8') as f:
+            system_prompt = f.read().strip()
+    config = {
+        "model": args.model or chatbot_core.MODEL,
+        "temperature": args.temperature,
+        "max_tokens": args.max_tokens or chatbot_core.MAX_TOKENS,
+        "system_prompt": system_prompt,
+    }
+    run_id = args.run_id or make_run_id(config["model"], args.temperature, config["max_tokens"],
+                                        system_prompt, args.fake)
+    jsonl_path = os.path.join(output_base(args.source), f"replay_{run_id}.jsonl")
+
+    print("🔁 R.A.I. 대화 재실행")
+    print("=" * 60)
+    print(f"📁 원본: {args.source}")
+    print(f"🧪 모델 {config['model']}, temperature {args.temperature}, max_tokens {config['max_tokens']}, "
+          f"동시성 {args.concurrency}"
+          f"{f', 분당 {args.rpm}회' if args.rpm else ''}{' (스텁)' if args.fake else ''}")
+    print(f"💾 결과: {jsonl_path}")
+
+    writer = ResultWriter(jsonl_path)
+    if writer.done:
+        print(f"⏩ 이전 실행에서 완료된 {len(writer.done)}턴은 건너뜁니다.")
+    try:
+        turns = iter_turns(iter_source(args.source), args.max_turns)
+        summary = run_replay(turns, writer, config, args.concurrency, args.rpm, args.limit)
+    finally:
+        writer.close()
+
+    print_summary(summary)
+    for path in write_columnar(jsonl_path):
+        print(f"📊 비교용 파일: {path}")
+
+
+if __name__ == "__main__":
+    main()
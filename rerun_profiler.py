@@ -0,0 +1,169 @@
+# =============================================================
+# File: rerun_profiler.py
+# Streamlit rerun 프로파일링 도구 (opt-in)
+# =============================================================
+"""
+Streamlit은 상호작용마다 app.py 전체를 다시 실행하므로, 숨은 비용은 rerun 자체
+(사이드바 통계, 히스토리 렌더링 등)에 있습니다. 이 모듈은 rerun 한 번을
+cProfile로 감싸서 프로파일 파일을 남기고, 여러 rerun의 결과를 모아 보여줍니다.
+
+활성화 방법 (재배포 불필요):
+- 환경 변수 RAI_PROFILE=1
+- 또는 URL 쿼리 파라미터 ?profile=1 (해당 세션에만 적용)
+
+환경 변수:
+- RAI_PROFILE_SAMPLE_RATE: 프로파일링할 rerun 비율 (0.0 ~ 1.0, 기본값: 1.0)
+- RAI_PROFILE_DIR:         프로파일 저장 디렉토리 (기본값: profiles)
+
+출력:
+- profiles/<시각>_<세션>_<원인>.prof:  rerun 별 cProfile 결과
+- profiles/index.jsonl:               세션/참여자/rerun 원인/소요시간 메타데이터
+
+사용법:
+    python rerun_profiler.py                    # 전체 rerun 누적 상위 함수
+    python rerun_profiler.py --cause chat_input # 특정 rerun 원인만 집계
+    python rerun_profiler.py --top 50 --sort tottime
+"""
+
+import os
+import json
+import time
+import random
+import cProfile
+from contextlib import contextmanager
+from datetime import datetime
+from typing import List, Optional
+
+PROFILE_DIR = os.environ.get("RAI_PROFILE_DIR", "profiles")
+PROFILE_ENV_ENABLED = os.environ.get("RAI_PROFILE", "0") == "1"
+PROFILE_SAMPLE_RATE = float(os.environ.get("RAI_PROFILE_SAMPLE_RATE", "1.0"))
+
+
+class RerunProfile:
+    """rerun 한 번의 프로파일링 상태 (cause는 실행 중에 갱신 가능)"""
+
+    def __init__(self, session_id: str, participant_code: Optional[str], cause: str, sampled: bool):
+        self.session_id = session_id
+        self.participant_code = participant_code
+        self.cause = cause
+        self.sampled = sampled
+        self.profiler = cProfile.Profile() if sampled else None
+
+    def label(self, cause: str):
+        """rerun 원인을 지정 (예: 채팅 입력이 확인된 시점에 'chat_input')"""
+        self.cause = cause
+
+
+def is_enabled(query_params=None) -> bool:
+    """환경 변수 또는 쿼리 파라미터로 프로파일링이 켜졌는지 확인"""
+    if PROFILE_ENV_ENABLED:
+        return True
+    if query_params is None:
+        return False
+    try:
+        return query_params.get("profile") == "1"
+    except Exception:
+        return False
+
+
+@contextmanager
+def profile_rerun(session_id: str, participant_code: Optional[str] = None,
+                  cause: str = "interaction", enabled: bool = False):
+    """rerun 전체를 감싸는 컨텍스트 매니저
+
+    st.rerun()/st.stop() 등으로 스크립트가 예외로 끝나도 프로파일은 저장됩니다.
+    비활성화 상태이거나 샘플링에서 빠진 경우 오버헤드는 무시할 수준입니다.
+    """
+    sampled = enabled and random.random() < PROFILE_SAMPLE_RATE
+    profile = RerunProfile(session_id, participant_code, cause, sampled)
+    if not sampled:
+        yield profile
+        return
+
+    start = time.perf_counter()
+    profile.profiler.enable()
+    try:
+        yield profile
+    finally:
+        profile.profiler.disable()
+        duration = time.perf_counter() - start
+        try:
+            _write_profile(profile, duration)
+        except Exception as e:
+            # 프로파일 저장 실패가 앱 동작을 막지 않도록 함
+            print(f"⚠️ 프로파일 저장 실패: {str(e)}")
+
+
+def _write_profile(profile: RerunProfile, duration: float):
+    """.prof 파일과 index.jsonl 메타데이터 기록"""
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    stamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+    filename = f"{stamp}_{profile.session_id[:8]}_{profile.cause}.prof"
+    profile.profiler.dump_stats(os.path.join(PROFILE_DIR, filename))
+
+    entry = {
+        "file": filename,
+        "timestamp": datetime.now().isoformat(),
+        "session_id": profile.session_id,
+        "participant_code": profile.participant_code,
+        "cause": profile.cause,
+        "duration": duration,
+    }
+    with open(os.path.join(PROFILE_DIR, "index.jsonl"), 'a', encoding='utf-8') as f:
+        f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+
+def load_index(profile_dir: str = PROFILE_DIR) -> List[dict]:
+    """index.jsonl 에서 rerun 메타데이터 목록을 읽음"""
+    index_file = os.path.join(profile_dir, "index.jsonl")
+    if not os.path.exists(index_file):
+        return []
+    with open(index_file, 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def aggregate(profile_dir: str = PROFILE_DIR, cause: Optional[str] = None,
+              participant_code: Optional[str] = None, top: int = 30, sort: str = "cumulative"):
+    """여러 rerun 프로파일을 합쳐 상위 함수 목록을 출력"""
+    import pstats
+
+    entries = [
+        e for e in load_index(profile_dir)
+        if (cause is None or e["cause"] == cause)
+        and (participant_code is None or e["participant_code"] == participant_code)
+        and os.path.exists(os.path.join(profile_dir, e["file"]))
+    ]
+    if not entries:
+        print("❌ 조건에 맞는 프로파일이 없습니다.")
+        return
+
+    # rerun 원인별 요약
+    print(f"📊 총 {len(entries)}개 rerun 프로파일")
+    print("=" * 60)
+    by_cause = {}
+    for e in entries:
+        by_cause.setdefault(e["cause"], []).append(e["duration"])
+    for name, durations in sorted(by_cause.items()):
+        durations.sort()
+        print(f"  {name:<20} {len(durations):>6}회  평균 {sum(durations) / len(durations) * 1000:8.1f}ms"
+              f"  최대 {durations[-1] * 1000:8.1f}ms")
+    print("=" * 60)
+
+    stats = pstats.Stats(os.path.join(profile_dir, entries[0]["file"]))
+    for e in entries[1:]:
+        stats.add(os.path.join(profile_dir, e["file"]))
+    stats.strip_dirs().sort_stats(sort).print_stats(top)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="R.A.I. rerun 프로파일 집계")
+    parser.add_argument("profile_dir", nargs="?", default=PROFILE_DIR)
+    parser.add_argument("--cause", help="특정 rerun 원인만 집계 (예: chat_input)")
+    parser.add_argument("--participant", help="특정 참여자 코드만 집계")
+    parser.add_argument("--top", type=int, default=30, help="출력할 함수 수")
+    parser.add_argument("--sort", default="cumulative", help="pstats 정렬 키 (cumulative, tottime, ...)")
+    args = parser.parse_args()
+
+    aggregate(args.profile_dir, args.cause, args.participant, args.top, args.sort)
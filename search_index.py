@@ -0,0 +1,504 @@
+#!/usr/bin/env python3
+# =============================================================
+# File: search_index.py
+# 대화 로그 전문 검색 인덱스
+# =============================================================
+"""
+모든 메시지 content 에 대한 역색인(inverted index)
+
+- 한글 친화 토큰화: NFKC 정규화 + 소문자화 후 단어별 글자 bigram
+  (띄어쓰기/조사가 달라도 "이름이" 와 "이름을" 이 "이름" bigram 으로 매칭)
+- 역할(user/assistant), 날짜 범위 필터
+- BM25 점수로 정렬하고 검색어 주변 스니펫을 함께 반환
+- pickle 스냅샷으로 디스크에 저장하여 빠르게 로드
+
+앱(채팅) 프로세스는 인덱스를 메모리에 올리지 않습니다. 로그를 저장할 때
+(conversation_log.save_local_log) 참여자 코드 한 줄만 프로세스별 저널 파일
+(<인덱스 경로>.journal/<호스트>-<pid>.jsonl) 에 덧붙입니다.
+검색/빌드 명령(오프라인)이 스냅샷을 읽은 뒤 저널에 나온 참여자의 로그만 다시 읽어
+새 메시지를 색인하고 스냅샷을 저장합니다. 저널별로 읽은 위치를 스냅샷에 기록하므로
+여러 프로세스가 동시에 저널을 써도 변경이 빠지거나 서로 덮어쓰지 않습니다.
+
+환경 변수:
+- RAI_SEARCH_INDEX:          인덱스 파일 경로 (기본값: search_index.pkl)
+- RAI_SEARCH_INDEX_DISABLED: "1"이면 로그 저장 시 저널 기록 비활성화
+
+사용법:
+    python search_index.py build                        # logs/ 전체로 인덱스 재생성
+    python search_index.py update                       # 저널에 쌓인 변경만 반영
+    python search_index.py search "이름 바꿔"            # 검색
+    python search_index.py search "이름" --role user --since 2025-07-01 --limit 20
+"""
+
+import os
+import json
+import math
+import time
+import pickle
+import socket
+import threading
+import unicodedata
+from array import array
+from bisect import bisect_left
+from datetime import date, datetime
+from typing import Dict, Iterable, List, Optional
+
+INDEX_PATH = os.environ.get("RAI_SEARCH_INDEX", "search_index.pkl")
+AUTO_INDEX_ENABLED = os.environ.get("RAI_SEARCH_INDEX_DISABLED", "0") != "1"
+JOURNAL_RETENTION_SECONDS = 24 * 3600  # 다 읽은 저널은 이 시간 동안 안 바뀌면 삭제
+
+ROLE_CODES = {"user": 0, "assistant": 1}
+ROLE_NAMES = {code: name for name, code in ROLE_CODES.items()}
+OTHER_ROLE = 2
+
+# BM25 파라미터
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+def normalize(text: str) -> str:
+    """NFKC 정규화 + 소문자화"""
+    return unicodedata.normalize("NFKC", text or "").lower()
+
+
+def tokenize(text: str) -> List[str]:
+    """단어별 글자 bigram 목록 (한 글자 단어는 unigram)"""
+    grams = []
+    for word in normalize(text).split():
+        # 구두점은 검색에 의미가 없으므로 제거
+        word = "".join(ch for ch in word if ch.isalnum())
+        if len(word) == 1:
+            grams.append(word)
+        else:
+            grams.extend(word[i:i + 2] for i in range(len(word) - 1))
+    return grams
+
+
+def to_ordinal(value) -> int:
+    """ISO 문자열/날짜를 날짜 ordinal 로 변환 (알 수 없으면 0)"""
+    if not value:
+        return 0
+    if isinstance(value, (date, datetime)):
+        return value.toordinal()
+    try:
+        return datetime.fromisoformat(str(value)[:10]).toordinal()
+    except ValueError:
+        return 0
+
+
+class SearchIndex:
+    """메시지 단위 역색인 (문서 ID = 추가된 순서)"""
+
+    def __init__(self):
+        self.postings: Dict[str, array] = {}   # gram → 문서 ID 목록 (오름차순)
+        self.freqs: Dict[str, array] = {}      # gram → 문서 내 출현 횟수
+        # 디스크에서 로드한 압축 posting (gram → 번호, 번호 → [offsets[i], offsets[i+1]) 구간)
+        # 작은 array 수십만 개를 복원하는 대신 큰 array 몇 개만 읽고, 필요한 gram 만 꺼내 씀
+        self._base_index: Dict[str, int] = {}
+        self._base_offsets = array('Q', [0])
+        self._base_docs = array('I')
+        self._base_freqs = array('H')
+        self.doc_participant: List[str] = []
+        self.doc_order = array('I')            # 대화 안에서의 메시지 순서 (1부터)
+        self.doc_role = bytearray()
+        self.doc_date = array('I')
+        self.doc_length = array('I')           # 문서의 gram 수 (BM25 길이 정규화)
+        self.doc_content: List[str] = []
+        self.participants: Dict[str, List[int]] = {}  # 참여자 → 문서 ID 목록
+        self.deleted = set()                   # 대화가 교체되어 무효가 된 문서 ID
+        self.total_length = 0
+        self.journal_offsets: Dict[str, int] = {}  # 저널 파일 이름 → 반영한 바이트 위치
+        self._lock = threading.RLock()
+
+    # --- 색인 --------------------------------------------------------------
+    def add_message(self, participant_code: str, order: int, role: str, content: str, when=None) -> int:
+        grams = tokenize(content)
+        with self._lock:
+            doc_id = len(self.doc_content)
+            self.doc_participant.append(participant_code)
+            self.doc_order.append(order)
+            self.doc_role.append(ROLE_CODES.get(role, OTHER_ROLE))
+            self.doc_date.append(to_ordinal(when))
+            self.doc_length.append(len(grams))
+            self.doc_content.append(content or "")
+            self.participants.setdefault(participant_code, []).append(doc_id)
+            self.total_length += len(grams)
+
+            counts = {}
+            for gram in grams:
+                counts[gram] = counts.get(gram, 0) + 1
+            for gram, count in counts.items():
+                posting = self.postings.get(gram)
+                if posting is None:
+                    # 로드된 posting 이 있으면 수정 가능한 복사본으로 옮긴 뒤 추가
+                    base = self._base_posting(gram)
+                    posting = self.postings[gram] = base[0] if base else array('I')
+                    self.freqs[gram] = base[1] if base else array('H')
+                posting.append(doc_id)
+                self.freqs[gram].append(min(count, 65535))
+        return doc_id
+
+    def _base_posting(self, gram: str):
+        i = self._base_index.get(gram)
+        if i is None:
+            return None
+        start, end = self._base_offsets[i], self._base_offsets[i + 1]
+        return self._base_docs[start:end], self._base_freqs[start:end]
+
+    def _posting(self, gram: str):
+        """gram 의 (문서 ID 목록, 출현 횟수 목록), 없으면 None"""
+        if gram in self.postings:
+            return self.postings[gram], self.freqs[gram]
+        return self._base_posting(gram)
+
+    @property
+    def gram_count(self) -> int:
+        return len(self._base_index.keys() | self.postings.keys())
+
+    def index_conversation(self, log_data: Dict) -> int:
+        """참여자 로그(JSON)의 새 메시지만 색인하고 추가된 개수를 반환
+
+        로그는 뒤에 메시지가 추가되는 형태로 저장되므로 이미 색인한 개수 이후만
+        추가합니다. 메시지 수가 줄었거나 앞부분이 바뀌었으면(대화 리셋) 기존
+        문서를 무효화하고 다시 색인합니다.
+        """
+        participant_code = str(log_data.get("participant_code", ""))
+        conversation = log_data.get("conversation", [])
+        fallback_date = log_data.get("conversation_start") or log_data.get("last_updated")
+
+        with self._lock:
+            existing = self.participants.get(participant_code, [])
+            replaced = len(existing) > len(conversation) or (
+                existing and self.doc_content[existing[0]] != (conversation[0].get("content") or "")
+            )
+            if replaced:
+                self.deleted.update(existing)
+                self.participants[participant_code] = []
+                existing = []
+
+            already_indexed = len(existing)
+            for order, msg in enumerate(conversation[already_indexed:], start=already_indexed + 1):
+                self.add_message(participant_code, order, msg.get("role", ""), msg.get("content", ""),
+                                 msg.get("timestamp") or fallback_date)
+            return len(conversation) - already_indexed
+
+    @property
+    def live_count(self) -> int:
+        return len(self.doc_content) - len(self.deleted)
+
+    # --- 검색 --------------------------------------------------------------
+    def search(self, query: str, role: Optional[str] = None, since: Optional[str] = None,
+               until: Optional[str] = None, participant_code: Optional[str] = None,
+               limit: int = 10) -> List[Dict]:
+        """검색어의 모든 gram 을 포함하는 메시지를 BM25 점수순으로 반환"""
+        grams = list(dict.fromkeys(tokenize(query)))
+        if not grams:
+            return []
+        role_code = ROLE_CODES.get(role, OTHER_ROLE) if role else None
+        since_ord = to_ordinal(since) if since else None
+        until_ord = to_ordinal(until) if until else None
+
+        with self._lock:
+            found = {gram: self._posting(gram) for gram in grams}
+            if any(value is None for value in found.values()):
+                return []
+            filtered = bool(self.deleted) or any(
+                value is not None for value in (role_code, since_ord, until_ord, participant_code))
+            n_docs = max(1, self.live_count)
+            avg_length = self.total_length / max(1, len(self.doc_content))
+
+            # 가장 드문 gram 부터 교집합 (후보 수를 빠르게 줄임)
+            grams.sort(key=lambda g: len(found[g][0]))
+            scores: Dict[int, float] = {}
+            for i, gram in enumerate(grams):
+                posting, freqs = found[gram]
+                idf = math.log(1 + (n_docs - len(posting) + 0.5) / (len(posting) + 0.5))
+                if i == 0 and not filtered:
+                    matches = zip(posting, freqs)
+                elif i == 0:
+                    matches = (
+                        (doc_id, tf) for doc_id, tf in zip(posting, freqs)
+                        if self._accept(doc_id, role_code, since_ord, until_ord, participant_code)
+                    )
+                else:
+                    # posting 은 정렬되어 있으므로 남은 후보만 이진 탐색
+                    matches = []
+                    for doc_id in scores:
+                        pos = bisect_left(posting, doc_id)
+                        if pos < len(posting) and posting[pos] == doc_id:
+                            matches.append((doc_id, freqs[pos]))
+
+                next_scores = {}
+                for doc_id, tf in matches:
+                    norm = tf + BM25_K1 * (1 - BM25_B + BM25_B * self.doc_length[doc_id] / avg_length)
+                    next_scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (BM25_K1 + 1) / norm
+                scores = next_scores
+                if not scores:
+                    return []
+
+            ranked = sorted(scores.items(), key=lambda item: -item[1])[:limit]
+            return [self._hit(doc_id, score, query) for doc_id, score in ranked]
+
+    def _accept(self, doc_id: int, role_code, since_ord, until_ord, participant_code) -> bool:
+        if doc_id in self.deleted:
+            return False
+        if role_code is not None and self.doc_role[doc_id] != role_code:
+            return False
+        doc_date = self.doc_date[doc_id]
+        if since_ord is not None and (not doc_date or doc_date < since_ord):
+            return False
+        if until_ord is not None and (not doc_date or doc_date > until_ord):
+            return False
+        if participant_code is not None and self.doc_participant[doc_id] != participant_code:
+            return False
+        return True
+
+    def _hit(self, doc_id: int, score: float, query: str) -> Dict:
+        doc_date = self.doc_date[doc_id]
+        return {
+            "participant_code": self.doc_participant[doc_id],
+            "message_order": self.doc_order[doc_id],
+            "role": ROLE_NAMES.get(self.doc_role[doc_id], "other"),
+            "date": date.fromordinal(doc_date).isoformat() if doc_date else None,
+            "score": round(score, 4),
+            "snippet": make_snippet(self.doc_content[doc_id], query),
+        }
+
+    # --- 저장 / 로드 ---------------------------------------------------------
+    def save(self, path: str = INDEX_PATH):
+        """인덱스 스냅샷을 원자적으로 저장 (posting 은 큰 array 하나로 이어 붙임)"""
+        with self._lock:
+            grams = sorted(self._base_index.keys() | self.postings.keys())
+            offsets = array('Q', [0])
+            docs = array('I')
+            freqs = array('H')
+            for gram in grams:
+                posting, gram_freqs = self._posting(gram)
+                docs.extend(posting)
+                freqs.extend(gram_freqs)
+                offsets.append(len(docs))
+            state = {
+                "grams": grams,
+                "offsets": offsets.tobytes(),
+                "docs": docs.tobytes(),
+                "freqs": freqs.tobytes(),
+                "doc_participant": self.doc_participant,
+                "doc_order": self.doc_order.tobytes(),
+                "doc_role": bytes(self.doc_role),
+                "doc_date": self.doc_date.tobytes(),
+                "doc_length": self.doc_length.tobytes(),
+                "doc_content": self.doc_content,
+                "participants": self.participants,
+                "deleted": self.deleted,
+                "total_length": self.total_length,
+                "journal_offsets": self.journal_offsets,
+            }
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str = INDEX_PATH) -> "SearchIndex":
+        with open(path, 'rb') as f:
+            state = pickle.load(f)
+
+        def typed(typecode: str, blob: bytes) -> array:
+            values = array(typecode)
+            values.frombytes(blob)
+            return values
+
+        index = cls()
+        index._base_index = dict(zip(state["grams"], range(len(state["grams"]))))
+        index._base_offsets = typed('Q', state["offsets"])
+        index._base_docs = typed('I', state["docs"])
+        index._base_freqs = typed('H', state["freqs"])
+        index.doc_participant = state["doc_participant"]
+        index.doc_order = typed('I', state["doc_order"])
+        index.doc_role = bytearray(state["doc_role"])
+        index.doc_date = typed('I', state["doc_date"])
+        index.doc_length = typed('I', state["doc_length"])
+        index.doc_content = state["doc_content"]
+        index.participants = state["participants"]
+        index.deleted = state["deleted"]
+        index.total_length = state["total_length"]
+        index.journal_offsets = state.get("journal_offsets", {})
+        return index
+
+
+def make_snippet(content: str, query: str, width: int = 40) -> str:
+    """검색어(또는 첫 gram)가 처음 나오는 위치 주변을 잘라 «» 로 표시"""
+    text = content.replace("\n", " ")
+    lowered = normalize(text)
+    needle = normalize(query).strip()
+    pos = lowered.find(needle) if needle else -1
+    if pos < 0:
+        grams = tokenize(query)
+        pos = lowered.find(grams[0]) if grams else -1
+        needle = grams[0] if grams else ""
+    if pos < 0 or len(lowered) != len(text):
+        # 정규화로 길이가 바뀐 경우 위치를 신뢰할 수 없으므로 앞부분만 표시
+        return text[:width * 2] + ("…" if len(text) > width * 2 else "")
+    start = max(0, pos - width)
+    end = min(len(text), pos + len(needle) + width)
+    return (("…" if start > 0 else "") + text[start:pos] + "«" + text[pos:pos + len(needle)] + "»"
+            + text[pos + len(needle):end] + ("…" if end < len(text) else ""))
+
+
+# --- 로그 연동 --------------------------------------------------------------
+def iter_log_files(logs_dir: str = "logs") -> Iterable[Dict]:
+    """logs/ 의 참여자 로그를 하나씩 읽음 (평평한 구조와 샤드 구조 모두)"""
+    import log_storage
+    return log_storage.iter_logs(logs_dir)
+
+
+def journal_dir(path: str = INDEX_PATH) -> str:
+    return f"{path}.journal"
+
+
+def _journal_sizes(directory: str) -> Dict[str, int]:
+    if not os.path.isdir(directory):
+        return {}
+    return {entry.name: entry.stat().st_size for entry in os.scandir(directory) if entry.name.endswith(".jsonl")}
+
+
+def append_journal(participant_code: str, path: str = INDEX_PATH):
+    """이 프로세스의 저널에 변경된 참여자 코드를 한 줄 추가 (인덱스는 건드리지 않음)"""
+    directory = journal_dir(path)
+    os.makedirs(directory, exist_ok=True)
+    line = json.dumps({"participant_code": participant_code, "ts": time.time()}) + "\n"
+    # 매번 열고 닫아서, 정리 작업이 파일을 지운 뒤에도 새 파일로 이어 씀
+    with open(os.path.join(directory, f"{socket.gethostname()}-{os.getpid()}.jsonl"), 'a', encoding='utf-8') as f:
+        f.write(line)
+
+
+def apply_journal(index: SearchIndex, path: str = INDEX_PATH, logs_dir: str = "logs") -> int:
+    """저널에서 아직 반영하지 않은 참여자의 로그를 다시 읽어 색인하고 참여자 수를 반환"""
+    import log_storage
+
+    directory = journal_dir(path)
+    codes = {}
+    for name, size in sorted(_journal_sizes(directory).items()):
+        offset = index.journal_offsets.get(name, 0)
+        if size < offset:
+            offset = 0  # 삭제 후 같은 이름으로 다시 만들어진 저널
+        with open(os.path.join(directory, name), 'rb') as f:
+            f.seek(offset)
+            data = f.read(size - offset)
+        complete = data[:data.rfind(b"\n") + 1]  # 쓰는 중인 마지막 줄은 다음에 읽음
+        for line in complete.splitlines():
+            try:
+                codes[json.loads(line)["participant_code"]] = None
+            except (ValueError, KeyError):
+                continue
+        index.journal_offsets[name] = offset + len(complete)
+
+    for participant_code in codes:
+        log_file = log_storage.find_log_path(participant_code, logs_dir)
+        try:
+            log_data = log_storage.read_json(log_file) if log_file else None
+        except ValueError:
+            continue  # 깨진 로그는 복구(log_storage recover) 후 다음에 반영
+        # 로그가 없어졌으면 빈 대화로 처리되어 기존 문서가 무효화됨
+        index.index_conversation(log_data or {"participant_code": participant_code, "conversation": []})
+    return len(codes)
+
+
+def prune_journal(index: SearchIndex, path: str = INDEX_PATH):
+    """끝까지 반영했고 오랫동안 바뀌지 않은 저널 파일 삭제 (종료된 프로세스의 저널)"""
+    directory = journal_dir(path)
+    now = time.time()
+    for name, size in _journal_sizes(directory).items():
+        file = os.path.join(directory, name)
+        if index.journal_offsets.get(name) == size and now - os.path.getmtime(file) > JOURNAL_RETENTION_SECONDS:
+            os.remove(file)
+            index.journal_offsets.pop(name, None)
+
+
+def build_index(logs_dir: str = "logs", path: str = INDEX_PATH) -> SearchIndex:
+    """로그 전체로 인덱스를 새로 만듦"""
+    index = SearchIndex()
+    # 지금까지의 저널은 아래 전체 읽기에 포함됨 (읽는 도중 추가된 줄은 다음 반영 때 다시 색인해도 결과가 같음)
+    index.journal_offsets = _journal_sizes(journal_dir(path))
+    for log_data in iter_log_files(logs_dir):
+        index.index_conversation(log_data)
+    return index
+
+
+def get_index(path: str = INDEX_PATH, logs_dir: str = "logs") -> SearchIndex:
+    """검색용 인덱스: 스냅샷을 로드(없으면 logs/ 로 생성)하고 저널의 변경을 반영
+
+    오프라인 도구(검색 CLI, log_analyzer)에서 사용합니다. 변경이 있으면 스냅샷을 저장합니다.
+    """
+    if os.path.exists(path):
+        index = SearchIndex.load(path)
+        changed = apply_journal(index, path, logs_dir) > 0
+    else:
+        index = build_index(logs_dir, path)
+        changed = True
+    prune_journal(index, path)
+    if changed:
+        index.save(path)
+    return index
+
+
+def update_from_log(log_data: Dict):
+    """로그 저장 직후 호출: 참여자 코드만 저널에 기록 (색인은 검색/빌드 명령에서)"""
+    if not AUTO_INDEX_ENABLED:
+        return
+    append_journal(str(log_data.get("participant_code", "")))
+
+
+def print_hits(hits: List[Dict]):
+    for hit in hits:
+        role_icon = "🧑" if hit["role"] == "user" else "🤖"
+        print(f"  {role_icon} [{hit['participant_code']} #{hit['message_order']:>3}] "
+              f"{hit['date'] or '----------'}  ({hit['score']:.2f})  {hit['snippet']}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="R.A.I. 대화 로그 검색")
+    parser.add_argument("--index", default=INDEX_PATH, help="인덱스 파일 경로")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build_parser = sub.add_parser("build", help="logs/ 전체로 인덱스 재생성")
+    build_parser.add_argument("--logs-dir", default="logs")
+    update_parser = sub.add_parser("update", help="저널에 쌓인 변경만 인덱스에 반영")
+    update_parser.add_argument("--logs-dir", default="logs")
+    search_parser = sub.add_parser("search", help="검색")
+    search_parser.add_argument("query")
+    search_parser.add_argument("--role", choices=["user", "assistant"])
+    search_parser.add_argument("--since", help="YYYY-MM-DD 이후")
+    search_parser.add_argument("--until", help="YYYY-MM-DD 이전")
+    search_parser.add_argument("--participant", help="특정 참여자만")
+    search_parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+
+    if args.command == "build":
+        start = time.perf_counter()
+        index = build_index(args.logs_dir, args.index)
+        index.save(args.index)
+        print(f"✅ 인덱스 생성: 메시지 {index.live_count}개, gram {index.gram_count}개 "
+              f"({time.perf_counter() - start:.2f}초) → {args.index}")
+    elif args.command == "update":
+        start = time.perf_counter()
+        if os.path.exists(args.index):
+            index = SearchIndex.load(args.index)
+            updated = apply_journal(index, args.index, args.logs_dir)
+        else:
+            index = build_index(args.logs_dir, args.index)
+            updated = index.live_count
+        prune_journal(index, args.index)
+        index.save(args.index)
+        print(f"✅ 인덱스 갱신: 참여자 {updated}명 반영, 메시지 {index.live_count}개 "
+              f"({time.perf_counter() - start:.2f}초) → {args.index}")
+    else:
+        start = time.perf_counter()
+        index = get_index(args.index)
+        load_time = time.perf_counter() - start
+        start = time.perf_counter()
+        hits = index.search(args.query, args.role, args.since, args.until, args.participant, args.limit)
+        query_time = time.perf_counter() - start
+        print(f"🔎 '{args.query}': {len(hits)}건 (검색 {query_time * 1000:.1f}ms, 로드 {load_time * 1000:.0f}ms)")
+        print_hits(hits)
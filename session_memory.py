@@ -0,0 +1,307 @@
+# =============================================================
+# File: session_memory.py
+# 세션별 대화 히스토리 메모리 관리 (유휴 세션 내보내기 / 다시 불러오기)
+# =============================================================
+"""
+브라우저 탭(세션)마다 st.session_state["history"] 에 SDK 메시지 객체가 쌓이고,
+Streamlit 은 탭을 닫거나 방치해도 세션 상태를 한동안 메모리에 들고 있습니다.
+방문자가 많아지면 서버 메모리가 "현재 사용자 수"가 아니라 "누적 방문자 수"에
+비례해서 늘어납니다.
+
+이 모듈은 프로세스 전체의 세션 히스토리를 추적하다가:
+- 마지막 활동 후 RAI_SESSION_IDLE_SECONDS 가 지난 세션, 또는
+- 전체 히스토리 추정 크기가 RAI_SESSION_MEMORY_MB 를 넘으면 오래 안 쓴 세션부터(LRU)
+히스토리를 비웁니다 (spill). 대화 내용은 매 턴 로컬 로그/Firestore 에 이미 저장되므로
+저장본이 현재 히스토리와 일치하는지 확인된 세션만 비우고, 세션에는 참여자 코드와
+메시지 수만 남깁니다. 그 세션이 다시 상호작용하면 저장본에서 히스토리를 복원합니다.
+복원에 실패하면(저장본을 읽을 수 없음) 비운 표시(spilled)를 그대로 두고 다음 실행에서
+다시 시도합니다. 빈 히스토리로 새로 시작하면 다음 저장이 기존 로그를 덮어쓰므로,
+app.py 는 이때 오류를 표시하고 입력을 막습니다.
+
+다른 세션의 st.session_state 는 그 세션의 스크립트 스레드 밖에서 다룰 수 없으므로,
+history 를 list 를 상속한 SessionHistory 로 두고 같은 객체를 제자리에서 비우고 채웁니다.
+실행 중인 세션(busy)은 절대 비우지 않습니다.
+
+    import session_memory
+    with session_memory.track(st.session_state) as history:
+        ...  # history 는 st.session_state["history"] 와 같은 객체
+
+    def on_click():  # 히스토리를 건드리는 콜백 (track 보다 먼저 실행됨)
+        with session_memory.busy(st.session_state) as history:
+            if history.spilled is None:
+                ...
+
+환경 변수:
+- RAI_SESSION_IDLE_SECONDS: 이 시간(초) 동안 활동이 없으면 내보냄 (기본값: 1800, 0이면 끔)
+- RAI_SESSION_MEMORY_MB:    전체 세션 히스토리 메모리 예산 (기본값: 256, 0이면 끔)
+"""
+
+import os
+import sys
+import time
+import weakref
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+from azure.ai.inference.models import UserMessage, AssistantMessage
+
+import log_storage
+
+IDLE_SECONDS = float(os.environ.get("RAI_SESSION_IDLE_SECONDS", "1800"))
+MEMORY_BUDGET_BYTES = int(float(os.environ.get("RAI_SESSION_MEMORY_MB", "256")) * 1024 * 1024)
+MESSAGE_OVERHEAD_BYTES = 1024  # SDK 메시지 객체 + 화면 캐시 항목 하나의 대략적인 크기
+
+
+class SessionHistory(list):
+    """세션 하나의 대화 히스토리 (다른 스레드에서 제자리로 비우고 복원할 수 있는 list)
+
+    display_cache 는 app.get_display_messages 의 화면 표시용 변환 캐시로,
+    히스토리와 함께 비워지도록 여기에 둡니다.
+    """
+
+    def __init__(self, messages=(), session_id: Optional[str] = None):
+        super().__init__(messages)
+        self.session_id = session_id
+        self.participant_code: Optional[str] = None
+        self.display_cache: List = []
+        self.lock = threading.RLock()
+        self.busy = False                          # 스크립트/콜백 실행 중이면 True
+        self.last_active = time.monotonic()
+        self.nbytes = 0                            # 마지막 실행 종료 시점의 추정 크기
+        self.spilled: Optional[Dict] = None        # 비워진 경우 {"participant_code", "message_count"}
+
+    def estimate_bytes(self) -> int:
+        return sum(sys.getsizeof(msg.content or "") + MESSAGE_OVERHEAD_BYTES for msg in self)
+
+
+def _history_messages(conversation: List[Dict]) -> List:
+    """로그의 conversation 항목을 SDK 메시지 객체로 변환"""
+    return [
+        (UserMessage if m["role"] == "user" else AssistantMessage)(content=m["content"])
+        for m in conversation
+    ]
+
+
+def load_saved_conversation(participant_code: str) -> Optional[List[Dict]]:
+    """참여자의 저장된 대화 (로컬 로그 우선, 없으면 Firestore). 없으면 None"""
+    log_file = log_storage.find_log_path(participant_code)
+    if log_file:
+        try:
+            data = log_storage.read_json(log_file)
+            if data is not None:
+                return data.get("conversation", [])
+        except ValueError:
+            pass  # 깨진 로컬 로그는 Firestore 로 대체
+    try:
+        from conversation_log import FIRESTORE_AVAILABLE, firestore_handler
+        if FIRESTORE_AVAILABLE and firestore_handler and firestore_handler.is_available():
+            data = firestore_handler.get_participant_conversation(participant_code)
+            if data is not None:
+                return data.get("conversation", [])
+    except Exception as e:
+        print(f"⚠️ Firestore 대화 조회 실패: {str(e)}")
+    return None
+
+
+class SessionMemoryManager:
+    """프로세스 전체 세션 히스토리의 활동 시각/크기 추적과 내보내기"""
+
+    def __init__(self, idle_seconds: float = IDLE_SECONDS, budget_bytes: int = MEMORY_BUDGET_BYTES):
+        self.idle_seconds = idle_seconds
+        self.budget_bytes = budget_bytes
+        # session_id → SessionHistory 약한 참조 (최근 활동 순서, 마지막이 가장 최근)
+        self._sessions: "OrderedDict[str, weakref.ref]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._sweeping = False
+        self.spill_count = 0
+        self.rehydrate_count = 0
+        self.rehydrate_failures = 0
+
+    # --- 세션 측 (자기 세션의 스크립트 스레드에서 호출) -----------------------
+    def attach(self, state) -> SessionHistory:
+        """세션 상태의 history 를 SessionHistory 로 준비하고 등록"""
+        history = state.get("history")
+        if not isinstance(history, SessionHistory):
+            history = SessionHistory(history or [], session_id=state.get("_session_id"))
+            state["history"] = history
+        with self._lock:
+            self._sessions[history.session_id] = weakref.ref(history)
+            self._sessions.move_to_end(history.session_id)
+        return history
+
+    def touch(self, history: SessionHistory) -> bool:
+        """활동 시각 갱신, 비워진 히스토리면 저장본에서 복원 (복원 실패 시 False)"""
+        with history.lock:
+            history.last_active = time.monotonic()
+            restored = history.spilled is None or self._rehydrate(history)
+        with self._lock:
+            if history.session_id in self._sessions:
+                self._sessions.move_to_end(history.session_id)
+        return restored
+
+    @contextmanager
+    def track(self, state):
+        """스크립트 실행 한 번을 감싸서 실행 중에는 비우지 않고, 끝나면 정리 작업 예약"""
+        history = self.attach(state)
+        with history.lock:
+            history.busy = True
+        try:
+            self.touch(history)
+            history.participant_code = state.get("participant_code")
+            yield history
+        finally:
+            history.participant_code = state.get("participant_code", history.participant_code)
+            history.nbytes = history.estimate_bytes()
+            history.last_active = time.monotonic()
+            with history.lock:
+                history.busy = False
+            self.sweep_async()
+
+    @contextmanager
+    def busy(self, state):
+        """콜백 하나를 감싸서 끝날 때까지 히스토리를 잠그고 비우지 않게 함 (비워졌으면 복원)
+
+        콜백은 track 보다 먼저 실행되므로, 복원과 그 뒤의 히스토리 변경 사이에 정리
+        작업이 끼어들지 않도록 lock 을 콜백이 끝날 때까지 잡고 있습니다.
+        복원에 실패하면 history.spilled 가 남아 있으므로 확인한 뒤 사용해야 합니다.
+        """
+        history = self.attach(state)
+        with history.lock:
+            was_busy, history.busy = history.busy, True
+            try:
+                self.touch(history)
+                yield history
+            finally:
+                history.busy = was_busy
+
+    def _rehydrate(self, history: SessionHistory) -> bool:
+        """저장본에서 복원. 실패하면 spilled 를 그대로 두어 다음 실행에서 다시 시도"""
+        stub = history.spilled
+        try:
+            conversation = load_saved_conversation(stub["participant_code"])
+        except Exception as e:
+            print(f"⚠️ 저장본 읽기 실패: {str(e)}")
+            conversation = None
+        if conversation is None or len(conversation) < stub["message_count"]:
+            print(f"⚠️ 세션 히스토리 복원 실패: 참여자 {stub['participant_code']} 저장본 없음/불완전")
+            self.rehydrate_failures += 1
+            return False
+        history[:] = _history_messages(conversation)
+        history.display_cache.clear()
+        history.spilled = None
+        self.rehydrate_count += 1
+        return True
+
+    # --- 정리 작업 (다른 세션의 스레드 또는 백그라운드 스레드에서 호출) --------
+    def _spill(self, history: SessionHistory) -> int:
+        """저장본과 일치하면 히스토리를 비우고 해제된 추정 바이트 수를 반환 (못 비우면 0)
+
+        저장본 조회(Firestore 까지 갈 수 있음)는 잠금 밖에서 하여, 그 세션의 다음 실행이나
+        콜백이 정리 작업의 I/O 를 기다리지 않게 합니다. 조회 후 잠금 안에서 다시 확인합니다.
+        """
+        with history.lock:
+            if history.busy or history.spilled is not None or not history or not history.participant_code:
+                return 0
+            participant_code = history.participant_code
+        saved = load_saved_conversation(participant_code)
+        with history.lock:
+            if (history.busy or history.spilled is not None or not history
+                    or history.participant_code != participant_code):
+                return 0
+            # 매 턴 저장되므로 보통 일치함. 저장이 실패했던 세션은 메모리에 그대로 둠
+            if saved is None or len(saved) != len(history) or saved[-1].get("content") != history[-1].content:
+                return 0
+            freed = history.nbytes or history.estimate_bytes()
+            history.spilled = {"participant_code": history.participant_code, "message_count": len(history)}
+            history.clear()
+            history.display_cache.clear()
+            history.nbytes = 0
+            self.spill_count += 1
+            return freed
+
+    def _live_sessions(self) -> List[SessionHistory]:
+        """살아 있는 세션 목록 (오래 안 쓴 순). 사라진 세션은 등록 해제"""
+        with self._lock:
+            live = []
+            for session_id, ref in list(self._sessions.items()):
+                history = ref()
+                if history is None:
+                    del self._sessions[session_id]
+                else:
+                    live.append(history)
+            return live
+
+    def sweep(self) -> int:
+        """유휴 세션과 메모리 예산 초과분을 내보내고 내보낸 세션 수를 반환"""
+        now = time.monotonic()
+        sessions = self._live_sessions()
+        spilled = 0
+        if self.idle_seconds > 0:
+            for history in sessions:
+                if now - history.last_active >= self.idle_seconds and self._spill(history):
+                    spilled += 1
+        if self.budget_bytes > 0:
+            total = sum(history.nbytes for history in sessions if history.spilled is None)
+            for history in sorted(sessions, key=lambda h: h.last_active):
+                if total <= self.budget_bytes:
+                    break
+                freed = self._spill(history)
+                if freed:
+                    total -= freed
+                    spilled += 1
+        return spilled
+
+    def sweep_async(self):
+        """정리 작업을 백그라운드 스레드에서 실행 (저장본 조회가 사용자 응답을 늦추지 않도록)"""
+        with self._lock:
+            if self._sweeping:
+                return
+            self._sweeping = True
+
+        def run():
+            try:
+                self.sweep()
+            except Exception as e:
+                print(f"⚠️ 세션 메모리 정리 실패: {str(e)}")
+            finally:
+                with self._lock:
+                    self._sweeping = False
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def stats(self) -> Dict:
+        sessions = self._live_sessions()
+        resident = [h for h in sessions if h.spilled is None]
+        return {
+            "sessions": len(sessions),
+            "resident": len(resident),
+            "spilled": len(sessions) - len(resident),
+            "resident_bytes": sum(h.nbytes for h in resident),
+            "spill_count": self.spill_count,
+            "rehydrate_count": self.rehydrate_count,
+            "rehydrate_failures": self.rehydrate_failures,
+        }
+
+
+# 전역 인스턴스 (Streamlit 은 모듈을 한 번만 import 하므로 프로세스 전체에서 공유됨)
+session_memory = SessionMemoryManager()
+
+
+def track(state):
+    return session_memory.track(state)
+
+
+def busy(state):
+    return session_memory.busy(state)
+
+
+def touch(state) -> SessionHistory:
+    """track 밖에서 history 를 읽기 전에 호출 (비워졌으면 복원, 실패하면 spilled 가 남아 있음)
+
+    읽고 나서 고치는 콜백은 busy 를 사용하세요.
+    """
+    history = session_memory.attach(state)
+    session_memory.touch(history)
+    return history
@@ -0,0 +1,39 @@
+# =============================================================
+# File: synthetic_text.py
+# 합성 메시지 본문 생성 (벤치마크 / 부하 테스트 / 가짜 LLM 공용)
+# =============================================================
+"""
+한글 단어, 임의 음절, 이모지, 개행이 섞인 메시지 본문을 만듭니다.
+benchmark.py 의 합성 대화, fake_llm.py 의 가짜 답변, load_test.py 의 사용자 입력이
+같은 분포의 텍스트를 쓰도록 한 곳에 둡니다.
+
+    import random
+    from synthetic_text import random_text
+    random_text(random.Random(42), 2, 15)
+"""
+
+import random
+
+EMOJIS = ["😈", "🔥", "😂", "👍", "🎉", "🤖", "💬", "✨", "🙃", "❤️"]
+WORDS = [
+    "안녕", "너", "이름이", "뭐야", "오늘", "날씨", "어때", "재밌는", "얘기", "해줘",
+    "반항적인", "챗봇", "정말", "그래서", "왜", "숙제", "도와줘", "싫어", "좋아", "ㅋㅋㅋ",
+    "hello", "R.A.I.", "ok", "lol",
+]
+
+
+def random_text(rng: random.Random, min_words: int = 3, max_words: int = 40) -> str:
+    """한글 단어/임의 음절/이모지/개행이 섞인 메시지 본문 생성"""
+    parts = []
+    for _ in range(rng.randint(min_words, max_words)):
+        roll = rng.random()
+        if roll < 0.6:
+            parts.append(rng.choice(WORDS))
+        elif roll < 0.85:
+            # 임의의 한글 음절 2~4자
+            parts.append("".join(chr(0xAC00 + rng.randrange(11172)) for _ in range(rng.randint(2, 4))))
+        elif roll < 0.97:
+            parts.append(rng.choice(EMOJIS))
+        else:
+            parts.append("\n")
+    return " ".join(parts) + rng.choice(["", "?", "!", "?!", "..."])
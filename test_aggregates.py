@@ -0,0 +1,194 @@
+# =============================================================
+# File: test_aggregates.py
+# =============================================================
+
+import os
+import random
+
+import pytest
+
+import log_storage
+from aggregates import AggregateStore, Aggregates, Sketch
+
+
+def _log(code, messages, end=None):
+    return {
+        "participant_code": code,
+        "conversation_start": "2025-07-28T05:00:00",
+        "conversation_end": end,
+        "last_updated": end or "2025-07-28T05:01:00",
+        "conversation": [{"role": "user" if i % 2 == 0 else "assistant", "content": text}
+                         for i, text in enumerate(messages)],
+    }
+
+
+def _save(store, code, messages, end=None):
+    """save_local_log 와 같은 순서: 잠금 안에서 로그를 쓰고 차이를 기록"""
+    path = log_storage.log_path(code)
+    with store.update_guard():
+        previous = log_storage.read_json(path) if os.path.exists(path) else None
+        current = _log(code, messages, end)
+        log_storage.atomic_write_json(path, current)
+        store.record_update(previous, current)
+
+
+def test_sketch_quantiles_are_within_relative_accuracy():
+    rng = random.Random(7)
+    values = [rng.lognormvariate(4, 1) for _ in range(5000)]
+    sketch = Sketch()
+    for value in values:
+        sketch.add(value)
+    ordered = sorted(values)
+    for q in (0.5, 0.9, 0.99):
+        exact = ordered[int(q * len(values)) - 1]
+        assert abs(sketch.quantile(q) - exact) / exact <= 0.03
+
+
+def test_sketch_merge_and_removal():
+    a, b, both = Sketch(), Sketch(), Sketch()
+    for value in (0, 3, 10, 250):
+        a.add(value)
+        both.add(value)
+    for value in (7, 7, 1000):
+        b.add(value)
+        both.add(value)
+    a.merge(b)
+    assert a.to_dict() == both.to_dict()
+    a.add(1000, -1)
+    both.add(1000, -1)
+    assert Sketch.from_dict(a.to_dict()).to_dict() == both.to_dict()
+
+
+def test_incremental_updates_match_full_rebuild():
+    incremental = Aggregates()
+    steps = [
+        ("11110000", None, _log("11110000", ["안녕", "반가워"])),
+        ("11110000", _log("11110000", ["안녕", "반가워"]), _log("11110000", ["안녕", "반가워", "뭐해", "놀아"])),
+        ("22220000", None, _log("22220000", ["숙제"], end="2025-07-28T05:10:00")),
+        # 대화 리셋으로 짧아짐 + 종료
+        ("11110000", _log("11110000", ["안녕", "반가워", "뭐해", "놀아"]),
+         _log("11110000", ["새 대화"], end="2025-07-28T05:05:00")),
+    ]
+    final = {}
+    for code, previous, current in steps:
+        incremental.record_update(previous, current)
+        final[code] = current
+    rebuilt = Aggregates.from_logs(final.values())
+    assert incremental.counters == rebuilt.counters
+    assert incremental.message_length.to_dict() == rebuilt.message_length.to_dict()
+    assert incremental.duration.to_dict() == rebuilt.duration.to_dict()
+    assert incremental.summary()["completed"] == 2 and incremental.summary()["messages"] == 2
+
+
+def test_overwritten_conversation_of_same_or_greater_length_is_replaced():
+    # 같은 참여자 코드로 리셋 후 새 대화가 첫 저장에서 이전 길이 이상이 된 경우
+    previous = _log("11110000", ["안녕", "반가워"])
+    steps = [(None, previous),
+             (previous, _log("11110000", ["다른 대화", "완전히 다른 답변"])),
+             (_log("11110000", ["다른 대화", "완전히 다른 답변"]), _log("11110000", ["또", "새", "대화 시작"]))]
+    incremental = Aggregates()
+    for before, after in steps:
+        incremental.record_update(before, after)
+    rebuilt = Aggregates.from_logs([steps[-1][1]])
+    assert incremental.counters == rebuilt.counters
+    assert incremental.message_length.to_dict() == rebuilt.message_length.to_dict()
+
+
+def test_firestore_summary_document_tracks_saves():
+    pytest.importorskip("firebase_admin")
+    pytest.importorskip("streamlit")
+    from fake_firestore import FakeFirestoreClient
+    from firestore_handler import FirestoreHandler
+
+    handler = FirestoreHandler(db=FakeFirestoreClient())
+
+    def messages(*texts):
+        return [{"role": "user" if i % 2 == 0 else "assistant", "content": text, "timestamp": None}
+                for i, text in enumerate(texts)]
+
+    handler.save_conversation("11110000", messages("안녕", "반가워"))
+    handler.save_conversation("11110000", messages("안녕", "반가워", "뭐해", "놀아"))
+    handler.save_conversation("22220000", messages("숙제"), conversation_end=True)
+    handler.save_conversation("11110000", messages("리셋", "새 대화", "길게", "이어감"))
+
+    docs = [doc.to_dict() for doc in handler.db.collection("conversations").stream()]
+    expected = Aggregates.from_logs(docs)
+    stored = handler.get_aggregates()
+    assert stored.counters == expected.counters
+    assert stored.message_length.quantile(0.5) == expected.message_length.quantile(0.5)
+    assert stored.duration.count == 1
+    assert handler.get_conversation_stats() == (2, 5)
+
+    # 요약 문서가 없으면 서버 측 count/sum 집계 쿼리로 대체, rebuild 로 다시 만듦
+    handler.db.collection("stats").document("conversations").delete()
+    assert handler.get_aggregates() is None
+    assert handler.get_conversation_stats() == (2, 5)
+    assert handler.rebuild_aggregates().counters == expected.counters
+    assert handler.get_aggregates().counters == expected.counters
+
+
+def test_stores_in_two_processes_add_up(tmp_path):
+    path = str(tmp_path / "logs" / ".aggregates.json")
+    first, second = AggregateStore(path, enabled=True), AggregateStore(path, enabled=True)
+    _save(first, "11110000", ["a", "b"])
+    _save(second, "22220000", ["c"])
+    assert first.get().counters["participants"] == 1  # 자기 변화량만 보임 (flush 전)
+    first.flush()
+    second.flush()
+    assert AggregateStore(path, enabled=True).get().summary()["messages"] == 3
+
+
+def test_rebuild_drops_deltas_already_counted_from_logs(tmp_path):
+    path = str(tmp_path / "logs" / ".aggregates.json")
+    writer, rebuilder = AggregateStore(path, enabled=True), AggregateStore(path, enabled=True)
+    _save(writer, "11110000", ["a", "b"])          # 로그에 반영, 변화량은 아직 메모리에
+    rebuilder.rebuild()                             # 로그 전체로 재생성 (위 대화 포함)
+    writer.flush()                                  # 이전 세대 변화량 → 버림
+    assert AggregateStore(path, enabled=True).get().counters == Aggregates.from_logs(
+        log_storage.iter_logs()).counters
+
+    _save(writer, "22220000", ["c"])               # 재생성 이후의 변화량은 반영
+    writer.flush()
+    summary = AggregateStore(path, enabled=True).get().summary()
+    assert (summary["participants"], summary["messages"]) == (2, 3)
+
+
+def test_path_is_fixed_when_the_store_is_created(tmp_path):
+    store = AggregateStore(os.path.join("logs", ".aggregates.json"), enabled=True)
+    _save(store, "11110000", ["a"])
+    os.chdir(tmp_path.parent)
+    store.flush()
+    assert os.path.exists(tmp_path / "logs" / ".aggregates.json")
+    assert not os.path.exists(tmp_path.parent / "logs" / ".aggregates.json")
+
+
+def test_disabled_store_records_nothing(tmp_path):
+    store = AggregateStore(str(tmp_path / ".aggregates.json"), enabled=False)
+    store.record_update(None, _log("11110000", ["a"]))
+    store.flush()
+    assert store.get().is_empty()
+    assert not os.path.exists(tmp_path / ".aggregates.json")
+
+
+def test_conversation_stats_prefer_firestore(monkeypatch):
+    pytest.importorskip("streamlit")
+    pytest.importorskip("azure.ai.inference")
+    import aggregates
+    import conversation_log
+
+    local = Aggregates.from_logs([_log("11110000", ["a", "b"])])
+    monkeypatch.setattr(aggregates, "get_aggregates", lambda: local)
+
+    class Firestore:
+        def is_available(self):
+            return True
+
+        def get_conversation_stats(self):
+            return 10, 120
+
+    monkeypatch.setattr(conversation_log, "FIRESTORE_AVAILABLE", True)
+    monkeypatch.setattr(conversation_log, "firestore_handler", Firestore())
+    assert conversation_log.get_conversation_stats() == (10, 120)
+
+    monkeypatch.setattr(conversation_log, "firestore_handler", None)
+    assert conversation_log.get_conversation_stats() == (1, 2)
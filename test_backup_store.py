@@ -0,0 +1,67 @@
+# =============================================================
+# File: test_backup_store.py
+# =============================================================
+
+import os
+
+from backup_store import BackupStore, load_backup_folder
+from firestore_backup import save_csv_summary, save_json_backup
+
+
+def _conversation(code, *texts, end=None):
+    return {
+        "participant_code": code,
+        "conversation_start": "2025-07-28T05:00:00",
+        "conversation_end": end,
+        "last_updated": "2025-07-28T05:01:00",
+        "message_count": len(texts),
+        "conversation": [{"role": "user" if i % 2 == 0 else "assistant", "content": text, "timestamp": None}
+                         for i, text in enumerate(texts)],
+    }
+
+
+def _backup_folder(path, conversations):
+    """firestore_backup.py 와 같은 백업 폴더 (엑셀 리포트 제외)"""
+    os.makedirs(path)
+    save_json_backup(conversations, path)
+    save_csv_summary(conversations, path)
+    return path
+
+
+def _files(folder):
+    files = {}
+    for dirpath, _, filenames in os.walk(folder):
+        for name in filenames:
+            if not name.endswith(".xlsx"):  # 엑셀 파일은 생성 시각이 들어감
+                with open(os.path.join(dirpath, name), 'rb') as f:
+                    files[os.path.relpath(os.path.join(dirpath, name), folder)] = f.read()
+    return files
+
+
+def test_backups_share_unchanged_objects_and_materialize_identically(tmp_path):
+    first = {
+        "11110000": _conversation("11110000", "안녕 😈", "반가워", end="2025-07-28T05:10:00"),
+        "22220000": _conversation("22220000", "숙제\n도와줘"),
+    }
+    second = dict(first, **{"22220000": _conversation("22220000", "숙제\n도와줘", "싫어"),
+                            "33330000": _conversation("33330000", "처음")})
+    folders = [_backup_folder(str(tmp_path / f"firestore_backup_{run_id}"), conversations)
+               for run_id, conversations in (("run1", first), ("run2", second))]
+
+    store = BackupStore(str(tmp_path / "backup_store"))
+    manifests = [store.store_run(load_backup_folder(folder), run_id=run_id, source=folder)
+                 for run_id, folder in zip(("run1", "run2"), folders)]
+
+    # 바뀌지 않은 참여자는 object 를 다시 쓰지 않음
+    assert [m["new_objects"] for m in manifests] == [2, 2]
+    assert manifests[1]["participants"]["11110000"] == manifests[0]["participants"]["11110000"]
+    objects = [name for _, _, names in os.walk(store.objects_dir) for name in names]
+    assert len(objects) == 4
+
+    # manifest 를 다시 읽어도 같은 실행
+    assert [run["run_id"] for run in store.list_runs()] == ["run1", "run2"]
+    assert store.load_run("run2") == second
+
+    for run_id, folder in zip(("run1", "run2"), folders):
+        target = store.materialize(run_id, str(tmp_path / f"materialized_{run_id}"))
+        assert _files(target) == _files(folder)
@@ -0,0 +1,52 @@
+# =============================================================
+# File: test_chatbot_core.py
+# =============================================================
+
+import pytest
+
+pytest.importorskip("azure.ai.inference")
+
+import chatbot_core
+from azure.ai.inference.models import UserMessage
+from chatbot_core import ReplyBudget
+from fake_llm import FakeChatCompletionsClient
+
+
+@pytest.fixture
+def fake_client(monkeypatch):
+    client = FakeChatCompletionsClient(ttft_mean=0.001, tokens_per_second=1e6, seed=1)
+    monkeypatch.setattr(chatbot_core, "client", client)
+    monkeypatch.setattr(chatbot_core, "reply_budget", ReplyBudget(floor=16, ceiling=1024))
+    return client
+
+
+def test_stream_details_include_service_usage(fake_client):
+    details = {}
+    reply = "".join(chatbot_core.stream_completion([UserMessage(content="안녕")], details=details))
+    assert reply
+    assert details["ok"] and not details["cancelled"]
+    assert details["usage"].completion_tokens > 0
+    assert details["finish_reason"] in ("stop", "length")
+
+
+def test_pinned_max_tokens_bypasses_adaptive_budget(fake_client):
+    budget = chatbot_core.reply_budget
+    for _ in range(ReplyBudget.MIN_SAMPLES):
+        budget.record("p1", [], 10, 1024)
+    history = [UserMessage(content="안녕")]
+    assert budget.choose("p1", history) < 1024
+
+    details = {}
+    "".join(chatbot_core.stream_completion(history, participant_code="p1", details=details,
+                                           max_tokens=1024))
+    assert details["max_tokens"] == 1024
+    # 고정 실행은 예산 통계에 섞이지 않음
+    assert len(budget._participants["p1"]) == ReplyBudget.MIN_SAMPLES
+
+
+def test_budget_ignores_replies_without_usage(fake_client):
+    budget = chatbot_core.reply_budget
+    chatbot_core._record_budget("p1", [], None, 1024, "stop")
+    chatbot_core._record_budget("p1", [], None, 64, "length")
+    # 토큰 수를 모르면 건너뛰고, 잘린 답변은 예산의 두 배로 기록
+    assert list(budget._participants["p1"]) == [128]
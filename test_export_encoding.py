@@ -0,0 +1,61 @@
+# =============================================================
+# File: test_export_encoding.py
+# =============================================================
+
+import csv
+import os
+
+from firestore_backup import save_csv_summary
+
+
+def _reference_csv(rows, path, encoding, sanitize):
+    """예전 save_csv_summary 방식 (csv.DictWriter, Excel 용은 글자 단위로 정제)"""
+    if sanitize:
+        rows = [{key: ''.join(char for char in value if ord(char) < 65536 and char.isprintable() or char.isspace())
+                 if isinstance(value, str) else value for key, value in row.items()} for row in rows]
+    with open(path, 'w', newline='', encoding=encoding, errors='ignore') as f:
+        writer = csv.DictWriter(f, fieldnames=rows[0].keys())
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def _read(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def test_csv_summary_matches_reference_output(tmp_path):
+    conversations = {
+        "11111111": {
+            "conversation_start": "2025-07-28T05:00:00",
+            "conversation_end": "2025-07-28T05:10:00",
+            "last_updated": "2025-07-28T05:10:00",
+            "message_count": 3,
+            "conversation": [
+                {"role": "user", "content": "안녕 😈\n반가워", "timestamp": "t1"},
+                {"role": "assistant", "content": "ユーザー​\x07 hi, \"quoted\"", "timestamp": "t2"},
+                {"role": "user", "content": "", "timestamp": "t3"},
+            ],
+        },
+        "22222222": {"message_count": None, "conversation": []},
+    }
+    save_csv_summary(conversations, str(tmp_path))
+
+    summary = [
+        {"participant_code": "11111111", "conversation_start": "2025-07-28T05:00:00",
+         "conversation_end": "2025-07-28T05:10:00", "last_updated": "2025-07-28T05:10:00",
+         "message_count": 3, "status": "완료"},
+        {"participant_code": "22222222", "conversation_start": "", "conversation_end": "",
+         "last_updated": "", "message_count": None, "status": "진행중"},
+    ]
+    detailed = [
+        {"participant_code": "11111111", "message_order": i + 1, "role": m["role"],
+         "content": m["content"].replace('\n', ' '), "timestamp": m["timestamp"],
+         "content_length": len(m["content"])}
+        for i, m in enumerate(conversations["11111111"]["conversation"])
+    ]
+    for name, rows in (("conversation_summary", summary), ("detailed_messages", detailed)):
+        for suffix, encoding, sanitize in (("", "utf-8-sig", False), ("_excel", "cp949", True)):
+            expected = os.path.join(tmp_path, f"expected{suffix}.csv")
+            _reference_csv(rows, expected, encoding, sanitize)
+            assert _read(os.path.join(tmp_path, f"{name}{suffix}.csv")) == _read(expected), (name, suffix)
@@ -0,0 +1,25 @@
+# =============================================================
+# File: test_fake_llm.py
+# =============================================================
+
+from fake_llm import FakeChatCompletionsClient, estimate_tokens
+
+
+def _client(**kwargs):
+    return FakeChatCompletionsClient(ttft_mean=0.001, tokens_per_second=1e6, seed=1, **kwargs)
+
+
+def test_stream_sends_usage_only_when_requested():
+    updates = list(_client().complete([], stream=True))
+    assert all(update.usage is None for update in updates)
+
+    updates = list(_client().complete([], stream=True,
+                                      model_extras={"stream_options": {"include_usage": True}}))
+    assert updates[-1].choices == []
+    assert updates[-1].usage.completion_tokens > 0
+
+
+def test_reply_is_truncated_at_max_tokens():
+    response = _client(reply_words=(200, 200)).complete([], max_tokens=5)
+    assert response.choices[0].finish_reason == "length"
+    assert estimate_tokens(response.choices[0].message.content) <= 5
@@ -0,0 +1,76 @@
+# =============================================================
+# File: test_firestore_reader.py
+# =============================================================
+
+import pytest
+
+import firestore_reader
+from fake_firestore import FakeFirestoreClient, FakeQuery
+from firestore_reader import PartitionReadError, id_range_bounds, iter_collection_parallel
+
+
+@pytest.mark.parametrize("partitions", [0, 1, 2, 3, 4, 7, 10, 16, 100, 1000])
+def test_id_range_bounds_cover_the_whole_space(partitions):
+    bounds = id_range_bounds(partitions)
+    assert len(bounds) == max(1, partitions)
+    assert bounds[0][0] is None and bounds[-1][1] is None
+    # 구간은 빈틈/겹침 없이 이어지고 경계는 오름차순
+    for (_, end), (start, _) in zip(bounds, bounds[1:]):
+        assert end == start
+    edges = [end for _, end in bounds[:-1]]
+    assert edges == sorted(set(edges))
+
+
+def test_id_range_bounds_are_even_for_participant_codes():
+    assert id_range_bounds(4) == [(None, "25"), ("25", "50"), ("50", "75"), ("75", None)]
+    codes = [f"{n:08d}" for n in range(0, 10 ** 8, 7919)]
+    sizes = [sum(1 for code in codes if (start is None or code >= start) and (end is None or code < end))
+             for start, end in id_range_bounds(8)]
+    assert max(sizes) - min(sizes) <= len(codes) * 0.02
+
+
+def _client(doc_ids):
+    db = FakeFirestoreClient()
+    for doc_id in doc_ids:
+        db.collection("conversations").document(doc_id).set({"participant_code": doc_id})
+    return db
+
+
+def test_parallel_read_returns_every_document_once():
+    doc_ids = [f"{n:08d}" for n in range(0, 10 ** 8, 999983)] + ["abc", "ZZZ", "-1"]
+    docs = dict(iter_collection_parallel(_client(doc_ids), partitions=8, verbose=False))
+    assert sorted(docs) == sorted(doc_ids)
+
+
+def test_failed_partition_resumes_after_last_document(monkeypatch):
+    doc_ids = [f"{n:08d}" for n in range(0, 10 ** 8, 999983)]
+    monkeypatch.setattr(firestore_reader.time, "sleep", lambda seconds: None)
+    stream = FakeQuery.stream
+    failures = []
+
+    def flaky_stream(query):
+        for count, snapshot in enumerate(stream(query)):
+            if query._start == "50" and not failures and count == 3:
+                failures.append(snapshot.id)
+                raise ConnectionError("stream reset")
+            yield snapshot
+
+    monkeypatch.setattr(FakeQuery, "stream", flaky_stream)
+    read = [doc_id for doc_id, _ in iter_collection_parallel(_client(doc_ids), partitions=4, verbose=False)]
+    assert failures
+    assert sorted(read) == doc_ids
+
+
+def test_partition_failing_every_retry_raises(monkeypatch):
+    monkeypatch.setattr(firestore_reader.time, "sleep", lambda seconds: None)
+    stream = FakeQuery.stream
+
+    def broken_stream(query):
+        if query._end == "25":
+            raise ConnectionError("unavailable")
+        yield from stream(query)
+
+    monkeypatch.setattr(FakeQuery, "stream", broken_stream)
+    with pytest.raises(PartitionReadError) as excinfo:
+        list(iter_collection_parallel(_client(["00000001", "60000000"]), partitions=4, verbose=False))
+    assert [index for index, _ in excinfo.value.failed] == [0]
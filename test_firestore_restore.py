@@ -0,0 +1,80 @@
+# =============================================================
+# File: test_firestore_restore.py
+# =============================================================
+
+import json
+from datetime import datetime
+
+import pytest
+
+import firestore_restore
+from fake_firestore import FakeFirestoreClient
+from firestore_restore import Checkpoint, CheckpointMismatchError, restore
+
+
+def _records(count, content="안녕 😈"):
+    return [(f"{i:08d}", {"participant_code": f"{i:08d}",
+                          "conversation_start": "2025-07-28T05:00:00",
+                          "conversation": [{"role": "user", "content": content}]})
+            for i in range(count)]
+
+
+def _restored(db):
+    return {snapshot.id: snapshot.to_dict() for snapshot in db.collection("conversations").stream()}
+
+
+def test_restore_writes_all_documents_with_timestamps():
+    db = FakeFirestoreClient()
+    summary = restore(iter(_records(120)), db, batch_size=50, workers=4)
+    assert summary["documents"] == 120 and summary["batches"] == 3
+    restored = _restored(db)
+    assert len(restored) == 120
+    assert restored["00000007"]["conversation_start"] == datetime(2025, 7, 28, 5, 0, 0)
+
+
+def test_resume_with_same_settings_skips_only_completed_batches(tmp_path):
+    path = str(tmp_path / "restore_checkpoint.json")
+    records = _records(300)
+    # 중단된 실행: 앞의 150건(3배치)만 복원됨
+    restore(iter(records[:150]), FakeFirestoreClient(), batch_size=50,
+            checkpoint=Checkpoint(path, "backup", "fp", 50))
+
+    db = FakeFirestoreClient()
+    summary = restore(iter(records), db, batch_size=50, checkpoint=Checkpoint(path, "backup", "fp", 50))
+    assert summary["skipped_batches"] == 3
+    assert summary["documents"] == 150
+    assert sorted(_restored(db)) == [code for code, _ in records[150:]]
+
+
+@pytest.mark.parametrize("changes", [
+    {"batch_size": 100},
+    {"fingerprint": "changed"},
+    {"max_batch_bytes": 1024},
+])
+def test_resume_with_different_batching_or_source_is_refused(tmp_path, changes):
+    path = str(tmp_path / "restore_checkpoint.json")
+    restore(iter(_records(150)), FakeFirestoreClient(), batch_size=50,
+            checkpoint=Checkpoint(path, "backup", "fp", 50))
+
+    options = dict({"fingerprint": "fp", "batch_size": 50,
+                    "max_batch_bytes": firestore_restore.MAX_BATCH_BYTES}, **changes)
+    with pytest.raises(CheckpointMismatchError):
+        Checkpoint(path, "backup", **options)
+
+
+def test_batches_are_capped_by_serialized_size():
+    db = FakeFirestoreClient()
+    records = _records(10, content="가" * 1000)
+    one_doc = firestore_restore.document_bytes(*records[0])
+    summary = restore(iter(records), db, batch_size=500, max_batch_bytes=one_doc * 3)
+    assert summary["batches"] == 4  # 3 + 3 + 3 + 1
+    assert len(_restored(db)) == 10
+
+
+def test_iter_json_object_streams_in_small_chunks(tmp_path, monkeypatch):
+    data = {code: doc for code, doc in _records(25)}
+    data["00000003"]["message_count"] = 12345
+    path = tmp_path / "all_conversations.json"
+    path.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+    monkeypatch.setattr(firestore_restore, "READ_CHUNK_SIZE", 7)
+    assert dict(firestore_restore.iter_json_object(str(path))) == data
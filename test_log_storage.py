@@ -0,0 +1,79 @@
+# =============================================================
+# File: test_log_storage.py
+# =============================================================
+
+import json
+import os
+
+import log_storage
+
+
+def _write(path, text):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+
+
+def _age(path, seconds=log_storage.STALE_TMP_SECONDS + 60):
+    old = os.path.getmtime(path) - seconds
+    os.utime(path, (old, old))
+
+
+def test_sharded_and_flat_paths():
+    assert log_storage.sharded_log_path("29808372") == os.path.join("logs", "29", "80", "participant_29808372.json")
+    assert log_storage.find_log_path("29808372") is None
+    _write(log_storage.flat_log_path("29808372"), "{}")
+    assert log_storage.find_log_path("29808372") == log_storage.flat_log_path("29808372")
+    log_storage.atomic_write_json(log_storage.sharded_log_path("29808372"), {"a": 1})
+    assert log_storage.find_log_path("29808372") == log_storage.sharded_log_path("29808372")
+
+
+def test_atomic_write_leaves_no_temp_file():
+    path = log_storage.log_path("12345678")
+    log_storage.atomic_write_json(path, {"participant_code": "12345678", "conversation": []})
+    assert log_storage.read_json(path)["participant_code"] == "12345678"
+    assert os.listdir(os.path.dirname(path)) == ["participant_12345678.json"]
+
+
+def test_iter_logs_reads_flat_and_sharded_logs():
+    for code in ("11110000", "22220000", "33330000"):
+        log_storage.atomic_write_json(log_storage.sharded_log_path(code), {"participant_code": code})
+    _write(log_storage.flat_log_path("44440000"), json.dumps({"participant_code": "44440000"}))
+    assert log_storage.count_logs() == 4
+    assert sorted(data["participant_code"] for data in log_storage.iter_logs()) == [
+        "11110000", "22220000", "33330000", "44440000"]
+
+
+def test_startup_recovery_restores_complete_temp_file_over_torn_log():
+    target = log_storage.sharded_log_path("12345678")
+    _write(target, '{"participant_code": "123')
+    tmp = os.path.join(os.path.dirname(target), ".participant_12345678.json.999.tmp")
+    _write(tmp, json.dumps({"participant_code": "12345678"}))
+    _age(tmp)
+
+    summary = log_storage.recover_logs()
+    assert summary["restored"] == 1 and summary["quarantined"] == 1
+    assert log_storage.read_json(target) == {"participant_code": "12345678"}
+    assert not os.path.exists(tmp)
+
+
+def test_startup_recovery_keeps_recent_temp_files_and_does_not_parse_logs():
+    target = log_storage.sharded_log_path("12345678")
+    _write(target, "{torn")
+    tmp = os.path.join(os.path.dirname(target), ".participant_12345678.json.999.tmp")
+    _write(tmp, "{}")  # 다른 프로세스가 쓰는 중일 수 있음
+
+    assert log_storage.recover_logs() == {"restored": 0, "removed_tmp": 0, "quarantined": 0}
+    assert os.path.exists(tmp) and os.path.exists(target)
+
+    # 전체 검사(CLI)는 깨진 로그를 격리
+    summary = log_storage.recover_logs(validate=True)
+    assert summary["quarantined"] == 1
+    assert not os.path.exists(target)
+    assert os.listdir(os.path.join("logs", log_storage.CORRUPT_DIR))
+
+
+def test_migrate_flat_logs():
+    _write(log_storage.flat_log_path("55550000"), json.dumps({"participant_code": "55550000"}))
+    assert log_storage.migrate_flat_logs() == 1
+    assert log_storage.find_log_path("55550000") == log_storage.sharded_log_path("55550000")
@@ -0,0 +1,41 @@
+# =============================================================
+# File: test_prompt_similarity.py
+# =============================================================
+
+from prompt_similarity import PromptIndex, cluster_prompts, jaccard, shingles
+
+
+def test_near_duplicate_prompt_is_found():
+    index = PromptIndex(threshold=0.6)
+    index.add("너 이름이 뭐야?", payload="R.A.I. 다")
+    entry, similarity = index.lookup("너 이름이 뭐야?!!")
+    assert entry["payload"] == "R.A.I. 다" and similarity == 1.0
+    assert index.lookup("오늘 날씨 어때") is None
+
+
+def test_emoji_or_punctuation_only_prompts_never_match():
+    assert shingles("❤️") == frozenset() and shingles("?!...") == frozenset()
+    assert jaccard(frozenset(), frozenset()) == 0.0
+
+    index = PromptIndex(threshold=0.6)
+    assert index.add("👋", payload="안녕!") is None
+    index.add("안녕하세요", payload="반가워")
+    assert index.lookup("❤️") is None
+    assert index.lookup("?!") is None
+    assert index.stats()["entries"] == 1
+
+
+def test_cluster_prompts_skips_empty_prompts():
+    texts = ["👋", "❤️", "너 이름이 뭐야?", "너 이름이 뭐야", "?!"]
+    assert cluster_prompts(texts) == [[2, 3]]
+
+
+def test_capacity_evicts_least_recently_used():
+    index = PromptIndex(threshold=0.6, capacity=2)
+    index.add("첫번째 질문입니다", payload=1)
+    index.add("두번째 질문입니다", payload=2)
+    assert index.lookup("첫번째 질문입니다")[0]["payload"] == 1  # LRU 갱신
+    index.add("세번째 질문입니다", payload=3)
+    assert index.lookup("두번째 질문입니다", threshold=0.99) is None
+    assert index.lookup("첫번째 질문입니다")[0]["payload"] == 1
+    assert index.stats()["evictions"] == 1
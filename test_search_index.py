@@ -0,0 +1,70 @@
+# =============================================================
+# File: test_search_index.py
+# =============================================================
+
+import os
+
+import log_storage
+import search_index
+from search_index import SearchIndex, get_index, update_from_log
+
+
+def _save_log(code, messages):
+    log_data = {
+        "participant_code": code,
+        "conversation_start": "2025-07-28T05:00:00",
+        "conversation": [{"role": role, "content": content, "timestamp": None} for role, content in messages],
+    }
+    log_storage.atomic_write_json(log_storage.log_path(code), log_data)
+    return log_data
+
+
+def test_search_matches_korean_word_inside_longer_word():
+    index = SearchIndex()
+    index.index_conversation(_save_log("11110000", [("user", "너 이름이 뭐야?"), ("assistant", "비밀이야 😈")]))
+    hits = index.search("이름")
+    assert [(hit["participant_code"], hit["message_order"], hit["role"]) for hit in hits] == [
+        ("11110000", 1, "user")]
+    assert index.search("이름", role="assistant") == []
+
+
+def test_saving_a_log_only_appends_to_the_journal():
+    update_from_log(_save_log("11110000", [("user", "날씨 어때")]))
+    assert not os.path.exists(search_index.INDEX_PATH)  # 요청 경로에서 인덱스를 만들지 않음
+    assert os.listdir(search_index.journal_dir())
+
+
+def test_get_index_applies_journal_changes_once():
+    update_from_log(_save_log("11110000", [("user", "날씨 어때")]))
+    assert get_index().live_count == 1
+
+    # 다른 프로세스의 저널 + 같은 참여자 대화가 이어짐
+    update_from_log(_save_log("11110000", [("user", "날씨 어때"), ("assistant", "맑음")]))
+    with open(os.path.join(search_index.journal_dir(), "other-host-1.jsonl"), "a", encoding="utf-8") as f:
+        f.write('{"participant_code": "22220000"}\n{"participant_code": "3333')  # 마지막 줄은 쓰는 중
+    _save_log("22220000", [("user", "숙제 도와줘")])
+
+    index = get_index()
+    assert index.live_count == 3
+    assert index.search("맑음")[0]["message_order"] == 2
+    assert get_index().live_count == 3  # 이미 반영한 줄은 다시 색인하지 않음
+
+
+def test_reset_conversation_replaces_old_documents():
+    update_from_log(_save_log("11110000", [("user", "오늘 숙제"), ("assistant", "싫어")]))
+    get_index()
+    update_from_log(_save_log("11110000", [("user", "안녕")]))
+    index = get_index()
+    assert index.search("숙제") == []
+    assert index.live_count == 1
+
+
+def test_snapshot_round_trip(tmp_path):
+    index = SearchIndex()
+    index.index_conversation(_save_log("11110000", [("user", "반항적인 챗봇"), ("assistant", "그래서 뭐")]))
+    path = str(tmp_path / "index.pkl")
+    index.save(path)
+    loaded = SearchIndex.load(path)
+    assert loaded.search("챗봇") == index.search("챗봇")
+    loaded.index_conversation(_save_log("22220000", [("user", "챗봇 좋아")]))
+    assert len(loaded.search("챗봇")) == 2
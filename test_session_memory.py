@@ -0,0 +1,133 @@
+# =============================================================
+# File: test_session_memory.py
+# =============================================================
+
+import threading
+
+import pytest
+
+pytest.importorskip("azure.ai.inference")
+
+import session_memory
+from azure.ai.inference.models import AssistantMessage, UserMessage
+from session_memory import SessionMemoryManager
+
+
+@pytest.fixture
+def saved(monkeypatch):
+    """참여자 코드 → 저장된 conversation (로컬 로그/Firestore 대신)"""
+    store = {}
+    monkeypatch.setattr(session_memory, "load_saved_conversation", lambda code: store.get(code))
+    return store
+
+
+def _session(manager, *contents):
+    state = {"_session_id": "s1", "participant_code": "12345678",
+             "history": [(UserMessage if i % 2 == 0 else AssistantMessage)(content=c)
+                         for i, c in enumerate(contents)]}
+    with manager.track(state):
+        pass
+    return state, state["history"]
+
+
+def _conversation(history):
+    return [{"role": m.role, "content": m.content} for m in history]
+
+
+def test_spill_and_rehydrate(saved):
+    manager = SessionMemoryManager(idle_seconds=0, budget_bytes=0)
+    state, history = _session(manager, "안녕", "반가워")
+    saved["12345678"] = _conversation(history)
+
+    assert manager._spill(history) > 0
+    assert len(history) == 0 and history.spilled["message_count"] == 2
+
+    with manager.track(state) as restored:
+        assert restored is history
+        assert [m.content for m in history] == ["안녕", "반가워"]
+    assert history.spilled is None and manager.rehydrate_count == 1
+
+
+def test_spill_skips_unsaved_history(saved):
+    manager = SessionMemoryManager(idle_seconds=0, budget_bytes=0)
+    _, history = _session(manager, "안녕", "반가워")
+    saved["12345678"] = _conversation(history)[:1]
+    assert manager._spill(history) == 0
+    assert len(history) == 2
+
+
+def test_spill_reads_saved_conversation_outside_the_lock(monkeypatch):
+    manager = SessionMemoryManager(idle_seconds=0, budget_bytes=0)
+    state, history = _session(manager, "안녕", "반가워")
+    lock_free = []
+
+    def try_lock():
+        acquired = history.lock.acquire(timeout=1)
+        if acquired:
+            history.lock.release()
+        lock_free.append(acquired)
+
+    def load(code):
+        # 조회 중에 그 세션의 다음 실행(다른 스레드)이 잠금을 바로 잡을 수 있어야 함
+        other = threading.Thread(target=try_lock)
+        other.start()
+        other.join()
+        return _conversation(history)
+
+    monkeypatch.setattr(session_memory, "load_saved_conversation", load)
+    assert manager._spill(history) > 0
+    assert lock_free == [True]
+
+
+def test_spill_rechecks_after_loading(saved, monkeypatch):
+    manager = SessionMemoryManager(idle_seconds=0, budget_bytes=0)
+    state, history = _session(manager, "안녕", "반가워")
+    stale = _conversation(history)
+
+    def load(code):
+        history.append(UserMessage(content="조회 중에 추가됨"))  # 조회하는 동안 새 턴
+        return stale
+
+    monkeypatch.setattr(session_memory, "load_saved_conversation", load)
+    assert manager._spill(history) == 0
+    assert len(history) == 3 and history.spilled is None
+
+
+def test_failed_rehydrate_keeps_stub_and_retries(saved):
+    manager = SessionMemoryManager(idle_seconds=0, budget_bytes=0)
+    state, history = _session(manager, "안녕", "반가워")
+    saved["12345678"] = _conversation(history)
+    manager._spill(history)
+
+    del saved["12345678"]  # 저장본을 잠시 읽을 수 없음
+    with manager.busy(state) as current:
+        assert current.spilled is not None and len(current) == 0
+    assert manager.rehydrate_failures == 1
+
+    saved["12345678"] = _conversation(history)[:1]  # 내보낼 때보다 짧은 저장본도 실패
+    assert not manager.touch(history)
+
+    saved["12345678"] = [{"role": "user", "content": "안녕"}, {"role": "assistant", "content": "반가워"}]
+    assert manager.touch(history)
+    assert history.spilled is None and len(history) == 2
+
+
+def test_busy_callback_blocks_spill_until_done(saved):
+    manager = SessionMemoryManager(idle_seconds=0, budget_bytes=0)
+    state, history = _session(manager, "안녕", "반가워")
+    saved["12345678"] = _conversation(history)
+    freed = []
+
+    with manager.busy(state) as current:
+        sweeper = threading.Thread(target=lambda: freed.append(manager._spill(current)))
+        sweeper.start()
+        sweeper.join(0.1)
+        assert sweeper.is_alive()  # 콜백이 끝날 때까지 기다림
+        current.append(UserMessage(content="하나 더"))
+        saved["12345678"] = _conversation(current)
+    sweeper.join(5)
+
+    # 정리 작업은 콜백이 추가한 메시지까지 포함된 상태만 봄
+    assert freed and freed[0] > 0
+    assert history.spilled["message_count"] == 3
+    assert not history.busy